@@ -1,57 +1,293 @@
-from flask import Flask, render_template, request, jsonify
-from warehouse.simulation import Simulation
+import atexit
+import json
+import queue
+import threading
+from flask import Flask, render_template, request, jsonify, Response, abort, make_response
+import headless
+from warehouse.settings import Settings
+from warehouse.zones import ZonePool
+from warehouse import wire
+from warehouse.eventsink import LEVELS
 import config
 
 app = Flask(__name__)
-sim = Simulation()
+# Every simulation runs in a zone worker process; the plain routes serve this one, built from config.py.
+DEFAULT_ZONE = "default"
+# Started with the first request, so the reloader's parent process (and plain imports) start no workers.
+pool = None
+pool_lock = threading.Lock()
+# Bulk uploads send this many tasks per call to the zone's worker process, so a large upload is
+# neither buffered whole in the web server nor held up on one IPC round trip per line.
+BULK_CHUNK = 1000
+BULK_MAX_ERRORS = 100 # Rejected lines reported back in detail
+
+def zone_overrides(spec):
+    """
+    Settings overrides of a zone spec (a POST /sims body or a ZONES entry):
+    grid ("60x100" or [rows, cols]), robots, obstacle_density,
+    dynamic_chance, engine, scheduler, planner, joint_planner, plus raw
+    config names under "settings". ValueError if it is malformed.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("a zone must be a JSON object")
+    grid = spec.get("grid")
+    try:
+        if isinstance(grid, str):
+            grid = headless.parse_grid(grid)
+        values = headless.overrides(
+            grid, spec.get("robots"), spec.get("obstacle_density"), spec.get("dynamic_chance"), spec.get("engine"),
+            spec.get("scheduler"), spec.get("planner"), joint_planner=spec.get("joint_planner"),
+        )
+    except (TypeError, ValueError):
+        raise ValueError("grid must be 'ROWSxCOLS' or [rows, cols], robots an integer") from None
+    values.update(spec.get("settings") or {})
+    return values
+
+def start_pool():
+    """ Starts the zone workers with the default zone and the zones listed in config.ZONES. """
+    global pool
+    with pool_lock:
+        if pool is None:
+            zones = ZonePool.from_settings(Settings())
+            # A clean shutdown stops every zone, so zones with checkpoints continue from exactly there next time.
+            atexit.register(zones.close)
+            zones.create(DEFAULT_ZONE, default=True)
+            for zone_id, spec in config.ZONES.items():
+                try:
+                    zones.create(zone_id, zone_overrides(spec), spec.get("seed"))
+                except (ValueError, TypeError, KeyError, OSError) as error:
+                    app.logger.warning("Zone %s not started: %s", zone_id, error)
+            pool = zones
+    return pool
+
+@app.before_request
+def start_zones():
+    """ Starts the zone workers with the first request (not in the reloader's parent process). """
+    start_pool()
+
+@app.errorhandler(ConnectionError)
+def zone_worker_gone(error):
+    return jsonify({"status": "error", "message": str(error)}), 503
+
+def get_zone(zone_id):
+    """ The zone a route addresses (the default zone for the plain routes); 404 if there is none. """
+    zone = pool.get(zone_id or DEFAULT_ZONE)
+    if zone is None:
+        abort(make_response(jsonify({"status": "error", "message": f"Unknown zone '{zone_id}'."}), 404))
+    return zone
+
+def wants_binary():
+    """ True if the client prefers the binary wire format over JSON (Accept header). """
+    return request.accept_mimetypes.best_match(["application/json", wire.MIMETYPE]) == wire.MIMETYPE
 
 @app.route('/')
-def index():
-    """ Renders the main dashboard page. """
-    return render_template('index.html')
+@app.route('/sim/<zone_id>/')
+def index(zone_id=None):
+    """ Renders the main dashboard page (of the default zone, or of a named one). """
+    get_zone(zone_id)
+    return render_template('index.html', api_base=f"/sim/{zone_id}" if zone_id else "")
 
 @app.route('/init', methods=['GET'])
-def init_sim():
-    """ 
+@app.route('/sim/<zone_id>/init', methods=['GET'])
+def init_sim(zone_id=None):
+    """
     Provides initial simulation state to the frontend on page load.
     """
-    return jsonify({
-        "grid_size": config.GRID_SIZE,
-        "robot_data": sim.get_robot_data(),
-        "obstacles": list(sim.grid.blocked), 
-        "dynamic_obstacles": list(sim.dynamic_obstacles), 
-        "step_interval": config.STEP_INTERVAL_MS,
-    })
+    zone = get_zone(zone_id)
+    if wants_binary():
+        headers = {"X-Step-Interval": str(zone.info["step_interval"]), "Vary": "Accept"}
+        return Response(zone.init(True), mimetype=wire.MIMETYPE, headers=headers)
+    return jsonify(zone.init(False))
 
-@app.route('/add_task', methods=['POST'])
-def add_task():
-    """ Adds a new pickup-and-drop task to the simulation. """
+@app.route('/sims', methods=['GET'])
+def list_zones():
+    """ Every running zone: id, grid size, robots, step interval, seed and worker. """
+    return jsonify({"zones": pool.list()})
+
+@app.route('/sims', methods=['POST'])
+def create_zone():
+    """
+    Starts a named zone on the least loaded worker. Body: id, optional seed,
+    and the zone spec fields (see zone_overrides). With CHECKPOINT_PATH set
+    in config.py a zone restores its own checkpoint file, if one exists.
+    """
     data = request.json
-    pickup = tuple(data['pickup'])
-    drop = tuple(data['drop'])
-    sim.add_task(pickup, drop)
-    return jsonify({"status": "success", "message": "Task added."})
+    try:
+        if not isinstance(data, dict) or not isinstance(data.get("id"), str):
+            raise ValueError("a zone needs a string id")
+        seed = data.get("seed")
+        zone = pool.create(data["id"], zone_overrides(data), int(seed) if seed is not None else None)
+    except (ValueError, TypeError) as error: # TypeError: a setting of the wrong type, raised by the worker
+        return jsonify({"status": "error", "message": str(error)}), 400
+    return jsonify({"status": "success", "zone": zone.info}), 201
 
-@app.route('/update', methods=['GET'])
-def update_sim():
+@app.route('/sim/<zone_id>', methods=['DELETE'])
+def delete_zone(zone_id):
+    """ Stops a named zone (writing its final checkpoint, if checkpoints are on). """
+    if zone_id == DEFAULT_ZONE:
+        return jsonify({"status": "error", "message": "The default zone cannot be removed."}), 400
+    try:
+        pool.remove(zone_id)
+    except KeyError:
+        return jsonify({"status": "error", "message": f"Unknown zone '{zone_id}'."}), 404
+    return jsonify({"status": "success", "message": f"Zone '{zone_id}' stopped."})
+
+def parse_task(data, zone):
+    """ (pickup, drop, priority, deadline) from a task object; ValueError if it is malformed. """
+    if not isinstance(data, dict):
+        raise ValueError("a task must be a JSON object")
+    try:
+        pickup = tuple(int(v) for v in data['pickup'])
+        drop = tuple(int(v) for v in data['drop'])
+        priority = int(data.get('priority', 0))
+        deadline = data.get('deadline')
+        deadline = int(deadline) if deadline is not None else None
+    except KeyError as error:
+        raise ValueError(f"missing field {error}")
+    except TypeError:
+        raise ValueError("pickup and drop must be [row, col], priority and deadline integers")
+    if len(pickup) != 2 or len(drop) != 2 or not zone.is_valid(pickup) or not zone.is_valid(drop):
+        raise ValueError("pickup and drop must be [row, col] cells inside the grid")
+    return pickup, drop, priority, deadline
+
+@app.route('/add_task', methods=['POST'])
+@app.route('/sim/<zone_id>/add_task', methods=['POST'])
+def add_task(zone_id=None):
     """
-    Executes one simulation step and returns the current state.
-    This is polled by the frontend to create the animation.
+    Adds a new pickup-and-drop task to the simulation. Optional fields:
+    priority (higher is assigned first, default 0) and deadline (a tick).
     """
-    sim.step()
+    zone = get_zone(zone_id)
+    try:
+        spec = parse_task(request.json, zone)
+    except ValueError as error:
+        return jsonify({"status": "error", "message": str(error)}), 400
+    (task_id,), reason = zone.add_tasks([spec])
+    if task_id is None:
+        return jsonify({"status": "error", "message": f"Task rejected: {reason}."}), 409
+    return jsonify({"status": "success", "message": "Task added.", "id": task_id})
+
+@app.route('/add_tasks', methods=['POST'])
+@app.route('/sim/<zone_id>/add_tasks', methods=['POST'])
+def add_tasks(zone_id=None):
+    """
+    Bulk task ingestion: an NDJSON body with one task object per line (same
+    fields as /add_task), read as it streams in. Parsed tasks are sent to the
+    zone's worker in chunks of BULK_CHUNK, one IPC call each, while the rest
+    of the body is still being read. Malformed or rejected lines are skipped
+    and reported by line number.
+    """
+    zone = get_zone(zone_id)
+    accepted, errors, ids = 0, [], []
+    rejected = 0
+    chunk = []
+
+    def add_chunk():
+        nonlocal accepted, rejected
+        task_ids, reason = zone.add_tasks([spec for _, spec in chunk])
+        for (number, _), task_id in zip(chunk, task_ids):
+            if task_id is None:
+                rejected += 1
+                if len(errors) < BULK_MAX_ERRORS:
+                    errors.append({"line": number, "message": f"rejected: {reason}"})
+            else:
+                accepted += 1
+                ids.append(task_id)
+        chunk.clear()
+
+    for number, line in enumerate(request.stream, 1):
+        if not line.strip():
+            continue
+        try:
+            chunk.append((number, parse_task(json.loads(line), zone)))
+        except ValueError as error: # json.JSONDecodeError is a ValueError too
+            rejected += 1
+            if len(errors) < BULK_MAX_ERRORS:
+                errors.append({"line": number, "message": str(error)})
+        if len(chunk) >= BULK_CHUNK:
+            add_chunk()
+    if chunk:
+        add_chunk()
+    errors.sort(key=lambda error: error["line"])
     return jsonify({
-        "robot_data": sim.get_robot_data(),
-        "tasks": sim.get_task_positions(),
-        "dynamic_obstacles": list(sim.dynamic_obstacles)
+        "status": "success" if not rejected else "partial",
+        "accepted": accepted,
+        "rejected": rejected,
+        "first_id": ids[0] if ids else None,
+        "last_id": ids[-1] if ids else None,
+        "errors": errors,
     })
 
+@app.route('/update', methods=['GET'])
+@app.route('/sim/<zone_id>/update', methods=['GET'])
+def update_sim(zone_id=None):
+    """
+    Returns the latest simulation state. This is polled by the frontend to
+    create the animation; it no longer advances the simulation, so the number
+    of open dashboards does not change the sim rate.
+    """
+    zone = get_zone(zone_id)
+    if wants_binary():
+        return Response(zone.update(True), mimetype=wire.MIMETYPE, headers={"Vary": "Accept"})
+    return Response(zone.update(False), mimetype='application/json', headers={"Vary": "Accept"})
+
+@app.route('/stream', methods=['GET'])
+@app.route('/sim/<zone_id>/stream', methods=['GET'])
+def stream(zone_id=None):
+    """
+    Server-sent event stream of the simulation: a keyframe with the full state
+    on connect (and periodically after), then one delta per tick.
+    """
+    zone = get_zone(zone_id)
+    subscriber = zone.subscribe()
+
+    def events():
+        try:
+            while True:
+                try:
+                    yield subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            zone.unsubscribe(subscriber)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(events(), mimetype='text/event-stream', headers=headers)
+
+@app.route('/metrics', methods=['GET'])
+@app.route('/sim/<zone_id>/metrics', methods=['GET'])
+def metrics(zone_id=None):
+    """ Prometheus scrape endpoint: tick/phase timers, search expansions, replans, queue depth. """
+    text = get_zone(zone_id).metrics()
+    if text is None:
+        return Response("Metrics are disabled (METRICS_ENABLED = False).\n", status=404, mimetype='text/plain')
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/events', methods=['GET'])
+@app.route('/sim/<zone_id>/events', methods=['GET'])
+def events(zone_id=None):
+    """
+    Recent simulation events from the in-memory ring buffer, oldest first.
+    Query parameters: limit (default 100), category, level (minimum) and
+    since (only events with a larger seq, for incremental polling).
+    """
+    zone = get_zone(zone_id)
+    limit = request.args.get('limit', 100, type=int)
+    since = request.args.get('since', type=int)
+    level = request.args.get('level')
+    if level is not None and level not in LEVELS:
+        return jsonify({"status": "error", "message": f"Unknown level '{level}'."}), 400
+    recent, newest = zone.events(limit, request.args.get('category'), level, since)
+    # Poll again with since=last_seq to get only what happened after this response.
+    return jsonify({"events": recent, "last_seq": recent[-1]["seq"] if recent else newest})
+
 @app.route('/reset_shift', methods=['POST'])
-def reset_shift():
+@app.route('/sim/<zone_id>/reset_shift', methods=['POST'])
+def reset_shift(zone_id=None):
     """ Starts the process of returning all robots to their depots. """
-    sim.initiate_shift_end()
+    get_zone(zone_id).reset_shift()
     return jsonify({"status": "success", "message": "Shift end initiated. Robots are returning to depot."})
 
 
 if __name__ == "__main__":
     app.run(host=config.HOST, port=config.PORT, debug=True)
-
@@ -0,0 +1,145 @@
+"""
+Planner comparison: flat A* vs. Jump Point Search vs. HPA* on shelf layouts.
+
+Each layout is built by Simulation._generate_shelf_obstacles (shelf blocks,
+center aisle, side padding, random clutter) for one grid size and clutter
+density. The same seeded start/goal queries, half of them with a random set
+of extra blocked cells standing in for temporary obstacles, are answered by
+every planner. Reported per planner: mean and p95 latency, mean node
+expansions (heap pops; abstract nodes for HPA*) and path length relative to
+A*. JPS must match A*'s lengths exactly.
+
+Run from the warehouse-sim directory:
+    python -m benchmarks.planners --grids 60x100 200x300 --queries 200
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import time
+
+import headless
+from warehouse.hpa import HierarchicalPlanner
+from warehouse.jps import JumpPointPlanner
+from warehouse.pathfinding import astar
+from warehouse.simulation import Simulation
+
+DEFAULT_GRIDS = ["60x100", "200x300", "400x600"]
+DEFAULT_DENSITIES = [0.0, 0.05]
+PLANNERS = ("astar", "jps", "hpa")
+
+
+class _MaskRecorder:
+    """ Grid stand-in that keeps astar()'s private mask, whose closed nodes it marks in place. """
+    def __init__(self, grid):
+        self.grid = grid
+        self.mask = None
+
+    def __getattr__(self, name):
+        return getattr(self.grid, name)
+
+    def occupancy_mask(self, extra_blocked=None):
+        self.mask = self.grid.occupancy_mask(extra_blocked)
+        return self.mask
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _queries(grid, count, blocked_count, rng):
+    free = [grid.position(i) for i, cell in enumerate(grid.mask) if not cell]
+    queries = []
+    for i in range(count):
+        start, goal = rng.sample(free, 2)
+        blocked = set(rng.sample(free, blocked_count)) - {start, goal} if i % 2 else None
+        queries.append((start, goal, blocked))
+    return queries
+
+
+def run_layout(grid_size, density, count, blocked_count, seed):
+    """ Answers the same queries with every planner and returns their statistics. """
+    headless.configure(grid_size, 4, density)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulation(seed=seed)
+    grid = sim.grid
+    queries = _queries(grid, count, blocked_count, random.Random(seed))
+    recorder = _MaskRecorder(grid)
+    jps = JumpPointPlanner(grid)
+    hpa = HierarchicalPlanner(grid)
+    hpa.find_path(*queries[0][:2]) # Builds the cluster graph; layout setup is not timed
+
+    timings = {name: [] for name in PLANNERS}
+    expansions = {name: 0 for name in PLANNERS}
+    ratios = {name: [] for name in PLANNERS}
+    for start, goal, blocked in queries:
+        static_closed = grid.mask.count(1)
+        t0 = time.perf_counter()
+        reference = astar(recorder, start, goal, blocked)
+        timings["astar"].append(time.perf_counter() - t0)
+        # Every node astar() closes is marked in its mask copy on top of the obstacles.
+        expansions["astar"] += recorder.mask.count(1) - static_closed - len(blocked or ())
+
+        for name, planner, counter in (("jps", jps, "expansions"), ("hpa", hpa, "abstract_expansions")):
+            before = getattr(planner, counter)
+            t0 = time.perf_counter()
+            path = planner.find_path(start, goal, blocked)
+            timings[name].append(time.perf_counter() - t0)
+            expansions[name] += getattr(planner, counter) - before
+            if bool(path) != bool(reference):
+                raise AssertionError(f"{name} disagrees with A* on reachability of {start} -> {goal}")
+            if reference:
+                ratios[name].append(len(path) / len(reference))
+        if reference:
+            ratios["astar"].append(1.0)
+    for ratio in ratios["jps"]:
+        if ratio != 1.0:
+            raise AssertionError("JPS returned a path of a different length than A*")
+
+    return {
+        "grid": list(grid_size),
+        "obstacle_density": density,
+        "queries": count,
+        "planners": {
+            name: {
+                "mean_ms": statistics.fmean(timings[name]) * 1000,
+                "p95_ms": _percentile(timings[name], 95) * 1000,
+                "expansions_per_query": expansions[name] / count,
+                "mean_length_ratio": statistics.fmean(ratios[name]) if ratios[name] else 0.0,
+            }
+            for name in PLANNERS
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grids", nargs="+", type=headless.parse_grid,
+                        default=[headless.parse_grid(g) for g in DEFAULT_GRIDS], help="rows x cols layouts")
+    parser.add_argument("--densities", type=float, nargs="+", default=DEFAULT_DENSITIES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--blocked", type=int, default=50, help="extra blocked cells in every other query")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = [
+        run_layout(grid, density, args.queries, args.blocked, args.seed)
+        for grid in args.grids for density in args.densities
+    ]
+    print(f"{'grid':>9} {'density':>8} {'planner':>8} {'mean ms':>9} {'p95':>8} {'expanded':>9} {'length':>7}")
+    for r in results:
+        for name, stats in r["planners"].items():
+            print(f"{'x'.join(map(str, r['grid'])):>9} {r['obstacle_density']:>8} {name:>8} "
+                  f"{stats['mean_ms']:>9.3f} {stats['p95_ms']:>8.3f} "
+                  f"{stats['expansions_per_query']:>9.0f} {stats['mean_length_ratio']:>7.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"seed": args.seed, "blocked": args.blocked, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
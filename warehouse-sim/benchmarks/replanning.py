@@ -0,0 +1,120 @@
+"""
+Replanning latency: persistent D* Lite repair vs. from-scratch A*.
+
+A probe robot shuttles between two far-apart cells of a generated warehouse
+while the simulation's own dynamic obstacle process runs at increasing
+DYNAMIC_OBSTACLE_CHANCE values. Every time an obstacle lands on the probe's
+remaining path both planners re-route from the same cell against the same
+obstacle set, and their latencies are compared.
+
+Run from the warehouse-sim directory:
+    python -m benchmarks.replanning --grid 60x100 --ticks 20000
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+
+import config
+from warehouse.incremental import DStarLite
+from warehouse.pathfinding import astar
+from warehouse.simulation import Simulation
+
+DEFAULT_CHURN_RATES = [0.005, 0.02, 0.05, 0.1, 0.25]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _far_pair(sim):
+    """ Picks the depot and the reachable cell farthest from it as the probe's two endpoints. """
+    depot = next(iter(config.ROBOT_DEPOT_POSITIONS.values()))
+    field = sim.distance_fields.get(depot)
+    return depot, sim.grid.position(int(field.argmax()))
+
+
+def run_churn_rate(chance, ticks, seed):
+    """ Runs one churn rate and returns latency statistics in milliseconds. """
+    config.DYNAMIC_OBSTACLE_CHANCE = chance
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulation(seed=seed)
+    start, goal = _far_pair(sim)
+    searches = {start: DStarLite(sim.grid, start), goal: DStarLite(sim.grid, goal)}
+    searches[goal].plan(start) # Initial plans are not part of the comparison
+    searches[start].plan(goal)
+    pos = start
+    path = astar(sim.grid, start, goal)[1:]
+
+    incremental_ms, scratch_ms = [], []
+    expansions = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for tick in range(ticks):
+            sim.tick = tick
+            sim._process_events() # Only the obstacle process is scheduled: no tasks are fed
+            obstacles = sim.dynamic_obstacles
+            if path and any(cell in obstacles for cell in path):
+                search = searches[goal]
+                before = search.expansions
+                t0 = time.perf_counter()
+                repaired = search.plan(pos, obstacles)
+                t1 = time.perf_counter()
+                fresh = astar(sim.grid, pos, goal, obstacles)
+                t2 = time.perf_counter()
+                assert len(repaired) == len(fresh)
+                incremental_ms.append((t1 - t0) * 1000)
+                scratch_ms.append((t2 - t1) * 1000)
+                expansions += search.expansions - before
+                path = fresh[1:]
+
+            if tick % config.ROBOT_PACE == 0:
+                if path:
+                    pos = path.pop(0)
+                    continue
+                if pos == goal: # Leg finished: head back the other way
+                    start, goal = goal, start
+                # Starting a new leg (or waiting out a blockage) is not a repair, so it is not timed.
+                path = searches[goal].plan(pos, obstacles)[1:]
+
+    return {
+        "dynamic_obstacle_chance": chance,
+        "replans": len(incremental_ms),
+        "incremental_mean_ms": statistics.fmean(incremental_ms) if incremental_ms else 0.0,
+        "incremental_p95_ms": _percentile(incremental_ms, 95),
+        "scratch_mean_ms": statistics.fmean(scratch_ms) if scratch_ms else 0.0,
+        "scratch_p95_ms": _percentile(scratch_ms, 95),
+        "incremental_expansions_per_replan": expansions / len(incremental_ms) if incremental_ms else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", default="60x100", help="rows x cols, e.g. 60x100")
+    parser.add_argument("--ticks", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--rates", type=float, nargs="+", default=DEFAULT_CHURN_RATES)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    rows, cols = (int(v) for v in args.grid.lower().split("x"))
+    config.GRID_SIZE = (rows, cols)
+
+    results = [run_churn_rate(rate, args.ticks, args.seed) for rate in args.rates]
+    print(f"{'chance':>8} {'replans':>8} {'D*Lite ms':>10} {'p95':>8} {'A* ms':>8} {'p95':>8} {'speedup':>8}")
+    for r in results:
+        speedup = r["scratch_mean_ms"] / r["incremental_mean_ms"] if r["incremental_mean_ms"] else 0.0
+        print(f"{r['dynamic_obstacle_chance']:>8} {r['replans']:>8} "
+              f"{r['incremental_mean_ms']:>10.3f} {r['incremental_p95_ms']:>8.3f} "
+              f"{r['scratch_mean_ms']:>8.3f} {r['scratch_p95_ms']:>8.3f} {speedup:>7.1f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"grid": [rows, cols], "ticks": args.ticks, "seed": args.seed, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
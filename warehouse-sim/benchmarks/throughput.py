@@ -0,0 +1,97 @@
+"""
+Throughput benchmark matrix: grid sizes x robot counts x obstacle densities.
+
+Every cell of the matrix is a headless run (see headless.py) in a fresh
+process, so config overrides and peak-memory readings never leak between
+runs. Results are written as JSON; pass an earlier results file with
+--baseline to print the ticks/sec ratio against it and spot regressions.
+
+Run from the warehouse-sim directory:
+    python -m benchmarks.throughput --ticks 2000 --out results.json
+    python -m benchmarks.throughput --baseline results.json --out new.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import subprocess
+import time
+
+import headless
+
+DEFAULT_GRIDS = ["15x25", "60x100", "120x200"]
+DEFAULT_ROBOTS = [4, 16, 64]
+DEFAULT_DENSITIES = [0.0, 0.05, 0.1]
+
+
+def _run_cell(cell):
+    grid, robots, density, ticks, seed, task_rate = cell
+    headless.configure(grid, robots, density)
+    return headless.run(ticks, seed, task_rate)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result):
+    return (tuple(result["grid"]), result["robots"], result["obstacle_density"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the headless throughput benchmark matrix.")
+    parser.add_argument("--grids", nargs="+", default=DEFAULT_GRIDS, type=headless.parse_grid)
+    parser.add_argument("--robots", nargs="+", default=DEFAULT_ROBOTS, type=int)
+    parser.add_argument("--densities", nargs="+", default=DEFAULT_DENSITIES, type=float)
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--task-rate", type=float, default=0.2)
+    parser.add_argument("--out", default="throughput_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare ticks/sec against")
+    args = parser.parse_args()
+
+    cells = [
+        (grid, robots, density, args.ticks, args.seed, args.task_rate)
+        for grid, robots, density in itertools.product(args.grids, args.robots, args.densities)
+        if robots <= grid[1] * 2 # Depots line the top two rows
+    ]
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {_key(r): r for r in json.load(f)["results"]}
+
+    # One fresh process per run, one run at a time so timings do not compete for cores.
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(_run_cell, cells):
+            results.append(result)
+            line = (f"{result['grid'][0]}x{result['grid'][1]:<5} robots={result['robots']:<4} "
+                    f"density={result['obstacle_density']:<5} {result['ticks_per_second']:>9.1f} ticks/s "
+                    f"planner={result['planner_share']:.0%} tasks/1k={result['tasks_per_1000_ticks']:.1f} "
+                    f"rss={result['peak_rss_mb']:.0f}MB")
+            previous = baseline.get(_key(result))
+            if previous:
+                line += f" vs baseline {result['ticks_per_second'] / previous['ticks_per_second']:.2f}x"
+            print(line, flush=True)
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "ticks": args.ticks,
+            "seed": args.seed,
+            "task_rate": args.task_rate,
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ STEP_INTERVAL_MS = 100
 ROBOT_PACE = 3
 ROBOT_SCAN_RANGE = 2
 DYNAMIC_OBSTACLE_CHANCE = 0.005
+# Per-tick chance that one of the temporary obstacles clears again.
+DYNAMIC_OBSTACLE_CLEAR_CHANCE = 0.1
 
 
 SHELF_BLOCKS = [
@@ -31,3 +33,117 @@ ROBOT_DEPOT_POSITIONS = {
     3: (0, 3),
 }
 
+
+# --- Layout File ---
+# Warehouse layout file (warehouse/layout.py, written with `python layout.py export`) mapped into the
+# grid instead of generating shelves and clutter; its floor size and depots replace GRID_SIZE and
+# ROBOT_DEPOT_POSITIONS. None generates the layout from the settings above and the seed.
+LAYOUT_PATH = None
+
+# --- Checkpoints ---
+# Full simulation state written every CHECKPOINT_INTERVAL ticks by the dashboard's runner
+# (warehouse/checkpoint.py), from a background thread. The dashboard restores it at startup if the
+# file exists, so a restart continues the run instead of starting a new one. None disables them.
+CHECKPOINT_PATH = None
+CHECKPOINT_INTERVAL = 500
+
+
+# --- Planner Caches ---
+# Maximum number of goal distance fields (pickup, drop, depot) kept in memory.
+DISTANCE_FIELD_CACHE_SIZE = 128
+# Memory for cached pickup -> drop routes (warehouse/routes.py), reused while nothing cuts them.
+# 0 turns the route cache off.
+ROUTE_CACHE_BYTES = 16 * 1024 * 1024
+
+# --- Collision Avoidance ---
+# "space_time": robots reserve (cell, tick) slots and plan with windowed cooperative A*.
+# "path_union": legacy mode, every other robot's whole remaining path is treated as blocked.
+COLLISION_AVOIDANCE = "space_time"
+# Number of steps planned (and reserved) in space-time; robots refresh after half of it.
+WHCA_WINDOW = 16
+# Extra steps the last cell of a freshly reserved window stays held for.
+WHCA_END_HOLD = 2
+
+# --- Path Planner ---
+# Search used when no cached distance field gives the path directly.
+# "astar": flat A* over the cell grid. "hpa": hierarchical A* over clusters (large floors).
+# "jps": 4-connected Jump Point Search, same path lengths as A* with far fewer expansions (open aisles).
+PLANNER = "astar"
+# HPA* cluster edge length in cells, and the entrance run length from which a border gets two entrances.
+HPA_CLUSTER_SIZE = 16
+HPA_LONG_ENTRANCE = 6
+
+# --- Replanning ---
+# Keep a persistent D* Lite search per robot leg so re-routes repair instead of restarting.
+# On open shelf layouts A* with a Manhattan heuristic is usually as fast or faster;
+# compare on your own floor with `python -m benchmarks.replanning`.
+INCREMENTAL_REPLANNING = False
+
+# --- Task Assignment ---
+# "hungarian": one optimal robots x tasks assignment per tick; "greedy": original per-task loop.
+ASSIGNMENT_STRATEGY = "hungarian"
+# Only the oldest pending tasks take part in each batched assignment.
+ASSIGNMENT_BATCH_SIZE = 512
+
+# --- Joint Planning ---
+# "cbs": shift-end returns and each batch of Hungarian assignments are planned together with
+# Conflict-Based Search (warehouse/cbs.py); whatever it cannot solve within its budget falls
+# back to "sequential", one robot at a time against the paths already committed (original).
+JOINT_PLANNER = "cbs"
+CBS_MAX_NODES = 200       # High-level node budget of one joint plan (deterministic)
+# Optional wall-time budget of one joint plan, on top of the node budget. Off by default: with it
+# the outcome depends on machine load, so the same seed no longer gives the same run.
+CBS_TIME_BUDGET_MS = None
+# Bounded suboptimality: 1.0 is optimal CBS; with w > 1 legs may be up to w times their shortest
+# distance to dodge other robots and the least conflicted node within w times the best cost is
+# expanded first (ECBS-style), which solves crowded batches in a fraction of the nodes.
+CBS_SUBOPTIMALITY = 1.2
+
+# --- Dashboard Stream ---
+# Ticks between full keyframes on /stream (deltas are sent in between).
+STREAM_KEYFRAME_INTERVAL = 50
+# Messages buffered per stream subscriber before it is resynced with a keyframe.
+STREAM_QUEUE_SIZE = 64
+
+# --- Zones ---
+# The dashboard runs every simulation ("zone") in a pool of worker processes (warehouse/zones.py):
+# the "default" zone from this config behind the plain routes, plus named zones under /sim/<id>/.
+# ZONE_WORKERS is the pool size (None: one per CPU core). ZONES creates named zones at startup:
+# {zone id: spec} with the fields POST /sims takes, e.g. {"north": {"robots": 20, "seed": 1}}.
+ZONE_WORKERS = None
+ZONES = {}
+
+# --- Fleet Engine ---
+# "objects": one Robot object per robot (original engine).
+# "vectorized": robot state in shared NumPy arrays, movement advanced for the whole fleet at once.
+FLEET_ENGINE = "objects"
+
+# --- Scheduler ---
+# "tick": Simulation.run_until steps every tick.
+# "event": only ticks on which something can happen are stepped (same trajectories, much faster
+# when robots are idle or between moves). The live dashboard always steps every tick.
+SCHEDULER = "tick"
+
+# --- Event Log ---
+# Binary log of tasks, temporary obstacles, assignments, plans and shift events (warehouse/eventlog.py);
+# replay it with replay.py. None disables logging.
+EVENT_LOG_PATH = None
+EVENT_LOG_CHECKPOINT_INTERVAL = 1000 # Ticks between full state checkpoints (random access for replay)
+
+# --- Metrics ---
+# Per-phase timers, search expansions, replans and tick histograms (warehouse/metrics.py), served
+# by the dashboard at /metrics. False removes the instrumentation from the hot paths entirely.
+METRICS_ENABLED = True
+
+# --- Event Sink ---
+# Structured events (task added/assigned/completed, obstacles, re-routes, shift) replace console
+# prints inside the tick (warehouse/eventsink.py). The newest are kept in memory for /events; a
+# background thread writes them out every EVENT_SINK_FLUSH_MS if a file or the console is set.
+EVENT_SINK_CAPACITY = 10000 # Events kept in the in-memory ring buffer
+EVENT_SINK_PATH = None      # File events are appended to, or None
+EVENT_SINK_FORMAT = "jsonl" # "jsonl" (one JSON object per line) or "binary"
+EVENT_SINK_CONSOLE = False  # Also print event messages (from the writer thread, never the tick)
+EVENT_SINK_LEVEL = "info"   # Minimum level recorded: "debug", "info", "warning" or "error"
+EVENT_SINK_LEVELS = {}      # Per-category minimum levels, e.g. {"assignment": "warning"}
+EVENT_SINK_SAMPLING = {}    # Per-category fraction of events kept, e.g. {"robot": 0.1}
+EVENT_SINK_FLUSH_MS = 200
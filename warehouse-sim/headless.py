@@ -0,0 +1,231 @@
+"""
+Headless batch runner: drives Simulation.step() as fast as possible, without Flask.
+
+    python headless.py --ticks 20000 --grid 60x100 --robots 30 --seed 1
+    python headless.py --ticks 5000 --json result.json
+
+The grid, fleet size and obstacle settings override config before the
+Simulation is built, a seeded task stream is generated between recurring
+stations, and the run reports ticks/sec, planner time, tasks completed per
+1000 ticks, task latency (ticks from arrival to delivery) and peak memory.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import config
+
+
+def scaled_shelf_blocks(rows, shelf_rows=2, aisle_rows=3):
+    """ Repeats a shelf pattern (default: 2 shelf rows, 3 aisle rows) down a grid of any height. """
+    return [{"start_row": r, "row_count": shelf_rows} for r in range(3, rows - 3, shelf_rows + aisle_rows)]
+
+
+def depot_positions(num_robots, cols):
+    """ Lines robot depots up along the top rows, left to right. """
+    return {robot_id: divmod(robot_id, cols) for robot_id in range(num_robots)}
+
+
+def overrides(grid=None, robots=None, obstacle_density=None, dynamic_chance=None, engine=None, scheduler=None,
+              planner=None, shelf_pattern=None, joint_planner=None):
+    """ The config names a run with these parameters changes, with their values (None keeps the default). """
+    values = {}
+    if grid is not None:
+        if grid[0] < 2 or grid[1] < 2:
+            raise ValueError(f"grid must be at least 2x2 (the top row holds the depots), got {grid[0]}x{grid[1]}")
+        values["GRID_SIZE"] = tuple(grid)
+    rows, cols = values.get("GRID_SIZE", config.GRID_SIZE)
+    if shelf_pattern is not None:
+        values["SHELF_BLOCKS"] = scaled_shelf_blocks(rows, *shelf_pattern)
+    elif grid is not None and tuple(grid) != (15, 25):
+        values["SHELF_BLOCKS"] = scaled_shelf_blocks(rows)
+    if robots is not None:
+        values["NUM_ROBOTS"] = robots
+        values["ROBOT_DEPOT_POSITIONS"] = depot_positions(robots, cols)
+    if obstacle_density is not None:
+        values["RANDOM_OBSTACLE_DENSITY"] = obstacle_density
+    if dynamic_chance is not None:
+        values["DYNAMIC_OBSTACLE_CHANCE"] = dynamic_chance
+    if engine is not None:
+        values["FLEET_ENGINE"] = engine
+    if scheduler is not None:
+        values["SCHEDULER"] = scheduler
+    if planner is not None:
+        values["PLANNER"] = planner
+    if joint_planner is not None:
+        values["JOINT_PLANNER"] = joint_planner
+    return values
+
+
+def configure(grid=None, robots=None, obstacle_density=None, dynamic_chance=None, engine=None, scheduler=None,
+              planner=None, joint_planner=None):
+    """ Overrides the module-level config before a Simulation is built. """
+    for name, value in overrides(grid, robots, obstacle_density, dynamic_chance, engine, scheduler, planner,
+                                 joint_planner=joint_planner).items():
+        setattr(config, name, value)
+
+
+class TaskStream:
+    """ Seeded pickup/drop task arrivals between a fixed set of recurring stations. """
+    def __init__(self, sim, rate, stations, seed):
+        self.rng = random.Random(seed)
+        self.rate = rate
+        depots = set(sim.settings.ROBOT_DEPOT_POSITIONS.values())
+        cols = sim.grid.cols
+        open_cells = np.flatnonzero(np.frombuffer(sim.grid.mask, dtype=np.uint8) == 0).tolist()
+        free = [cell for cell in (divmod(i, cols) for i in open_cells) if cell not in depots]
+        self.stations = self.rng.sample(free, min(stations, len(free)))
+
+    def arrivals(self):
+        """ This tick's arrivals (rate is the mean number of tasks per tick). """
+        count = int(self.rate) + (self.rng.random() < self.rate - int(self.rate))
+        return [self.rng.sample(self.stations, 2) for _ in range(count)]
+
+    def schedule(self, sim, ticks):
+        """ Queues the arrivals for the next `ticks` ticks as simulation events. """
+        for tick in range(sim.tick, sim.tick + ticks):
+            for pickup, drop in self.arrivals():
+                sim.schedule_task(tick, pickup, drop)
+
+def peak_rss_mb():
+    """ Peak resident set size of this process in MiB. """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return float(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))])
+
+
+def run(ticks, seed=0, task_rate=0.2, stations=200, trace_memory=False, quiet=True, settings=None,
+        metrics_path=None):
+    """ Builds a Simulation (from the current config unless settings are given) and runs it for `ticks` steps. """
+    from warehouse.settings import Settings
+    from warehouse.simulation import Simulation
+
+    settings = settings if settings is not None else Settings()
+
+    if trace_memory:
+        tracemalloc.start()
+    sink = open(os.devnull, "w") if quiet else sys.stdout
+    with contextlib.redirect_stdout(sink):
+        build_started = time.perf_counter()
+        sim = Simulation(settings, seed)
+        build_seconds = time.perf_counter() - build_started
+        stream = TaskStream(sim, task_rate, stations, seed)
+
+        stream.schedule(sim, ticks)
+        started = time.perf_counter()
+        sim.run_until(sim.tick + ticks)
+        elapsed = time.perf_counter() - started
+        sim.close()
+    if quiet:
+        sink.close()
+    if metrics_path and sim.metrics is not None:
+        sim.refresh_metrics()
+        with open(metrics_path, "w") as f:
+            f.write(sim.metrics.render())
+
+    latencies = sim.task_latencies
+    result = {
+        "grid": list(sim.settings.GRID_SIZE),
+        "robots": len(sim.robots),
+        "shelf_blocks": len(sim.settings.SHELF_BLOCKS),
+        "obstacle_density": sim.settings.RANDOM_OBSTACLE_DENSITY,
+        "dynamic_obstacle_chance": settings.DYNAMIC_OBSTACLE_CHANCE,
+        "collision_avoidance": settings.COLLISION_AVOIDANCE,
+        "assignment_strategy": settings.ASSIGNMENT_STRATEGY,
+        "fleet_engine": settings.FLEET_ENGINE,
+        "scheduler": settings.SCHEDULER,
+        "planner": settings.PLANNER,
+        "joint_planner": settings.JOINT_PLANNER,
+        "layout": settings.LAYOUT_PATH,
+        "seed": seed,
+        "ticks": ticks,
+        "task_rate": task_rate,
+        "build_seconds": build_seconds,
+        "elapsed_seconds": elapsed,
+        "ticks_per_second": ticks / elapsed if elapsed else 0.0,
+        "steps_executed": sim.steps_executed,
+        "planner_seconds": sim.planner_time,
+        "planner_share": sim.planner_time / elapsed if elapsed else 0.0,
+        "tasks_completed": sim.tasks_completed,
+        "tasks_per_1000_ticks": sim.tasks_completed * 1000 / ticks if ticks else 0.0,
+        "task_latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "task_latency_p50": _percentile(latencies, 50),
+        "task_latency_p95": _percentile(latencies, 95),
+        "pending_at_end": sim.tasks.count('pending'),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if trace_memory:
+        result["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return result
+
+
+def parse_grid(text):
+    rows, cols = (int(v) for v in text.lower().split("x"))
+    return rows, cols
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the warehouse simulation headless.")
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--grid", type=parse_grid, help="rows x cols, overrides GRID_SIZE")
+    parser.add_argument("--robots", type=int, help="overrides NUM_ROBOTS (depots along the top rows)")
+    parser.add_argument("--obstacle-density", type=float, help="overrides RANDOM_OBSTACLE_DENSITY")
+    parser.add_argument("--dynamic-chance", type=float, help="overrides DYNAMIC_OBSTACLE_CHANCE")
+    parser.add_argument("--engine", choices=["objects", "vectorized"], help="overrides FLEET_ENGINE")
+    parser.add_argument("--scheduler", choices=["tick", "event"], help="overrides SCHEDULER")
+    parser.add_argument("--planner", choices=["astar", "hpa", "jps"], help="overrides PLANNER")
+    parser.add_argument("--joint-planner", choices=["sequential", "cbs"], help="overrides JOINT_PLANNER")
+    parser.add_argument("--task-rate", type=float, default=0.2, help="mean new tasks per tick")
+    parser.add_argument("--stations", type=int, default=200, help="number of recurring pickup/drop stations")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peak (slower)")
+    parser.add_argument("--verbose", action="store_true", help="print the simulation's events to the console")
+    parser.add_argument("--events", help="append the simulation's events to this JSONL file")
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument("--layout", help="map this layout file (see layout.py) instead of generating the floor")
+    parser.add_argument("--event-log", help="record the run to this binary event log (see replay.py)")
+    parser.add_argument("--metrics", help="write the run's metrics to this file (Prometheus text format)")
+    parser.add_argument("--no-metrics", action="store_true", help="run without instrumentation (METRICS_ENABLED)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure(args.grid, args.robots, args.obstacle_density, args.dynamic_chance, args.engine, args.scheduler,
+              args.planner, args.joint_planner)
+    if args.layout:
+        config.LAYOUT_PATH = args.layout
+    if args.event_log:
+        config.EVENT_LOG_PATH = args.event_log
+    if args.no_metrics:
+        config.METRICS_ENABLED = False
+    if args.verbose:
+        config.EVENT_SINK_CONSOLE = True
+    if args.events:
+        config.EVENT_SINK_PATH = args.events
+    result = run(args.ticks, args.seed, args.task_rate, args.stations, args.trace_memory, not args.verbose,
+                 metrics_path=args.metrics)
+    for key, value in result.items():
+        print(f"{key:>24}: {value:.3f}" if isinstance(value, float) else f"{key:>24}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
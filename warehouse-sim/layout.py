@@ -0,0 +1,74 @@
+"""
+Exports a generated warehouse layout to a layout file (warehouse/layout.py), or describes one.
+
+    python layout.py export floor.layout --grid 1000x1000 --robots 50 --seed 1
+    python layout.py export floor.layout --distances none    # no depot distance tables
+    python layout.py info floor.layout
+
+Export runs the usual shelf and clutter generator once and writes its occupancy
+mask, depots and shelf settings, plus the depots' distance tables by default.
+Set LAYOUT_PATH in config.py (or pass headless.py --layout) to start simulations
+from the file: the grid maps the mask and the distance field cache the tables,
+so nothing is generated or searched at startup.
+"""
+import argparse
+import time
+
+from headless import overrides, parse_grid
+
+
+def export(args):
+    from warehouse.layout import export_layout
+    from warehouse.settings import Settings
+    from warehouse.simulation import Simulation
+
+    values = overrides(args.grid, args.robots, args.obstacle_density)
+    values.update(LAYOUT_PATH=None, EVENT_LOG_PATH=None, METRICS_ENABLED=False)
+    started = time.perf_counter()
+    sim = Simulation(Settings(**values), args.seed)
+    goals = sim.settings.ROBOT_DEPOT_POSITIONS.values() if args.distances == "depots" else ()
+    export_layout(sim, args.path, goals)
+    sim.close()
+    print(f"Wrote {args.path}: {sim.grid.rows}x{sim.grid.cols}, {len(sim.grid.blocked)} obstacles, "
+          f"{len(sim.robots)} depots, {len(goals)} distance tables in {time.perf_counter() - started:.2f}s")
+
+
+def info(args):
+    from warehouse.layout import Layout
+
+    started = time.perf_counter()
+    layout = Layout.open(args.path)
+    opened = time.perf_counter() - started
+    shelves = layout.metadata["shelves"]
+    print(f"{args.path}: {layout.rows}x{layout.cols}, opened in {opened * 1000:.2f}ms")
+    print(f"  depots: {len(layout.depots)}, seed: {layout.metadata['seed']}")
+    print(f"  shelf blocks: {len(shelves['blocks'])}, center aisle {shelves['center_aisle_width']}, "
+          f"side padding {shelves['side_padding']}, clutter density {shelves['random_obstacle_density']}")
+    print(f"  distance tables: {len(layout.distance_tables)} ({layout.metadata['table_dtype']})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Export or inspect warehouse layout files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="generate a layout and write it to a file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--seed", type=int, default=0, help="seed of the clutter generator")
+    export_parser.add_argument("--grid", type=parse_grid, help="rows x cols, overrides GRID_SIZE")
+    export_parser.add_argument("--robots", type=int, help="overrides NUM_ROBOTS (depots along the top rows)")
+    export_parser.add_argument("--obstacle-density", type=float, help="overrides RANDOM_OBSTACLE_DENSITY")
+    export_parser.add_argument("--distances", choices=["depots", "none"], default="depots",
+                               help="distance tables to store (default: one per depot)")
+    export_parser.set_defaults(handler=export)
+    info_parser = commands.add_parser("info", help="describe a layout file")
+    info_parser.add_argument("path")
+    info_parser.set_defaults(handler=info)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
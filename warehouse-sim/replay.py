@@ -0,0 +1,90 @@
+"""
+Replays a binary event log (EVENT_LOG_PATH, or headless.py --event-log).
+
+    python replay.py run.log                       # log summary
+    python replay.py run.log --tick 41234          # state at the start of a tick
+    python replay.py run.log --profile-from 41200 --ticks 50
+
+Replay applies the logged tasks, obstacles, assignments and plans and only
+moves the robots, so jumping to any tick costs one checkpoint restore plus at
+most EVENT_LOG_CHECKPOINT_INTERVAL ticks of movement. --profile-from then
+steps the simulation live (planning included) from the replayed state and
+reports the planner time of every tick, to bisect slow ticks seen in a run.
+Live ticks re-plan from the logged state, so they follow the original run
+closely but not necessarily exactly.
+"""
+import argparse
+import contextlib
+import io
+import time
+from collections import Counter
+
+from warehouse.eventlog import Replay, rebuild_reservations
+
+
+def describe(sim):
+    """ One-screen summary of a simulation's state. """
+    states = Counter(r.state for r in sim.robots)
+    statuses = Counter(t["status"] for t in sim.tasks)
+    lines = [
+        f"tick {sim.tick}: {sim.tasks_completed} tasks completed, "
+        f"{len(sim.dynamic_obstacles)} temporary obstacles, shift ending: {sim.is_shift_ending}",
+        "robots: " + ", ".join(f"{state} {count}" for state, count in sorted(states.items())),
+        "tasks: " + (", ".join(f"{status} {count}" for status, count in sorted(statuses.items())) or "none"),
+    ]
+    for robot in sim.robots:
+        task = robot.task["id"] if robot.task else "-"
+        lines.append(f"  robot {robot.id:>4} at {robot.pos} {robot.state:<16} task {task:>6} path {len(robot.path)}")
+    return "\n".join(lines)
+
+
+def profile(sim, ticks):
+    """ Steps the simulation live and returns (tick, planner seconds, step seconds) per tick. """
+    rebuild_reservations(sim)
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ticks):
+            tick, planner_before = sim.tick, sim.planner_time
+            started = time.perf_counter()
+            sim.step()
+            timings.append((tick, sim.planner_time - planner_before, time.perf_counter() - started))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a warehouse simulation event log.")
+    parser.add_argument("log", help="binary event log")
+    parser.add_argument("--tick", type=int, help="print the state at the start of this tick")
+    parser.add_argument("--profile-from", type=int, help="replay to this tick, then step live and time every tick")
+    parser.add_argument("--ticks", type=int, default=100, help="live ticks to profile")
+    parser.add_argument("--robots", action="store_true", help="list every robot in state summaries")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        replay = Replay(args.log)
+    settings = replay.settings
+    print(f"{args.log}: seed {replay.seed}, grid {settings.GRID_SIZE[0]}x{settings.GRID_SIZE[1]}, "
+          f"{len(settings.ROBOT_DEPOT_POSITIONS)} robots, {len(replay.ticks)} records, "
+          f"ticks 0-{replay.last_tick}, checkpoints every {settings.EVENT_LOG_CHECKPOINT_INTERVAL} ticks")
+
+    if args.tick is not None:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim = replay.seek(args.tick)
+        print(f"replayed to tick {args.tick} in {time.perf_counter() - started:.3f}s")
+        summary = describe(sim).splitlines()
+        print("\n".join(summary if args.robots else summary[:3]))
+
+    if args.profile_from is not None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim = replay.seek(args.profile_from)
+        timings = profile(sim, args.ticks)
+        print(f"{'tick':>8} {'planner ms':>11} {'step ms':>9}")
+        for tick, planner, step in timings:
+            print(f"{tick:>8} {planner * 1000:>11.3f} {step * 1000:>9.3f}")
+        slowest = max(timings, key=lambda t: t[2])
+        print(f"slowest: tick {slowest[0]} ({slowest[2] * 1000:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@ document.addEventListener('DOMContentLoaded', () => {
     const pickupPosSpan = document.getElementById('pickup-pos');
     const dropPosSpan = document.getElementById('drop-pos');
 
+    // --- Zone ---
+    // Routes of the zone this page shows: "" for the default zone, "/sim/<id>" for a named one.
+    const apiBase = document.body.dataset.apiBase || '';
+
     // --- State Variables ---
     let gridRows = 0;
     let gridCols = 0;
@@ -14,10 +18,27 @@ document.addEventListener('DOMContentLoaded', () => {
     let selectedDrop = null;
     let static_obstacles = [];
 
+    // --- Rendered State (only cells touched by a change are repainted) ---
+    let cells = new Map();          // "r-c" -> cell element
+    let staticObstacles = new Set();
+    let dynamicObstacles = new Set();
+    let robots = new Map();         // robot id -> latest robot entry
+    let tasks = new Map();          // task id -> active task
+    let robotsAt = new Map();       // "r-c" -> Set of robot ids standing there
+    let nextMovesAt = new Map();    // "r-c" -> Set of robot ids moving there next
+    let pickupsAt = new Map();      // "r-c" -> number of active pickups
+    let dropsAt = new Map();        // "r-c" -> number of active drops
+    let lastTick = null;
+    let eventSource = null;
+    let pollTimer = null;
+    let stepInterval = 200;
+
+    const key = (pos) => `${pos[0]}-${pos[1]}`;
+
     // --- Initialization ---
     async function initialize() {
         try {
-            const response = await fetch('/init');
+            const response = await fetch(`${apiBase}/init`);
             if (!response.ok) { // Check for server errors
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
@@ -25,26 +46,65 @@ document.addEventListener('DOMContentLoaded', () => {
             gridRows = data.grid_size[0];
             gridCols = data.grid_size[1];
             static_obstacles = data.obstacles;
+            staticObstacles = new Set(static_obstacles.map(key));
+            stepInterval = data.step_interval || 200;
             createGrid();
-            // --- FIX: Use 'robot_data' key and handle initial dynamic obstacles ---
-            updateGrid(data.robot_data, [], data.dynamic_obstacles || []);
-            setInterval(mainLoop, data.step_interval || 200);
+            applyKeyframe({ robot_data: data.robot_data, tasks: [], dynamic_obstacles: data.dynamic_obstacles || [], tick: null });
+            connectStream();
         } catch (error) {
             console.error("Initialization failed:", error);
             gridDiv.innerHTML = "<p>Error connecting to the simulation server. Please try refreshing.</p>";
         }
     }
 
-    // --- Main Simulation Loop ---
+    // --- Live Updates: server-pushed deltas, polling as a fallback ---
+    function connectStream() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        let received = false;
+        eventSource = new EventSource(`${apiBase}/stream`);
+        eventSource.addEventListener('keyframe', (event) => {
+            received = true;
+            applyKeyframe(JSON.parse(event.data));
+        });
+        eventSource.addEventListener('delta', (event) => {
+            received = true;
+            const delta = JSON.parse(event.data);
+            if (delta.base !== lastTick) {
+                // Missed a message: reconnect, the server opens every stream with a keyframe.
+                eventSource.close();
+                connectStream();
+                return;
+            }
+            applyDelta(delta);
+        });
+        eventSource.onerror = () => {
+            // The browser retries on its own; give up on streaming only if it never worked.
+            if (!received || eventSource.readyState === EventSource.CLOSED) {
+                eventSource.close();
+                startPolling();
+            }
+        };
+    }
+
+    function startPolling() {
+        if (pollTimer === null) {
+            console.warn("Event stream unavailable, falling back to polling /update.");
+            pollTimer = setInterval(mainLoop, stepInterval);
+        }
+    }
+
     async function mainLoop() {
         try {
-            const response = await fetch('/update');
+            const response = await fetch(`${apiBase}/update`);
              if (!response.ok) {
                 console.error(`HTTP error! status: ${response.status}`);
                 return;
             }
             const data = await response.json();
-            updateGrid(data.robot_data, data.tasks, data.dynamic_obstacles);
+            applyKeyframe(data);
         } catch (error) {
             console.error("Error fetching update:", error);
         }
@@ -53,6 +113,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- Grid UI Management ---
     function createGrid() {
         gridDiv.innerHTML = '';
+        cells = new Map();
         gridDiv.style.setProperty('--grid-rows', gridRows);
         gridDiv.style.setProperty('--grid-cols', gridCols);
         for (let r = 0; r < gridRows; r++) {
@@ -64,47 +125,114 @@ document.addEventListener('DOMContentLoaded', () => {
                 cell.dataset.col = c;
                 cell.addEventListener('click', onCellClick);
                 gridDiv.appendChild(cell);
+                cells.set(`${r}-${c}`, cell);
             }
         }
     }
 
-    function updateGrid(robots, tasks, dynamic_obstacles) {
-        // Clear previous state
-        document.querySelectorAll('.cell').forEach(cell => {
-            cell.className = 'cell';
-            cell.textContent = '';
-        });
+    function addToIndex(index, cellKey, id) {
+        if (!index.has(cellKey)) index.set(cellKey, new Set());
+        index.get(cellKey).add(id);
+    }
 
-        // Draw static obstacles
-        static_obstacles.forEach(obs => {
-             document.getElementById(`cell-${obs[0]}-${obs[1]}`)?.classList.add('obstacle');
-        });
-        
-        // Draw dynamic obstacles
-        dynamic_obstacles.forEach(obs => {
-            document.getElementById(`cell-${obs[0]}-${obs[1]}`)?.classList.add('dynamic-obstacle');
-        });
+    function removeFromIndex(index, cellKey, id) {
+        const ids = index.get(cellKey);
+        if (!ids) return;
+        ids.delete(id);
+        if (ids.size === 0) index.delete(cellKey);
+    }
 
-        // Draw tasks
-        tasks.forEach(task => {
-            document.getElementById(`cell-${task.pickup[0]}-${task.pickup[1]}`)?.classList.add('task-pickup');
-            document.getElementById(`cell-${task.drop[0]}-${task.drop[1]}`)?.classList.add('task-drop');
-        });
+    function bump(counts, cellKey, amount) {
+        const value = (counts.get(cellKey) || 0) + amount;
+        if (value > 0) counts.set(cellKey, value); else counts.delete(cellKey);
+    }
 
-        // Draw robots and their next intended move
-        robots.forEach(robot => {
-            const currentCell = document.getElementById(`cell-${robot.pos[0]}-${robot.pos[1]}`);
-            if (currentCell) {
-                currentCell.classList.add('robot', `robot-${robot.state}`);
-                currentCell.textContent = `R${robot.id}`;
-            }
-            if (robot.next_pos) {
-                const nextCell = document.getElementById(`cell-${robot.next_pos[0]}-${robot.next_pos[1]}`);
-                if (nextCell) {
-                    nextCell.classList.add('next-move', `robot-${robot.state}-next`);
-                }
+    function setRobot(robot, dirty) {
+        const previous = robots.get(robot.id);
+        if (previous) {
+            removeFromIndex(robotsAt, key(previous.pos), robot.id);
+            dirty.add(key(previous.pos));
+            if (previous.next_pos) {
+                removeFromIndex(nextMovesAt, key(previous.next_pos), robot.id);
+                dirty.add(key(previous.next_pos));
             }
+        }
+        robots.set(robot.id, robot);
+        addToIndex(robotsAt, key(robot.pos), robot.id);
+        dirty.add(key(robot.pos));
+        if (robot.next_pos) {
+            addToIndex(nextMovesAt, key(robot.next_pos), robot.id);
+            dirty.add(key(robot.next_pos));
+        }
+    }
+
+    function setTask(task, dirty) {
+        const previous = tasks.get(task.id);
+        if (previous) {
+            bump(pickupsAt, key(previous.pickup), -1);
+            bump(dropsAt, key(previous.drop), -1);
+            dirty.add(key(previous.pickup));
+            dirty.add(key(previous.drop));
+            tasks.delete(task.id);
+        }
+        if (task.status === 'pending' || task.status === 'assigned') {
+            const active = previous ? { ...previous, ...task } : task;
+            tasks.set(task.id, active);
+            bump(pickupsAt, key(active.pickup), 1);
+            bump(dropsAt, key(active.drop), 1);
+            dirty.add(key(active.pickup));
+            dirty.add(key(active.drop));
+        }
+    }
+
+    function applyKeyframe(state) {
+        robots = new Map();
+        tasks = new Map();
+        robotsAt = new Map();
+        nextMovesAt = new Map();
+        pickupsAt = new Map();
+        dropsAt = new Map();
+        dynamicObstacles = new Set(state.dynamic_obstacles.map(key));
+        const dirty = new Set();
+        state.robot_data.forEach(robot => setRobot(robot, dirty));
+        state.tasks.forEach(task => setTask(task, dirty));
+        lastTick = state.tick;
+        cells.forEach((cell, cellKey) => renderCell(cellKey));
+    }
+
+    function applyDelta(delta) {
+        const dirty = new Set();
+        delta.robots.forEach(robot => setRobot(robot, dirty));
+        delta.tasks.forEach(task => setTask(task, dirty));
+        delta.obstacles_added.forEach(obs => { dynamicObstacles.add(key(obs)); dirty.add(key(obs)); });
+        delta.obstacles_removed.forEach(obs => { dynamicObstacles.delete(key(obs)); dirty.add(key(obs)); });
+        lastTick = delta.tick;
+        dirty.forEach(renderCell);
+    }
+
+    function renderCell(cellKey) {
+        const cell = cells.get(cellKey);
+        if (!cell) return;
+        const classes = ['cell'];
+        let label = '';
+        if (staticObstacles.has(cellKey)) classes.push('obstacle');
+        if (dynamicObstacles.has(cellKey)) classes.push('dynamic-obstacle');
+        if (pickupsAt.has(cellKey)) classes.push('task-pickup');
+        if (dropsAt.has(cellKey)) classes.push('task-drop');
+        (robotsAt.get(cellKey) || []).forEach(id => {
+            const robot = robots.get(id);
+            classes.push('robot', `robot-${robot.state}`);
+            label = `R${robot.id}`;
+        });
+        (nextMovesAt.get(cellKey) || []).forEach(id => {
+            classes.push('next-move', `robot-${robots.get(id).state}-next`);
+        });
+        // Keep the user's pending pickup/drop selection visible.
+        ['selected-pickup', 'selected-drop'].forEach(name => {
+            if (cell.classList.contains(name)) classes.push(name);
         });
+        cell.className = classes.join(' ');
+        cell.textContent = label;
     }
 
     // --- User Interaction ---
@@ -147,7 +275,7 @@ document.addEventListener('DOMContentLoaded', () => {
     async function sendTask() {
         if (!selectedPickup || !selectedDrop) return;
         try {
-            await fetch('/add_task', {
+            await fetch(`${apiBase}/add_task`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ pickup: selectedPickup, drop: selectedDrop }),
@@ -160,7 +288,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function sendResetShift() {
         try {
-            await fetch('/reset_shift', { method: 'POST' });
+            await fetch(`${apiBase}/reset_shift`, { method: 'POST' });
             console.log("Reset shift signal sent.");
         } catch (error) {
             console.error("Failed to send reset signal:", error);
@@ -0,0 +1,179 @@
+"""
+Parameter sweep for fleet and layout sizing: many headless runs over every
+combination of fleet size, shelf pattern, clutter density and dynamic
+obstacle chance, fanned out across a process pool.
+
+    python sweep.py --grid 60x100 --robots 10 20 40 --densities 0 0.05 \\
+        --dynamic-chances 0.005 0.02 --shelf-patterns 2:3 3:3 --replicates 3 \\
+        --ticks 5000 --out sweep.jsonl
+
+Each run gets its own Settings, so nothing touches the module-level config.
+A run's seed is derived from the base seed and the run's parameters, so a
+result does not depend on pool scheduling or on which runs already exist.
+Results are appended to the JSONL file as they finish. Re-running the same
+command skips the runs already in the file, so an interrupted sweep resumes
+where it stopped. Run length, task stream, engine and scheduler are part of
+a run's parameters too: a sweep with other --ticks or --task-rate reruns
+everything instead of reusing results that do not match. At the end the replicates of each combination are
+aggregated (mean, stdev, min, max) for throughput and task latency.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import time
+import zlib
+from itertools import product
+
+import headless
+from warehouse.settings import Settings
+
+SUMMARY_METRICS = ("tasks_per_1000_ticks", "task_latency_mean", "task_latency_p95", "ticks_per_second", "planner_share")
+
+
+def run_seed(base_seed, run_id):
+    """ Deterministic 31-bit seed for one run. """
+    return zlib.crc32(f"{base_seed}:{run_id}".encode()) & 0x7FFFFFFF
+
+
+def build_runs(args):
+    """ One spec per parameter combination and replicate, in a stable order. """
+    runs = []
+    for robots, pattern, density, chance, replicate in product(
+        args.robots, args.shelf_patterns, args.densities, args.dynamic_chances, range(args.replicates)
+    ):
+        params = {
+            "grid": list(args.grid), "robots": robots, "shelf_pattern": list(pattern),
+            "obstacle_density": density, "dynamic_chance": chance, "replicate": replicate,
+            "ticks": args.ticks, "task_rate": args.task_rate, "stations": args.stations,
+            "engine": args.engine, "scheduler": args.scheduler,
+        }
+        run_id = json.dumps(params, sort_keys=True)
+        runs.append({"run_id": run_id, "params": params, "seed": run_seed(args.seed, run_id)})
+    return runs
+
+
+def execute(spec):
+    """ Worker: builds the run's Settings and runs it headless. """
+    params = spec["params"]
+    settings = Settings(**headless.overrides(
+        params["grid"], params["robots"], params["obstacle_density"], params["dynamic_chance"],
+        params["engine"], params["scheduler"], shelf_pattern=params["shelf_pattern"],
+    ))
+    started = time.time()
+    result = headless.run(params["ticks"], spec["seed"], params["task_rate"], params["stations"], settings=settings)
+    return {**spec, "started": started, "result": result}
+
+
+def load_finished(path):
+    """
+    Reads the records already in a results file. A torn last line (the sweep
+    was killed mid-write) is cut off so new records start on a clean line.
+    """
+    if not os.path.exists(path):
+        return {}
+    finished = {}
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+    for line in data[:complete].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        finished[record["run_id"]] = record
+    return finished
+
+
+def summarize(records):
+    """ Groups records by parameter combination (replicates pooled) and aggregates the metrics. """
+    groups = {}
+    for record in records:
+        params = {k: v for k, v in record["params"].items() if k != "replicate"}
+        groups.setdefault(json.dumps(params, sort_keys=True), []).append(record["result"])
+    summary = []
+    for key, results in sorted(groups.items()):
+        row = {"params": json.loads(key), "runs": len(results)}
+        for metric in SUMMARY_METRICS:
+            values = [r[metric] for r in results]
+            row[metric] = {
+                "mean": statistics.fmean(values),
+                "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+                "min": min(values),
+                "max": max(values),
+            }
+        summary.append(row)
+    return summary
+
+
+def _shelf_pattern(text):
+    shelf_rows, aisle_rows = (int(v) for v in text.split(":"))
+    return shelf_rows, aisle_rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sweep headless runs over fleet and layout settings.")
+    parser.add_argument("--grid", type=headless.parse_grid, default=(60, 100), help="rows x cols")
+    parser.add_argument("--robots", type=int, nargs="+", default=[10, 20, 40])
+    parser.add_argument("--shelf-patterns", type=_shelf_pattern, nargs="+", default=[(2, 3)],
+                        help="shelf rows:aisle rows, repeated down the grid")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.05], help="RANDOM_OBSTACLE_DENSITY values")
+    parser.add_argument("--dynamic-chances", type=float, nargs="+", default=[0.005],
+                        help="DYNAMIC_OBSTACLE_CHANCE values")
+    parser.add_argument("--replicates", type=int, default=3, help="seeded repetitions of every combination")
+    parser.add_argument("--ticks", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0, help="base seed the per-run seeds are derived from")
+    parser.add_argument("--task-rate", type=float, default=0.2)
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--engine", choices=["objects", "vectorized"])
+    parser.add_argument("--scheduler", choices=["tick", "event"], default="event")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="sweep_results.jsonl", help="JSONL results file (appended, resumable)")
+    parser.add_argument("--summary", help="also write the aggregated statistics to this JSON file")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    runs = build_runs(args)
+    finished = load_finished(args.out)
+    pending = [spec for spec in runs if spec["run_id"] not in finished]
+    print(f"{len(runs)} runs, {len(runs) - len(pending)} already in {args.out}, {len(pending)} to go")
+
+    records = [finished[spec["run_id"]] for spec in runs if spec["run_id"] in finished]
+    if pending:
+        # A fresh process per run keeps peak-memory readings and module state per run.
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes=max(1, args.workers), maxtasksperchild=1) as pool, open(args.out, "a") as out:
+            for done, record in enumerate(pool.imap_unordered(execute, pending), 1):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                records.append(record)
+                params, result = record["params"], record["result"]
+                print(f"[{done}/{len(pending)}] robots={params['robots']} shelves={params['shelf_pattern']} "
+                      f"density={params['obstacle_density']} dynamic={params['dynamic_chance']} "
+                      f"rep={params['replicate']}: tasks/1k={result['tasks_per_1000_ticks']:.1f} "
+                      f"latency p95={result['task_latency_p95']:.0f} ticks "
+                      f"{result['ticks_per_second']:.0f} ticks/s", flush=True)
+
+    summary = summarize(records)
+    print(f"{'robots':>6} {'shelves':>7} {'density':>7} {'dynamic':>7} {'runs':>4} "
+          f"{'tasks/1k':>14} {'latency':>14} {'p95':>8} {'ticks/s':>8}")
+    for row in summary:
+        p = row["params"]
+        tput, latency = row["tasks_per_1000_ticks"], row["task_latency_mean"]
+        print(f"{p['robots']:>6} {'{}:{}'.format(*p['shelf_pattern']):>7} {p['obstacle_density']:>7} "
+              f"{p['dynamic_chance']:>7} {row['runs']:>4} "
+              f"{tput['mean']:>8.1f} ±{tput['stdev']:<5.1f}{latency['mean']:>8.0f} ±{latency['stdev']:<5.0f}"
+              f"{row['task_latency_p95']['mean']:>8.0f} {row['ticks_per_second']['mean']:>8.0f}")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump({"seed": args.seed, "ticks": args.ticks, "task_rate": args.task_rate, "groups": summary},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
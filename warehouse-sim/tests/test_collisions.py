@@ -0,0 +1,26 @@
+import pytest
+import headless
+from warehouse.settings import Settings
+from warehouse.simulation import Simulation
+
+
+@pytest.mark.parametrize("seed", (0, 2, 3, 4))
+def test_active_robots_never_share_a_cell(seed):
+    # Crowded floor with temporary obstacles, so windows run out and robots have to wait or make way.
+    settings = Settings(
+        **headless.overrides(grid=(30, 40), robots=12, dynamic_chance=0.02, joint_planner="cbs", scheduler="tick"),
+        METRICS_ENABLED=False,
+    )
+    sim = Simulation(settings, seed)
+    headless.TaskStream(sim, 0.3, 200, seed).schedule(sim, 2500)
+    while sim.tick < 2500:
+        if sim.tick == 2000:
+            sim.initiate_shift_end()
+        sim.step()
+        # Idle robots hold no reservations, so only robots on a task or on their way back are checked.
+        seen = {}
+        for robot in sim.robots:
+            if robot.state == "idle":
+                continue
+            assert robot.pos not in seen, f"tick {sim.tick}: robots {seen.get(robot.pos)} and {robot.id} at {robot.pos}"
+            seen[robot.pos] = robot.id
@@ -0,0 +1,29 @@
+import random
+import pytest
+from warehouse.jps import JumpPointPlanner
+from warehouse.pathfinding import astar
+from warehouse.settings import Settings
+from warehouse.simulation import Simulation
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_jps_paths_cost_the_same_as_astar(seed):
+    # Among equally short routes JPS may pick another one than astar(), so costs are compared, not cells.
+    sim = Simulation(Settings(GRID_SIZE=(30, 40), RANDOM_OBSTACLE_DENSITY=0.1, METRICS_ENABLED=False), seed)
+    grid = sim.grid
+    planner = JumpPointPlanner(grid)
+    rng = random.Random(seed)
+    free = [(r, c) for r in range(grid.rows) for c in range(grid.cols) if not grid.is_occupied((r, c))]
+    for _ in range(200):
+        start, goal = rng.choice(free), rng.choice(free)
+        blocked = set(rng.sample(free, 20)) - {start, goal}
+        expected = astar(grid, start, goal, blocked)
+        path = planner.find_path(start, goal, blocked)
+        assert len(path) == len(expected)
+        if not path:
+            continue
+        # Unit steps over open cells, the form Robot.move_step follows.
+        assert path[0] == start and path[-1] == goal
+        for (r0, c0), (r1, c1) in zip(path, path[1:]):
+            assert abs(r1 - r0) + abs(c1 - c0) == 1
+        assert not any(grid.is_occupied(cell) or cell in blocked for cell in path[1:])
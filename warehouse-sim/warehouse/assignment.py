@@ -0,0 +1,89 @@
+import numpy as np
+
+# Finite stand-in for "unreachable" so the solver's potentials stay finite.
+UNREACHABLE_COST = 1e9
+
+
+def build_cost_matrix(grid, distance_fields, robots, tasks):
+    """
+    Builds a robots x tasks matrix of static robot-to-pickup distances in one pass.
+
+    Each distinct pickup costs one field gather over all robot cells. When more
+    pickups are uncached than there are robots, it is cheaper to BFS once from
+    each robot instead (distances are symmetric) and gather the pickups from
+    those fields. Unreachable pairs are UNREACHABLE_COST.
+    """
+    robot_cells = np.fromiter((grid.index(r.pos) for r in robots), dtype=np.intp, count=len(robots))
+    pickup_cells = np.fromiter((grid.index(t['pickup']) for t in tasks), dtype=np.intp, count=len(tasks))
+    unique_cells, inverse = np.unique(pickup_cells, return_inverse=True)
+    unique_pickups = [grid.position(int(cell)) for cell in unique_cells]
+
+    uncached = sum(1 for pickup in unique_pickups if pickup not in distance_fields)
+    if uncached <= len(robots):
+        per_pickup = np.stack([distance_fields.get(p)[robot_cells] for p in unique_pickups], axis=1)
+    else:
+        per_pickup = np.stack([distance_fields.field_from(r.pos)[unique_cells] for r in robots])
+
+    costs = per_pickup[:, inverse].astype(np.float64)
+    costs[costs < 0] = UNREACHABLE_COST
+    return costs
+
+
+def hungarian(costs):
+    """
+    Minimum-cost assignment for a rectangular cost matrix (Kuhn-Munkres with
+    potentials, O(n^2 m)); the inner column scan is vectorized with NumPy.
+    Returns (row, col) pairs, one per row of the smaller dimension.
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    transposed = costs.shape[0] > costs.shape[1]
+    if transposed:
+        costs = costs.T
+    n, m = costs.shape
+    if n == 0:
+        return []
+
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.intp)    # p[j]: row (1-based) matched to column j
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            reduced = costs[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv, np.inf)
+            j1 = int(candidates.argmin())
+            delta = candidates[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = [(int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+def solve_assignment(costs):
+    """ Optimal robot -> task pairs, skipping pairs that are unreachable. """
+    return [
+        (row, col) for row, col in hungarian(costs)
+        if costs[row, col] < UNREACHABLE_COST
+    ]
@@ -0,0 +1,338 @@
+import time
+from heapq import heappush, heappop, heapify
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class ConflictBasedSearch:
+    """
+    Conflict-Based Search (CBS): conflict-free space-time paths for a batch of
+    robots planned together, instead of one after the other.
+
+    The low level is a space-time A* per robot over (cell, step) states that
+    respects that robot's constraints, its waypoints (pickup then drop, or just
+    the depot) and, with a ReservationTable, the reservations of every robot
+    outside the batch. The high level looks at the earliest conflict between two
+    robots of the current solution and branches on it: one child forbids the
+    first robot the cell at that step, the other forbids the second robot.
+
+    Robots move every `pace` ticks and each starts at its own first move tick,
+    so conflicts are found in ticks with the same rule as the ReservationTable:
+    a cell is held from the tick a robot enters it until the tick it leaves,
+    inclusive, which also rules out head-on swaps. A robot's final cell is held
+    for goal_hold extra steps, like the last cell of a reserved window.
+
+    The low level prefers paths that cross the other robots' current paths
+    least (a conflict avoidance table): among equally short ones, or with
+    suboptimality w > 1 among those at most w times the leg's shortest distance.
+    With w > 1 the high level also picks, among the nodes whose cost (sum of
+    path lengths) is within w times the lowest, the one with the fewest
+    conflicts, as ECBS does. Together that cuts the nodes a crowded batch needs
+    from hundreds to a handful.
+    """
+    def __init__(self, grid, pace, reservations=None, field_for=None, suboptimality=1.0, goal_hold=0):
+        self.grid = grid
+        self.pace = pace
+        self.reservations = reservations # Shared ReservationTable of the robots outside the batch, if any
+        self.field_for = field_for # goal -> flat distance field for an exact heuristic, or None
+        self.suboptimality = suboptimality
+        self.goal_hold = goal_hold # Extra steps the final cell must be free for (WHCA_END_HOLD)
+        self.expansions = 0 # High-level nodes expanded over the planner's life
+        self.gave_up = None # Why the last solve() returned None: "time", "nodes" or "unsolvable"
+
+    def solve(self, agents, blocked_cells=None, now=0, budget=None, max_nodes=None):
+        """
+        agents: (robot id, start, first move tick, waypoints) per robot, with path[k]
+        entered at first move tick + k * pace and the start held from `now` until then.
+
+        Returns {robot id: [start, ..., last waypoint]}. Robots that have no path
+        even on their own are left out. Returns None when the search runs out of
+        `budget` seconds or `max_nodes` high-level nodes, or no conflict-free
+        combination exists (gave_up says which). The node budget is
+        deterministic; a `budget` makes the result depend on machine load.
+        """
+        self.gave_up = None
+        deadline = time.perf_counter() + budget if budget is not None else None
+        grid = self.grid
+        cols = grid.cols
+        size = grid.rows * cols
+        mask = grid.occupancy_mask(blocked_cells)
+        batch = {agent[0] for agent in agents}
+        specs = [
+            (start[0] * cols + start[1], first_move, [r * cols + c for r, c in waypoints])
+            for _, start, first_move, waypoints in agents
+        ]
+        try:
+            # --- Root: every robot on its own, avoiding the ones planned before it where that is free ---
+            ids, kept, paths, occupancy = [], [], [], []
+            held, clashing = {}, set()
+            for agent, spec in zip(agents, specs):
+                path = self._plan(spec, frozenset(), mask, batch, held, len(kept), deadline)
+                if path is not None:
+                    keys = self._occupancy(spec, path, now)
+                    self._hold(held, clashing, keys, 1 << len(kept))
+                    ids.append(agent[0])
+                    kept.append(spec)
+                    paths.append(path)
+                    occupancy.append(keys)
+            specs = kept
+            seq = 0
+            open_list = [(
+                sum(len(path) for path in paths), len(clashing), seq,
+                paths, [frozenset()] * len(specs), occupancy, held, clashing
+            )]
+            nodes = 0
+            while open_list:
+                if deadline is not None and time.perf_counter() > deadline:
+                    self.gave_up = "time"
+                    return None
+                if max_nodes is not None and nodes >= max_nodes:
+                    self.gave_up = "nodes"
+                    return None
+                _, _, _, paths, constraints, occupancy, held, clashing = self._pop(open_list)
+                if not clashing:
+                    return {robot_id: [divmod(cell, cols) for cell in path] for robot_id, path in zip(ids, paths)}
+                nodes += 1
+                self.expansions += 1
+                # Keys are tick * size + cell, so the smallest clashing key is the earliest conflict.
+                key = min(clashing)
+                tick, cell = divmod(key, size)
+                holders = held[key]
+                involved = [agent for agent in range(len(specs)) if holders >> agent & 1][:2]
+                for agent in involved:
+                    step = self._step_at(specs[agent], paths[agent], tick, cell)
+                    if step == 0:
+                        continue # Nobody can be kept off the cell it already stands on
+                    agent_constraints = constraints[agent] | {(step, cell)}
+                    path = self._plan(specs[agent], agent_constraints, mask, batch, held, agent, deadline)
+                    if path is None:
+                        continue
+                    keys = self._occupancy(specs[agent], path, now)
+                    child_held, child_clashing = dict(held), set(clashing)
+                    self._hold(child_held, child_clashing, occupancy[agent], 1 << agent, release=True)
+                    self._hold(child_held, child_clashing, keys, 1 << agent)
+                    child_paths, child_constraints, child_occupancy = list(paths), list(constraints), list(occupancy)
+                    child_paths[agent] = path
+                    child_constraints[agent] = agent_constraints
+                    child_occupancy[agent] = keys
+                    seq += 1
+                    heappush(open_list, (
+                        sum(len(p) for p in child_paths), len(child_clashing), seq,
+                        child_paths, child_constraints, child_occupancy, child_held, child_clashing
+                    ))
+            self.gave_up = "unsolvable"
+            return None
+        except _BudgetExceeded:
+            self.gave_up = "time"
+            return None
+
+    def _pop(self, open_list):
+        """ Best node: lowest cost, or with w > 1 the fewest conflicts within w times the lowest cost. """
+        if self.suboptimality <= 1.0:
+            return heappop(open_list)
+        bound = open_list[0][0] * self.suboptimality
+        best = min(
+            (i for i, node in enumerate(open_list) if node[0] <= bound),
+            key=lambda i: (open_list[i][1], open_list[i][0], open_list[i][2])
+        )
+        node = open_list[best]
+        open_list[best] = open_list[-1]
+        open_list.pop()
+        heapify(open_list)
+        return node
+
+    # --- High Level ---
+    def _occupancy(self, spec, path, now):
+        """ tick * size + cell for every tick a robot holds a cell along its path. """
+        _, first_move, _ = spec
+        pace = self.pace
+        size = self.grid.rows * self.grid.cols
+        last = len(path) - 1
+        keys = []
+        for step, cell in enumerate(path):
+            arrive = now if step == 0 else first_move + step * pace
+            leave = first_move + (step + 1) * pace if step < last else arrive + pace * (1 + self.goal_hold)
+            keys.extend(tick * size + cell for tick in range(arrive, leave + 1))
+        return keys
+
+    @staticmethod
+    def _hold(held, clashing, keys, bit, release=False):
+        """ Adds (or with release=True removes) one agent's keys in the occupancy table, tracking clashes. """
+        for key in keys:
+            holders = held.get(key, 0)
+            holders = holders & ~bit if release else holders | bit
+            if holders:
+                held[key] = holders
+            else:
+                held.pop(key, None)
+            if holders & (holders - 1):
+                clashing.add(key)
+            else:
+                clashing.discard(key)
+
+    def _step_at(self, spec, path, tick, cell):
+        """ The step of a path at which the robot holds `cell` at `tick` (past the end: the step it is parked at). """
+        _, first_move, _ = spec
+        step = max(0, (tick - first_move) // self.pace)
+        last = len(path) - 1
+        if step >= last:
+            return step if path[last] == cell else last - 1
+        return step if path[step] == cell else step - 1
+
+    # --- Low Level ---
+    def _plan(self, spec, constraints, mask, batch, held, agent, deadline):
+        """
+        One robot's flat path through its waypoints under its constraints ((step, cell)
+        pairs), or None. Paths avoid the cells `held` by other agents (the occupancy
+        table: tick * size + cell -> bitmask of agents) where that costs nothing, or
+        with w > 1 at most w times the leg's shortest distance.
+        """
+        start, first_move, waypoints = spec
+        size = self.grid.rows * self.grid.cols
+        held_until = max(held) // size if held else 0
+        path = [start]
+        for k, goal in enumerate(waypoints):
+            args = (path[-1], goal, len(path) - 1, first_move, constraints, mask, batch,
+                    held, held_until, agent, k == len(waypoints) - 1, deadline)
+            leg = None
+            if self.suboptimality > 1.0:
+                leg = self._search(*args, focal=True)
+            if leg is None:
+                leg = self._search(*args)
+            if leg is None:
+                return None
+            path.extend(leg[1:])
+        return path
+
+    def _search(self, start, goal, step0, first_move, constraints, mask, batch, held, held_until, agent, final,
+                deadline, focal=False):
+        """
+        Space-time A* for one leg starting at path step step0. Past the last
+        constrained, reserved or held step, time no longer matters and the search
+        folds every later step into one layer, like cooperative_astar().
+
+        Ordered by (f, clashes with other agents) it returns a shortest leg. With
+        focal=True it is ordered by (clashes, f) and never goes past w times the
+        start's heuristic (a lower bound of the leg): the least conflicted leg
+        within that bound, or None if pruning leaves none.
+        """
+        grid = self.grid
+        cols = grid.cols
+        size = grid.rows * cols
+        pace = self.pace
+        if mask[goal]:
+            return None
+        goal_r, goal_c = divmod(goal, cols)
+        field = self.field_for(divmod(goal, cols)) if self.field_for is not None else None
+        if field is not None:
+            if field[start] < 0:
+                return None
+            heuristic = lambda idx: int(field[idx])
+        else:
+            heuristic = lambda idx: abs(idx // cols - goal_r) + abs(idx % cols - goal_c)
+
+        blocked_at = set()
+        horizon = 0
+        goal_free_from = 0 # The robot may only stop on the goal at a step after its last constraint there
+        for step, cell in constraints:
+            blocked_at.add(step * size + cell)
+            horizon = max(horizon, step + 1)
+            if cell == goal and final:
+                goal_free_from = max(goal_free_from, step + 1)
+        table = self.reservations
+        if table is not None:
+            cells = table.cells
+            horizon = max(horizon, (table.latest - first_move) // pace + 2)
+
+            def is_free(cell, from_tick, to_tick):
+                for tick in range(from_tick, to_tick + 1):
+                    owner = cells.get(tick * size + cell)
+                    if owner is not None and owner not in batch:
+                        return False
+                return True
+
+            if step0 == 0 and not is_free(start, table.now, first_move + pace):
+                return None
+        horizon = max(horizon, (held_until - first_move) // pace + 1)
+        hold = pace * (1 + self.goal_hold)
+        others = ~(1 << agent)
+        bound = int(self.suboptimality * heuristic(start)) if focal else None
+
+        # State key = min(step, horizon) * size + cell; g is the real number of steps taken.
+        start_key = min(step0, horizon) * size + start
+        parent = {start_key: -1}
+        g_score = {start_key: 0}
+        closed = set()
+        clashes = {start_key: 0} # Ticks spent on cells other agents hold, along the best path
+        heap = [(0, heuristic(start), 0, start_key) if focal else (heuristic(start), 0, 0, start_key)]
+        popped = 0
+        while heap:
+            if focal:
+                clash, _, neg_g, key = heappop(heap)
+            else:
+                _, clash, neg_g, key = heappop(heap)
+            if key in closed:
+                continue
+            closed.add(key)
+            popped += 1
+            if deadline is not None and not popped & 1023 and time.perf_counter() > deadline:
+                raise _BudgetExceeded()
+            g = -neg_g
+            step = step0 + g
+            current = key % size
+            if current == goal and (not final or (
+                    step >= goal_free_from and
+                    (table is None or step >= horizon or is_free(goal, first_move + step * pace,
+                                                                 first_move + step * pace + hold)))):
+                leg = []
+                while key != -1:
+                    leg.append(key % size)
+                    key = parent[key]
+                leg.reverse()
+                return leg
+
+            g += 1
+            next_step = step + 1
+            timed = next_step <= horizon
+            c = current % cols
+            neighbors = []
+            if c + 1 < cols: neighbors.append(current + 1)
+            if c > 0: neighbors.append(current - 1)
+            if current + cols < size: neighbors.append(current + cols)
+            if current >= cols: neighbors.append(current - cols)
+            if timed:
+                neighbors.append(current) # Waiting only helps while something is still scheduled
+            layer = min(next_step, horizon) * size
+            arrive = first_move + next_step * pace
+            for nxt in neighbors:
+                if mask[nxt] and nxt != current:
+                    continue
+                if field is not None and field[nxt] < 0:
+                    continue
+                if timed:
+                    if next_step * size + nxt in blocked_at:
+                        continue
+                    if table is not None and not is_free(nxt, arrive, arrive + pace):
+                        continue
+                next_key = layer + nxt
+                if next_key in closed:
+                    continue
+                next_clash = clash
+                if timed:
+                    for tick in (arrive, arrive + pace):
+                        if held.get(tick * size + nxt, 0) & others:
+                            next_clash += 1
+                f = g + heuristic(nxt)
+                best = g_score.get(next_key)
+                if focal:
+                    if f > bound or (best is not None and (clashes[next_key], best) <= (next_clash, g)):
+                        continue
+                elif best is not None and (best, clashes[next_key]) <= (g, next_clash):
+                    continue
+                g_score[next_key] = g
+                clashes[next_key] = next_clash
+                parent[next_key] = key
+                heappush(heap, (next_clash, f, -g, next_key) if focal else (f, next_clash, -g, next_key))
+        return None
@@ -0,0 +1,411 @@
+"""
+Versioned checkpoints of a whole Simulation, for warm restarts.
+
+Layout, all little-endian:
+    header      struct HEADER (magic, version, tick, metadata length)
+    metadata    JSON: the simulation's Settings, seed, RNG state, counters,
+                the reservation table's clock, and the dtype, length and byte
+                range of every array section
+    arrays      zlib-compressed flat arrays: the static mask, robots (state,
+                positions, paths, sensed obstacles), tasks, temporary
+                obstacles, scheduled events, reservations, task latencies
+
+Everything per robot, task or event is a column of fixed-width numbers (cells
+are flat grid indices), so thousands of robots cost a few array copies to
+capture and one decompression each to restore. Derived data (distance fields,
+HPA* graphs, cached routes, the grid's occupancy index, metrics) is not stored:
+it is rebuilt on restore or refills as the run goes on.
+
+capture() takes a consistent snapshot under the caller's lock using only
+shallow copies, so the tick stalls for a few milliseconds; encoding,
+compressing and writing happen later, on CheckpointWriter's thread. Files are
+written next to the target and renamed over it, so a crash mid-write leaves
+the previous checkpoint intact.
+"""
+import itertools
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+import numpy as np
+from .layout import Layout, layout_metadata
+from .settings import Settings
+from .simulation import Simulation, EVENT_TASK, EVENT_CLEAR, EVENT_SPAWN
+from .wire import ROBOT_STATES, ROBOT_STATE_CODES, TASK_STATUSES, TASK_STATUS_CODES
+
+MAGIC = b"WHCK"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxQI")
+EVENT_KINDS = (EVENT_TASK, EVENT_CLEAR, EVENT_SPAWN)
+EVENT_KIND_CODES = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+NONE = -1 # No task / no cell
+NO_DEADLINE = np.iinfo(np.int64).min
+COMPRESSION_LEVEL = 1
+
+
+# --- Capture ---
+def capture(sim):
+    """
+    Snapshot of everything a restore needs, taken at a tick boundary (call it
+    between steps, under the runner's lock). Only shallow copies are made here;
+    encode() turns the snapshot into the file contents later, off the tick.
+    """
+    cols = sim.grid.cols
+    fleet = sim.fleet
+    if fleet is not None:
+        # The fleet already keeps robots as arrays: copy them, and gather the live path cells in one go.
+        n = fleet.count
+        cursor, end = fleet.path_cursor[:n], fleet.path_end[:n]
+        lengths = end - cursor
+        path_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=path_offsets[1:])
+        gather = np.arange(path_offsets[-1], dtype=np.int64) + np.repeat(cursor - path_offsets[:-1], lengths)
+        robots = {
+            "pos": fleet.pos[:n].copy(), "state": fleet.state[:n].copy(), "pace": fleet.pace[:n].copy(),
+            "moves": fleet.moves[:n].copy(), "window": fleet.window[:n].copy(),
+            "task": [task["id"] if task else NONE for task in fleet.tasks],
+            "path_offsets": path_offsets, "path_cells": fleet.path_buffer[gather],
+        }
+    else:
+        robot_list = sim.robots
+        robots = {
+            "pos": [r.pos[0] * cols + r.pos[1] for r in robot_list],
+            "state": [ROBOT_STATE_CODES[r.state] for r in robot_list],
+            "pace": [r.pace_counter for r in robot_list],
+            "moves": [r.moves_since_plan for r in robot_list],
+            "window": [r.window for r in robot_list],
+            "task": [r.task["id"] if r.task else NONE for r in robot_list],
+            "paths": [list(r.path) for r in robot_list],
+        }
+    robots["ids"] = [r.id for r in sim.robots]
+    robots["seen"] = [list(r.temp_obstacles) for r in sim.robots]
+
+    # Task dicts change status in place, so their fields are copied out.
+    tasks = [
+        (t["id"], t["pickup"], t["drop"], t["status"], t["priority"], t["deadline"], t["created"])
+        for t in itertools.chain(
+            sim.tasks.active.values(),
+            sim.tasks.by_status["completed"].values(),
+            sim.tasks.by_status["cancelled"].values(),
+        )
+    ]
+    table = sim.reservations
+    return {
+        "settings": sim.settings,
+        "seed": sim.seed,
+        "rng": sim.rng.getstate(),
+        "tick": sim.tick,
+        "task_id_counter": sim.task_id_counter,
+        "tasks_completed": sim.tasks_completed,
+        "is_shift_ending": sim.is_shift_ending,
+        "planner_time": sim.planner_time,
+        "steps_executed": sim.steps_executed,
+        "cols": cols,
+        "mask": bytes(sim.grid.mask),
+        "robots": robots,
+        "tasks": tasks,
+        "obstacles": list(sim.dynamic_obstacles), # In set order, which the next clear's draw depends on
+        "events": list(sim.events), # Heap order; entries are tuples
+        "reservations": None if table is None else {
+            "now": table.now, "latest": table.latest,
+            "keys": [(robot_id, list(keys)) for robot_id, keys in table.by_robot.items() if keys],
+        },
+        "latencies": list(sim.task_latencies),
+    }
+
+
+# --- Encoding ---
+def _flat(cells, cols):
+    return [r * cols + c for r, c in cells]
+
+
+def _ragged(lists):
+    """ (offsets, values) of a list of lists. """
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=offsets[1:])
+    return offsets, list(itertools.chain.from_iterable(lists))
+
+
+def encode(snapshot):
+    """ The checkpoint file contents for a snapshot from capture(). """
+    cols = snapshot["cols"]
+    robots = snapshot["robots"]
+    arrays = {"mask": np.frombuffer(snapshot["mask"], dtype=np.uint8)}
+    for name in ("ids", "pos", "pace", "moves", "window", "task"):
+        arrays[f"robot_{name}"] = np.asarray(robots[name], dtype=np.int32)
+    arrays["robot_state"] = np.asarray(robots["state"], dtype=np.int8)
+    if "paths" in robots:
+        offsets, cells = _ragged([_flat(path, cols) for path in robots["paths"]])
+        arrays["path_offsets"], arrays["path_cells"] = offsets, np.asarray(cells, dtype=np.int32)
+    else:
+        arrays["path_offsets"], arrays["path_cells"] = robots["path_offsets"], robots["path_cells"]
+    offsets, cells = _ragged([_flat(seen, cols) for seen in robots["seen"]])
+    arrays["seen_offsets"], arrays["seen_cells"] = offsets, np.asarray(cells, dtype=np.int32)
+
+    tasks = snapshot["tasks"]
+    arrays["task_ids"] = np.asarray([t[0] for t in tasks], dtype=np.int64)
+    arrays["task_pickup"] = np.asarray([t[1][0] * cols + t[1][1] for t in tasks], dtype=np.int32)
+    arrays["task_drop"] = np.asarray([t[2][0] * cols + t[2][1] for t in tasks], dtype=np.int32)
+    arrays["task_status"] = np.asarray([TASK_STATUS_CODES[t[3]] for t in tasks], dtype=np.int8)
+    arrays["task_priority"] = np.asarray([t[4] for t in tasks], dtype=np.int64)
+    arrays["task_deadline"] = np.asarray([NO_DEADLINE if t[5] is None else t[5] for t in tasks], dtype=np.int64)
+    arrays["task_created"] = np.asarray([t[6] for t in tasks], dtype=np.int64)
+
+    arrays["obstacles"] = np.asarray(_flat(snapshot["obstacles"], cols), dtype=np.int32)
+    events = snapshot["events"]
+    arrays["event_tick"] = np.asarray([e[0] for e in events], dtype=np.int64)
+    arrays["event_order"] = np.asarray([e[1] for e in events], dtype=np.int8)
+    arrays["event_seq"] = np.asarray([e[2] for e in events], dtype=np.int64)
+    arrays["event_kind"] = np.asarray([EVENT_KIND_CODES[e[3]] for e in events], dtype=np.int8)
+    arrays["event_pickup"] = np.asarray([e[4][0][0] * cols + e[4][0][1] if e[4] else NONE for e in events],
+                                        dtype=np.int32)
+    arrays["event_drop"] = np.asarray([e[4][1][0] * cols + e[4][1][1] if e[4] else NONE for e in events],
+                                      dtype=np.int32)
+
+    reservations = snapshot["reservations"]
+    if reservations is not None:
+        held = reservations["keys"]
+        offsets, keys = _ragged([keys for _, keys in held])
+        arrays["reservation_robots"] = np.asarray([robot_id for robot_id, _ in held], dtype=np.int32)
+        arrays["reservation_offsets"], arrays["reservation_keys"] = offsets, np.asarray(keys, dtype=np.int64)
+    arrays["latencies"] = np.asarray(snapshot["latencies"], dtype=np.int64)
+
+    blobs, directory, offset = [], {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        blob = zlib.compress(array.astype(array.dtype.newbyteorder("<"), copy=False).tobytes(), COMPRESSION_LEVEL)
+        directory[name] = [array.dtype.newbyteorder("<").str, len(array), offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    rng_version, rng_state, gauss_next = snapshot["rng"]
+    metadata = json.dumps({
+        "settings": json.loads(snapshot["settings"].to_json()),
+        "seed": snapshot["seed"],
+        "rng": [rng_version, list(rng_state), gauss_next],
+        "task_id_counter": snapshot["task_id_counter"],
+        "tasks_completed": snapshot["tasks_completed"],
+        "is_shift_ending": snapshot["is_shift_ending"],
+        "planner_time": snapshot["planner_time"],
+        "steps_executed": snapshot["steps_executed"],
+        "mask_crc": zlib.crc32(snapshot["mask"]),
+        "reservations": None if reservations is None else {
+            "now": reservations["now"], "latest": reservations["latest"],
+        },
+        "arrays": directory,
+    }).encode()
+    return b"".join([HEADER.pack(MAGIC, VERSION, snapshot["tick"], len(metadata)), metadata, *blobs])
+
+
+def write_checkpoint(snapshot, path):
+    """ Encodes a snapshot and atomically replaces the checkpoint at path; returns the size in bytes. """
+    data = encode(snapshot)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return len(data)
+
+
+def save(sim, path):
+    """ Captures and writes a checkpoint right away (on the calling thread). """
+    return write_checkpoint(capture(sim), path)
+
+
+# --- Restore ---
+def read_checkpoint(path):
+    """ (tick, metadata, arrays by name) of a checkpoint file; ValueError if it is not one. """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError("Not a warehouse checkpoint.")
+    magic, version, tick, metadata_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} warehouse checkpoint.")
+    start = HEADER.size + metadata_len
+    metadata = json.loads(data[HEADER.size:start])
+    arrays = {}
+    for name, (dtype, length, offset, size) in metadata["arrays"].items():
+        if start + offset + size > len(data):
+            raise ValueError("Checkpoint is truncated.")
+        try:
+            raw = zlib.decompress(data[start + offset:start + offset + size])
+        except zlib.error as error:
+            raise ValueError(f"Checkpoint section '{name}' is corrupt: {error}") from None
+        arrays[name] = np.frombuffer(raw, dtype=np.dtype(dtype), count=length)
+    return tick, metadata, arrays
+
+
+def load(path):
+    """ A new Simulation in exactly the state a checkpoint was taken in. """
+    tick, metadata, arrays = read_checkpoint(path)
+    settings = Settings.from_json(metadata["settings"])
+    # A restored run starts a fresh event log once its state is in place, not from the blank simulation.
+    log_path, settings.EVENT_LOG_PATH = settings.EVENT_LOG_PATH, None
+    rows, cols = settings.GRID_SIZE
+    mask = arrays["mask"]
+    layout = None
+    if settings.LAYOUT_PATH and os.path.exists(settings.LAYOUT_PATH):
+        layout = Layout.open(settings.LAYOUT_PATH) # Keeps its distance tables, if the floor is the same one
+        if zlib.crc32(layout.mask) != metadata["mask_crc"]:
+            layout = None
+    if layout is None:
+        layout = Layout(rows, cols, bytearray(mask.tobytes()), layout_metadata(settings, metadata["seed"]))
+    sim = Simulation(settings, metadata["seed"], layout)
+
+    rng_version, rng_state, gauss_next = metadata["rng"]
+    sim.rng.setstate((rng_version, tuple(rng_state), gauss_next))
+    sim.tick = tick
+    sim.task_id_counter = metadata["task_id_counter"]
+    sim.tasks_completed = metadata["tasks_completed"]
+    sim.is_shift_ending = metadata["is_shift_ending"]
+    sim.planner_time = metadata["planner_time"]
+    sim.steps_executed = metadata["steps_executed"]
+    sim.task_latencies.extend(arrays["latencies"].tolist())
+
+    # --- Tasks and scheduled events ---
+    statuses = [TASK_STATUSES[code] for code in arrays["task_status"].tolist()]
+    sim.tasks.reset(
+        {
+            "id": task_id, "pickup": divmod(pickup, cols), "drop": divmod(drop, cols), "status": status,
+            "created": created, "priority": priority, "deadline": None if deadline == NO_DEADLINE else deadline,
+        }
+        for task_id, pickup, drop, status, priority, deadline, created in zip(
+            arrays["task_ids"].tolist(), arrays["task_pickup"].tolist(), arrays["task_drop"].tolist(), statuses,
+            arrays["task_priority"].tolist(), arrays["task_deadline"].tolist(), arrays["task_created"].tolist(),
+        )
+    )
+    sim.events = [
+        (event_tick, order, seq, EVENT_KINDS[kind],
+         (divmod(pickup, cols), divmod(drop, cols)) if pickup != NONE else None)
+        for event_tick, order, seq, kind, pickup, drop in zip(
+            arrays["event_tick"].tolist(), arrays["event_order"].tolist(), arrays["event_seq"].tolist(),
+            arrays["event_kind"].tolist(), arrays["event_pickup"].tolist(), arrays["event_drop"].tolist(),
+        )
+    ]
+    # Sequence numbers only break ties between events due on the same tick: continue above the saved ones.
+    sim._event_seq = itertools.count(int(arrays["event_seq"].max()) + 1 if len(sim.events) else 0)
+    sim.dynamic_obstacles = set()
+    for cell in arrays["obstacles"].tolist():
+        pos = divmod(cell, cols)
+        sim.dynamic_obstacles.add(pos)
+        sim.grid.watch_cell(pos)
+
+    # --- Robots ---
+    robots = {robot.id: robot for robot in sim.robots}
+    path_offsets, path_cells = arrays["path_offsets"].tolist(), arrays["path_cells"].tolist()
+    seen_offsets, seen_cells = arrays["seen_offsets"].tolist(), arrays["seen_cells"].tolist()
+    for i, (robot_id, pos, state, task_id, pace, moves, window) in enumerate(zip(
+        arrays["robot_ids"].tolist(), arrays["robot_pos"].tolist(), arrays["robot_state"].tolist(),
+        arrays["robot_task"].tolist(), arrays["robot_pace"].tolist(), arrays["robot_moves"].tolist(),
+        arrays["robot_window"].tolist(),
+    )):
+        robot = robots[robot_id]
+        pos = divmod(pos, cols)
+        sim.grid.place_robot(robot.id, robot.pos, pos)
+        robot.pos = pos
+        robot.path = [divmod(cell, cols) for cell in path_cells[path_offsets[i]:path_offsets[i + 1]]]
+        robot.state = ROBOT_STATES[state]
+        robot.task = sim.tasks.get(task_id) if task_id != NONE else None
+        robot.pace_counter = pace
+        robot.moves_since_plan = moves
+        robot.window = window
+        robot.temp_obstacles = {divmod(cell, cols) for cell in seen_cells[seen_offsets[i]:seen_offsets[i + 1]]}
+        robot.incremental = {}
+        robot._claim_path()
+
+    table = sim.reservations
+    saved = metadata["reservations"]
+    if table is not None and saved is not None:
+        table.now, table.latest = saved["now"], saved["latest"]
+        table.cells, table.by_robot = {}, {}
+        offsets, keys = arrays["reservation_offsets"].tolist(), arrays["reservation_keys"].tolist()
+        for i, robot_id in enumerate(arrays["reservation_robots"].tolist()):
+            held = keys[offsets[i]:offsets[i + 1]]
+            table.by_robot[robot_id] = deque(held)
+            table.cells.update(dict.fromkeys(held, robot_id))
+
+    if log_path:
+        sim.settings.EVENT_LOG_PATH = log_path
+        sim._open_event_log()
+    return sim
+
+
+# --- Background Writer ---
+class CheckpointWriter:
+    """
+    Checkpoints one simulation every `interval` ticks. The owner calls tick()
+    after each step while it holds the simulation's lock; tick() only captures,
+    and a background thread encodes and writes. If a write is still running
+    when the next capture arrives, the newer capture replaces any waiting one.
+    """
+    def __init__(self, path, interval, metrics=None):
+        self.path = path
+        self.interval = interval
+        self.metrics = metrics # The simulation's Metrics, if it keeps them
+        self.next_tick = None
+        self.written = 0
+        self.last_tick = None # Tick of the newest checkpoint on disk
+        self.lock = threading.Lock()
+        self.pending = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_settings(cls, settings, metrics=None):
+        """ A writer for CHECKPOINT_PATH, or None if checkpoints are off. """
+        if not settings.CHECKPOINT_PATH:
+            return None
+        return cls(settings.CHECKPOINT_PATH, settings.CHECKPOINT_INTERVAL, metrics)
+
+    def tick(self, sim):
+        """ Captures a checkpoint if one is due (call between steps, holding the simulation's lock). """
+        if self.next_tick is None:
+            self.next_tick = sim.tick + self.interval
+        if sim.tick < self.next_tick:
+            return
+        self.next_tick = sim.tick + self.interval
+        self.submit(sim)
+
+    def submit(self, sim):
+        """ Captures now and queues the write. """
+        started = time.perf_counter()
+        snapshot = capture(sim)
+        if self.metrics is not None:
+            self.metrics.checkpoint_seconds.observe(time.perf_counter() - started, "capture")
+        with self.lock:
+            self.pending = snapshot
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self.lock:
+                snapshot, self.pending = self.pending, None
+            if snapshot is not None:
+                started = time.perf_counter()
+                size = write_checkpoint(snapshot, self.path)
+                self.written += 1
+                self.last_tick = snapshot["tick"]
+                if self.metrics is not None:
+                    self.metrics.checkpoint_seconds.observe(time.perf_counter() - started, "write")
+                    self.metrics.checkpoint_bytes.set(size)
+            if self._stop.is_set():
+                return
+
+    def close(self):
+        """ Waits for the queued checkpoint (if any) to be written and stops the thread. """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,154 @@
+import time
+from collections import OrderedDict, deque
+import numpy as np
+import config
+
+UNREACHABLE = -1
+
+
+class DistanceFieldCache:
+    """
+    LRU cache of goal distance fields over the static layout.
+
+    Each field is a reverse BFS from one goal cell (pickup, drop or depot) stored
+    as a flat NumPy array, so "how far is robot X from goal Y" is a single lookup
+    and a shortest path is a greedy descent instead of a fresh search. Fields
+    stored in a layout file can be loaded up front and are then used instead of
+    a BFS on a miss. The whole cache is dropped when the grid's static layout
+    changes.
+    """
+    def __init__(self, grid, capacity=None):
+        self.grid = grid
+        self.capacity = capacity if capacity is not None else config.DISTANCE_FIELD_CACHE_SIZE
+        self.fields = OrderedDict()
+        self.stored = {} # goal -> precomputed field (e.g. mapped from a layout file), used on a miss
+        self.layout_version = grid.layout_version
+        self.metrics = None # The simulation's Metrics, if it keeps them
+        size = grid.rows * grid.cols
+        # Distances never exceed the number of cells, so use the smallest dtype that fits.
+        self.dtype = np.int16 if size <= np.iinfo(np.int16).max else np.int32
+
+    def invalidate(self):
+        """ Drops every cached field (the static layout changed). """
+        self.fields.clear()
+        self.stored.clear()
+        self.layout_version = self.grid.layout_version
+
+    def load(self, fields):
+        """ Registers precomputed fields {goal: flat field} for the current static layout. """
+        for goal, field in fields.items():
+            self.stored[goal] = field.astype(self.dtype, copy=False)
+
+    def prewarm(self, goals):
+        """ Computes fields for a set of well-known goals, e.g. the robot depots. """
+        # Only the last `capacity` of them would survive in the cache, so only those are computed.
+        for goal in list(dict.fromkeys(goals))[-self.capacity:]:
+            self.get(goal)
+
+    def get(self, goal):
+        """ Returns the flat distance field for a goal cell, computing it on a miss. """
+        if self.layout_version != self.grid.layout_version:
+            self.invalidate()
+        field = self.fields.get(goal)
+        metrics = self.metrics
+        if field is not None:
+            self.fields.move_to_end(goal)
+            if metrics is not None:
+                metrics.distance_field_lookups.inc(label="hit")
+            return field
+        field = self.stored.get(goal)
+        if field is not None:
+            if metrics is not None:
+                metrics.distance_field_lookups.inc(label="stored")
+        elif metrics is None:
+            field = self._compute(goal)
+        else:
+            started = time.perf_counter()
+            field = self._compute(goal)
+            metrics.distance_field_seconds.observe(time.perf_counter() - started)
+            metrics.distance_field_lookups.inc(label="miss")
+        self.fields[goal] = field
+        if len(self.fields) > self.capacity:
+            self.fields.popitem(last=False)
+        return field
+
+    def __contains__(self, goal):
+        return self.layout_version == self.grid.layout_version and (goal in self.fields or goal in self.stored)
+
+    def field_from(self, pos):
+        """ Uncached field rooted at pos; by symmetry it holds distances from pos to every cell. """
+        return self._compute(pos)
+
+    def distance(self, goal, pos):
+        """ Static shortest-path distance from pos to goal, or UNREACHABLE. """
+        return int(self.get(goal)[pos[0] * self.grid.cols + pos[1]])
+
+    def descend(self, start, goal, blocked_cells=None):
+        """
+        Extracts a shortest path by walking the goal's field downhill from start.
+
+        Returns [] if the goal is statically unreachable, or None if every
+        shortest path is cut by blocked_cells and the caller has to search.
+        """
+        field = self.get(goal)
+        cols = self.grid.cols
+        size = self.grid.rows * cols
+        current = start[0] * cols + start[1]
+        dist = int(field[current])
+        if dist == UNREACHABLE:
+            return []
+        blocked_cells = blocked_cells or ()
+        if dist > 0 and goal in blocked_cells:
+            return None
+
+        path = [start]
+        while dist > 0:
+            r, c = divmod(current, cols)
+            target = dist - 1
+            for nxt, pos, valid in (
+                (current + 1, (r, c + 1), c + 1 < cols),
+                (current - 1, (r, c - 1), c > 0),
+                (current + cols, (r + 1, c), current + cols < size),
+                (current - cols, (r - 1, c), current >= cols),
+            ):
+                if valid and field[nxt] == target and pos not in blocked_cells:
+                    break
+            else:
+                return None
+            current = nxt
+            dist = target
+            path.append(pos)
+        return path
+
+    def _compute(self, goal):
+        """ Reverse BFS from goal over the static mask (4-connected, unit cost). """
+        grid = self.grid
+        cols = grid.cols
+        size = grid.rows * cols
+        dist = [UNREACHABLE] * size
+        if not grid.is_valid(goal):
+            return np.array(dist, dtype=self.dtype)
+        goal_idx = goal[0] * cols + goal[1]
+        mask = grid.mask
+        if not mask[goal_idx]:
+            dist[goal_idx] = 0
+            queue = deque([goal_idx])
+            while queue:
+                current = queue.popleft()
+                d = dist[current] + 1
+                c = current % cols
+                if c + 1 < cols and not mask[current + 1] and dist[current + 1] == UNREACHABLE:
+                    dist[current + 1] = d
+                    queue.append(current + 1)
+                if c > 0 and not mask[current - 1] and dist[current - 1] == UNREACHABLE:
+                    dist[current - 1] = d
+                    queue.append(current - 1)
+                nxt = current + cols
+                if nxt < size and not mask[nxt] and dist[nxt] == UNREACHABLE:
+                    dist[nxt] = d
+                    queue.append(nxt)
+                nxt = current - cols
+                if nxt >= 0 and not mask[nxt] and dist[nxt] == UNREACHABLE:
+                    dist[nxt] = d
+                    queue.append(nxt)
+        return np.array(dist, dtype=self.dtype)
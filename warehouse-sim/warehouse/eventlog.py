@@ -0,0 +1,273 @@
+"""
+Append-only binary event log of a simulation run, and its replay.
+
+Layout, all little-endian:
+    header      struct HEADER (magic, version, seed, CRC-32 of the static
+                obstacle mask, settings length) followed by the simulation's
+                Settings as JSON
+    records     struct RECORD (tick, kind, payload length) + payload, in the
+                order things happened
+
+Records carry the simulation's external inputs and the outcome of every
+decision, never the search that produced it: tasks added, temporary
+obstacles appearing and clearing, task assignments, every committed robot
+plan (state + path cells), shift start/end, plus a full state CHECKPOINT
+every EVENT_LOG_CHECKPOINT_INTERVAL ticks (and at tick 0).
+
+A record's tick is sim.tick when it was written, so it applies before the
+movement phase of that tick. Replay rebuilds the static layout from the seed
+and the settings (checked against the logged mask CRC), then applies the records tick by tick and only runs robot
+movement (Robot.move_step / Fleet.move_step) in between: no planning, no
+random draws. Replay.seek() restores the closest checkpoint at or before the
+requested tick and replays forward from there.
+"""
+import bisect
+import json
+import struct
+import zlib
+import numpy as np
+from .wire import ROBOT_STATES, ROBOT_STATE_CODES
+
+MAGIC = b"WHLG"
+VERSION = 2
+HEADER = struct.Struct("<4sHQII")
+RECORD = struct.Struct("<IBI")
+
+TASK_ADDED, OBSTACLE_ADDED, OBSTACLE_CLEARED, ASSIGNED, PLAN, SHIFT_END, SHIFT_ENDED, CHECKPOINT = range(8)
+TASK = struct.Struct("<iiiiiii") # task id, pickup row, pickup col, drop row, drop col, priority, deadline (-1: none)
+CELL = struct.Struct("<ii")      # row, col
+ASSIGNMENT = struct.Struct("<ii")  # robot id, task id
+PLAN_HEAD = struct.Struct("<iBi")  # robot id, state code, moves since plan; then int32 flat path cells
+
+
+class EventLog:
+    """ Writes one simulation's records; the simulation calls it at every logged event. """
+    def __init__(self, path, sim, checkpoint_interval=None):
+        self.path = path
+        self.sim = sim
+        self.cols = sim.grid.cols
+        self.checkpoint_interval = (
+            checkpoint_interval if checkpoint_interval is not None
+            else sim.settings.EVENT_LOG_CHECKPOINT_INTERVAL
+        )
+        self.next_checkpoint = sim.tick
+        self.file = open(path, "wb")
+        settings = sim.settings.to_json().encode()
+        self.file.write(HEADER.pack(MAGIC, VERSION, sim.seed, zlib.crc32(sim.grid.mask), len(settings)))
+        self.file.write(settings)
+        self.checkpoint()
+
+    def _write(self, kind, payload=b""):
+        self.file.write(RECORD.pack(self.sim.tick, kind, len(payload)))
+        self.file.write(payload)
+
+    # --- Records ---
+    def task_added(self, task):
+        deadline = task["deadline"] if task["deadline"] is not None else -1
+        self._write(TASK_ADDED, TASK.pack(task["id"], *task["pickup"], *task["drop"], task["priority"], deadline))
+
+    def obstacle_added(self, pos):
+        self._write(OBSTACLE_ADDED, CELL.pack(*pos))
+
+    def obstacle_cleared(self, pos):
+        self._write(OBSTACLE_CLEARED, CELL.pack(*pos))
+
+    def assigned(self, robot_id, task_id):
+        self._write(ASSIGNED, ASSIGNMENT.pack(robot_id, task_id))
+
+    def plan(self, robot):
+        cells = np.fromiter((r * self.cols + c for r, c in robot.path), dtype="<i4", count=len(robot.path))
+        self._write(PLAN, PLAN_HEAD.pack(robot.id, ROBOT_STATE_CODES[robot.state], robot.moves_since_plan) + cells.tobytes())
+
+    def shift_end(self):
+        self._write(SHIFT_END)
+
+    def shift_ended(self):
+        self._write(SHIFT_ENDED)
+
+    def checkpoint(self):
+        """ Writes the full state as of the start of sim.tick and flushes the file. """
+        self._write(CHECKPOINT, json.dumps(capture_state(self.sim)).encode())
+        self.file.flush()
+        self.next_checkpoint = self.sim.tick + self.checkpoint_interval
+
+    def end_of_tick(self):
+        """ Called once a tick is complete (sim.tick already advanced). """
+        if self.sim.tick >= self.next_checkpoint:
+            self.checkpoint()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+# --- State Checkpoints ---
+def capture_state(sim):
+    """ Everything replay needs to resume from the start of sim.tick, as JSON-safe data. """
+    return {
+        "tick": sim.tick,
+        "task_id_counter": sim.task_id_counter,
+        "tasks_completed": sim.tasks_completed,
+        "is_shift_ending": sim.is_shift_ending,
+        "tasks": [dict(t) for t in sim.tasks],
+        "dynamic_obstacles": sorted(sim.dynamic_obstacles),
+        "robots": [
+            {
+                "id": r.id, "pos": r.pos, "state": r.state, "path": list(r.path),
+                "task": r.task["id"] if r.task else None,
+                "pace_counter": r.pace_counter, "moves_since_plan": r.moves_since_plan,
+            }
+            for r in sim.robots
+        ],
+    }
+
+
+def restore_state(sim, state):
+    """ Puts a simulation back into a captured state (see rebuild_reservations for going live). """
+    sim.tick = state["tick"]
+    sim.task_id_counter = state["task_id_counter"]
+    sim.tasks_completed = state["tasks_completed"]
+    sim.is_shift_ending = state["is_shift_ending"]
+    sim.tasks.reset(
+        {**t, "pickup": tuple(t["pickup"]), "drop": tuple(t["drop"])} for t in state["tasks"]
+    )
+    for pos in list(sim.grid.watched):
+        sim.grid.unwatch_cell(pos)
+    sim.dynamic_obstacles = {tuple(pos) for pos in state["dynamic_obstacles"]}
+    for pos in sim.dynamic_obstacles:
+        sim.grid.watch_cell(pos)
+    robots = {r.id: r for r in sim.robots}
+    for saved in state["robots"]:
+        robot = robots[saved["id"]]
+        pos = tuple(saved["pos"])
+        sim.grid.place_robot(robot.id, robot.pos, pos)
+        robot.pos = pos
+        robot.path = [tuple(cell) for cell in saved["path"]]
+        robot.state = saved["state"]
+        robot.task = sim.tasks.get(saved["task"]) if saved["task"] is not None else None
+        robot.pace_counter = saved["pace_counter"]
+        robot.moves_since_plan = saved["moves_since_plan"]
+        robot.temp_obstacles = set()
+        robot.incremental = {}
+        robot._claim_path()
+
+
+def rebuild_reservations(sim):
+    """
+    Replay never reserves anything. Before a replayed simulation is stepped
+    live (e.g. to profile a slow tick) every active robot re-reserves the
+    first WHCA* window of the path it is on, as if it had just planned it.
+    """
+    if sim.reservations is not None:
+        sim.reservations.advance(sim.tick)
+        for robot in sim.robots:
+            robot._release_reservations()
+            if robot.state != "idle" and robot.path:
+                sim.reservations.reserve_path(
+                    robot.id, robot.pos, robot.path,
+                    sim.reservations.first_move_tick(robot.pace_counter),
+                    sim.settings.WHCA_WINDOW, linger=sim.settings.WHCA_END_HOLD
+                )
+
+
+# --- Replay ---
+class Replay:
+    """
+    Rebuilds a logged run without planning. The whole log is indexed on open
+    (record headers only); seek(tick) and step() then move a private
+    Simulation through the run.
+    """
+    def __init__(self, path):
+        from .settings import Settings
+        from .simulation import Simulation
+
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, self.seed, mask_crc, settings_len = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} warehouse event log.")
+        offset = HEADER.size
+        overrides = json.loads(self.data[offset:offset + settings_len])
+        offset += settings_len
+        overrides["EVENT_LOG_PATH"] = None # Replaying must not write a log of its own
+        self.settings = Settings.from_json(overrides)
+
+        # Record index: parallel lists of (tick, kind, payload start, payload end).
+        self.ticks, self.kinds, self.starts, self.ends = [], [], [], []
+        self.checkpoints = [] # Record numbers of the CHECKPOINT records
+        size = len(self.data)
+        while offset + RECORD.size <= size:
+            tick, kind, length = RECORD.unpack_from(self.data, offset)
+            start = offset + RECORD.size
+            if start + length > size:
+                break # Torn last record of a log that is still being written (or crashed)
+            if kind == CHECKPOINT:
+                self.checkpoints.append(len(self.ticks))
+            self.ticks.append(tick)
+            self.kinds.append(kind)
+            self.starts.append(start)
+            self.ends.append(start + length)
+            offset = start + length
+        if not self.checkpoints:
+            raise ValueError("Event log has no checkpoint to start from.")
+        self.checkpoint_ticks = [self.ticks[i] for i in self.checkpoints]
+        self.last_tick = self.ticks[-1]
+
+        self.sim = Simulation(self.settings, self.seed)
+        if zlib.crc32(self.sim.grid.mask) != mask_crc:
+            raise ValueError("The layout rebuilt from the log's seed does not match the logged one.")
+        self.cursor = 0 # Next record to apply
+
+    def seek(self, tick):
+        """ Restores the closest checkpoint at or before tick, then replays up to the start of tick. """
+        at = max(0, bisect.bisect_right(self.checkpoint_ticks, tick) - 1)
+        record = self.checkpoints[at]
+        restore_state(self.sim, json.loads(self.data[self.starts[record]:self.ends[record]]))
+        self.cursor = record + 1
+        while self.sim.tick < tick:
+            self.step()
+        return self.sim
+
+    def step(self):
+        """ Applies the records of the current tick, then moves the robots one tick. """
+        sim = self.sim
+        while self.cursor < len(self.ticks) and self.ticks[self.cursor] <= sim.tick:
+            self._apply(self.kinds[self.cursor], self.data[self.starts[self.cursor]:self.ends[self.cursor]])
+            self.cursor += 1
+        if sim.reservations is not None:
+            sim.reservations.advance(sim.tick)
+        sim._advance_robots()
+
+    def _apply(self, kind, payload):
+        sim = self.sim
+        if kind == TASK_ADDED:
+            task_id, pr, pc, dr, dc, priority, deadline = TASK.unpack(payload)
+            sim.task_id_counter = task_id
+            sim.add_task((pr, pc), (dr, dc), priority, deadline if deadline >= 0 else None)
+        elif kind == OBSTACLE_ADDED:
+            pos = CELL.unpack(payload)
+            sim.dynamic_obstacles.add(pos)
+            sim.grid.watch_cell(pos)
+        elif kind == OBSTACLE_CLEARED:
+            pos = CELL.unpack(payload)
+            sim.dynamic_obstacles.discard(pos)
+            sim.grid.unwatch_cell(pos)
+        elif kind == ASSIGNED:
+            robot_id, task_id = ASSIGNMENT.unpack(payload)
+            task = sim.tasks.get(task_id)
+            sim.tasks.assign(task)
+            robot = next(r for r in sim.robots if r.id == robot_id)
+            robot.task = task
+        elif kind == PLAN:
+            robot_id, state, moves = PLAN_HEAD.unpack_from(payload)
+            cells = np.frombuffer(payload, dtype="<i4", offset=PLAN_HEAD.size).tolist()
+            robot = next(r for r in sim.robots if r.id == robot_id)
+            robot.state = ROBOT_STATES[state]
+            robot.path = [divmod(cell, sim.grid.cols) for cell in cells]
+            robot.moves_since_plan = moves
+            robot._claim_path()
+        elif kind == SHIFT_END:
+            sim.initiate_shift_end()
+        elif kind == SHIFT_ENDED:
+            sim._end_shift()
+        # CHECKPOINT records are only used as seek targets.
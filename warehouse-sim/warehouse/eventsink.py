@@ -0,0 +1,196 @@
+"""
+Structured, buffered replacement for print() logging inside the tick.
+
+Every event is a named type (EVENTS) with a fixed category, level and
+human-readable template, plus keyword fields. emit() only filters and
+appends a tuple to an in-memory ring buffer (what /events serves); turning
+records into text and writing them happens on a background thread, which
+flushes every EVENT_SINK_FLUSH_MS to a JSONL or binary file and/or the
+console. The tick never formats a string or blocks on I/O.
+
+Filtering per category: a minimum level (EVENT_SINK_LEVEL, overridden by
+EVENT_SINK_LEVELS) and a kept fraction (EVENT_SINK_SAMPLING). Sampling is a
+deterministic credit counter, not a random draw, so it does not disturb
+the simulation's seeded RNG and keeps exactly the requested share.
+
+Binary format, all little-endian: per record struct RECORD (seq, tick, unix
+time, level, event code = index into EVENT_NAMES, fields length) followed
+by the fields as UTF-8 JSON.
+"""
+import json
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+# event -> (category, level, console template)
+EVENTS = {
+    "task_added": ("task", INFO, "Task {task} added: Pickup {pickup}, Drop {drop}"),
+    "task_rejected": ("task", WARNING, "Cannot add task: {reason}."),
+    "task_assigned": ("assignment", INFO, "Task {task} assigned to Robot {robot} (Path distance: {distance})"),
+    "task_blocked": ("assignment", INFO, "Task {task} at {pickup} is temporarily blocked. Waiting..."),
+    "task_completed": ("robot", INFO, "Robot {robot} completed task {task} at {pos}."),
+    "obstacle_detected": ("robot", INFO, "Robot {robot} detected dynamic obstacle at {cell}! Re-routing..."),
+    "robot_returned": ("robot", INFO, "Robot {robot} has returned to depot."),
+    "obstacle_appeared": ("obstacle", INFO, "Dynamic obstacle appeared at {pos}"),
+    "obstacle_cleared": ("obstacle", DEBUG, "Dynamic obstacle at {pos} cleared"),
+    "shift_end_initiated": ("shift", INFO, "--- END OF SHIFT INITIATED ---"),
+    "shift_ended": ("shift", INFO, "--- All robots returned. Shift ended. ---"),
+    "joint_plan_fallback": ("assignment", INFO, "Joint plan for {robots} robots gave up ({reason})."),
+    "robot_yielded": ("robot", DEBUG, "Robot {robot} found no plan and makes way at {cell}."),
+}
+EVENT_NAMES = tuple(EVENTS)
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_NAMES)}
+RECORD = struct.Struct("<QIdBHI")
+PENDING_LIMIT = 100000 # Records waiting for the writer; beyond that new ones are only kept in the ring
+
+
+def parse_level(level):
+    return LEVELS[level] if isinstance(level, str) else level
+
+
+class EventSink:
+    """ Ring buffer of recent events plus an optional background writer (file and/or console). """
+    def __init__(self, capacity=10000, path=None, fmt="jsonl", console=False, level=INFO,
+                 levels=None, sampling=None, flush_ms=200, clock=None):
+        self.ring = deque(maxlen=capacity)
+        self.level = parse_level(level)
+        self.levels = {category: parse_level(value) for category, value in (levels or {}).items()}
+        self.sampling = dict(sampling or {})
+        self.credit = {} # Per sampled category: share of an event owed to it so far
+        self.clock = clock or (lambda: 0) # Current simulation tick
+        self.seq = 0
+        self.dropped = 0 # Records the writer never saw because it fell PENDING_LIMIT behind
+        self.lock = threading.Lock()
+        self.pending = []
+        self.path = path
+        self.binary = fmt == "binary"
+        self.console = console
+        self.flush_interval = flush_ms / 1000
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        if path or console:
+            if path:
+                self._file = open(path, "ab" if self.binary else "a")
+            self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+            self._thread.start()
+
+    @classmethod
+    def from_settings(cls, settings, clock=None):
+        return cls(
+            settings.EVENT_SINK_CAPACITY, settings.EVENT_SINK_PATH, settings.EVENT_SINK_FORMAT,
+            settings.EVENT_SINK_CONSOLE, settings.EVENT_SINK_LEVEL, settings.EVENT_SINK_LEVELS,
+            settings.EVENT_SINK_SAMPLING, settings.EVENT_SINK_FLUSH_MS, clock,
+        )
+
+    def emit(self, event, **fields):
+        """ Records one event of a type in EVENTS, unless its category's level or sampling drops it. """
+        category, level, _ = EVENTS[event]
+        if level < self.levels.get(category, self.level):
+            return
+        rate = self.sampling.get(category)
+        if rate is not None:
+            credit = self.credit.get(category, 0.0) + rate
+            if credit < 1.0:
+                self.credit[category] = credit
+                return
+            self.credit[category] = credit - 1.0
+        with self.lock:
+            self.seq += 1
+            record = (self.seq, self.clock(), time.time(), event, fields)
+            self.ring.append(record)
+            if self._thread is not None:
+                if len(self.pending) < PENDING_LIMIT:
+                    self.pending.append(record)
+                else:
+                    self.dropped += 1
+
+    # --- Queries ---
+    def recent(self, limit=100, category=None, level=None, since=None):
+        """ Newest-last list of buffered events as dicts, optionally filtered. """
+        min_level = parse_level(level) if level is not None else None
+        with self.lock:
+            records = list(self.ring)
+        matched = []
+        for record in reversed(records):
+            if since is not None and record[0] <= since:
+                break
+            event_category, event_level, _ = EVENTS[record[3]]
+            if category is not None and event_category != category:
+                continue
+            if min_level is not None and event_level < min_level:
+                continue
+            matched.append(record)
+            if len(matched) >= limit:
+                break
+        return [as_dict(record) for record in reversed(matched)]
+
+    # --- Background Writer ---
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """ Writes every pending record out; only the writer thread (or close) calls this. """
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+        if self._file is not None:
+            if self.binary:
+                self._file.write(b"".join(encode_binary(record) for record in batch))
+            else:
+                self._file.write("".join(json.dumps(as_dict(record)) + "\n" for record in batch))
+            self._file.flush()
+        if self.console:
+            sys.stdout.write("".join(format_message(record[3], record[4]) + "\n" for record in batch))
+            sys.stdout.flush()
+
+    def close(self):
+        """ Stops the writer after a final flush. """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._file is not None:
+            self._file.close()
+
+
+def format_message(event, fields):
+    return EVENTS[event][2].format(**fields)
+
+
+def as_dict(record):
+    seq, tick, timestamp, event, fields = record
+    category, level, _ = EVENTS[event]
+    return {
+        "seq": seq, "tick": tick, "time": timestamp, "level": LEVEL_NAMES[level], "category": category,
+        "event": event, "message": format_message(event, fields), "fields": fields,
+    }
+
+
+def encode_binary(record):
+    seq, tick, timestamp, event, fields = record
+    payload = json.dumps(fields).encode()
+    return RECORD.pack(seq, tick, timestamp, EVENTS[event][1], EVENT_CODES[event], len(payload)) + payload
+
+
+def read_binary(path):
+    """ Yields the records of a binary event file as dicts (same shape as the JSONL lines). """
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        seq, tick, timestamp, _, code, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        fields = json.loads(data[offset:offset + length])
+        offset += length
+        yield as_dict((seq, tick, timestamp, EVENT_NAMES[code], fields))
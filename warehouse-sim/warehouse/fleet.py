@@ -0,0 +1,261 @@
+from collections.abc import Sequence
+import numpy as np
+from .robot import Robot
+from .wire import ROBOT_STATES, ROBOT_STATE_CODES
+from .settings import Settings
+
+IDLE = ROBOT_STATE_CODES["idle"]
+MOVING_TO_PICKUP = ROBOT_STATE_CODES["moving_to_pickup"]
+MOVING_TO_DROP = ROBOT_STATE_CODES["moving_to_drop"]
+RETURNING = ROBOT_STATE_CODES["returning"]
+NO_CELL = -1
+
+
+class PathView(Sequence):
+    """ Read-only (row, col) view of one robot's remaining path in the shared buffer. """
+    def __init__(self, fleet, slot):
+        self.fleet = fleet
+        self.slot = slot
+
+    def __len__(self):
+        return int(self.fleet.path_end[self.slot] - self.fleet.path_cursor[self.slot])
+
+    def __getitem__(self, item):
+        fleet = self.fleet
+        start = int(fleet.path_cursor[self.slot])
+        end = int(fleet.path_end[self.slot])
+        cols = fleet.cols
+        if isinstance(item, slice):
+            first, last, stride = item.indices(end - start)
+            return [divmod(cell, cols) for cell in fleet.path_buffer[start + first:start + last:stride].tolist()]
+        if item < 0:
+            item += end - start
+        if not 0 <= item < end - start:
+            raise IndexError("path index out of range")
+        return divmod(int(fleet.path_buffer[start + item]), cols)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class Fleet:
+    """
+    Struct-of-arrays state for a whole fleet of robots.
+
+    Positions, goals and paths are flat cell indices. Every robot's remaining
+    path is the slice path_buffer[path_cursor:path_end] of one shared buffer;
+    new paths are appended at the tail and the buffer is compacted when full,
+    so following a path is a cursor increment instead of list.pop(0). Pacing,
+    movement and pickup/drop arrival checks run as array operations over the
+    whole fleet; only robots that finish a task or reach their depot drop back
+    to per-robot Python code.
+    """
+    def __init__(self, grid, capacity, reservations=None, settings=None):
+        self.grid = grid
+        self.settings = settings if settings is not None else Settings()
+        self.cols = grid.cols
+        self.reservations = reservations
+        self.count = 0
+        self.robots = []
+        self.tasks = [] # Task dict per slot (or None), mirrored by task_pickup/task_drop
+        self.ids = np.zeros(capacity, dtype=np.int32)
+        self.pos = np.zeros(capacity, dtype=np.int32)
+        self.start = np.zeros(capacity, dtype=np.int32)
+        self.state = np.zeros(capacity, dtype=np.int8)
+        self.pace = np.zeros(capacity, dtype=np.int32)
+        self.moves = np.zeros(capacity, dtype=np.int32)
+        self.window = np.full(capacity, self.settings.WHCA_WINDOW, dtype=np.int32)
+        self.task_pickup = np.full(capacity, NO_CELL, dtype=np.int32)
+        self.task_drop = np.full(capacity, NO_CELL, dtype=np.int32)
+        self.path_cursor = np.zeros(capacity, dtype=np.int64)
+        self.path_end = np.zeros(capacity, dtype=np.int64)
+        self.path_buffer = np.zeros(max(1024, capacity * 64), dtype=np.int32)
+        self.path_tail = 0
+
+    def add(self, robot, start_pos):
+        """ Allocates the next slot for a robot and returns it. """
+        slot = self.count
+        if slot == len(self.ids):
+            raise ValueError(f"Fleet is full ({len(self.ids)} robots).")
+        self.count += 1
+        self.robots.append(robot)
+        self.tasks.append(None)
+        self.ids[slot] = robot.id
+        self.start[slot] = self.grid.index(start_pos)
+        self.pos[slot] = self.start[slot]
+        return slot
+
+    # --- Paths in the shared buffer ---
+    def set_path(self, slot, path):
+        """ Replaces a robot's remaining path with a list of (row, col) cells. """
+        cells = np.fromiter((r * self.cols + c for r, c in path), dtype=np.int32, count=len(path))
+        if self.path_tail + len(cells) > len(self.path_buffer):
+            self.path_end[slot] = self.path_cursor[slot] # Old path is dead; do not copy it
+            self._compact(len(cells))
+        tail = self.path_tail
+        self.path_buffer[tail:tail + len(cells)] = cells
+        self.path_cursor[slot] = tail
+        self.path_end[slot] = tail + len(cells)
+        self.path_tail = tail + len(cells)
+
+    def _compact(self, needed):
+        """ Moves every live path to the front of a (possibly larger) buffer. """
+        n = self.count
+        lengths = self.path_end[:n] - self.path_cursor[:n]
+        live = int(lengths.sum())
+        size = len(self.path_buffer)
+        while live + needed > size // 2:
+            size *= 2
+        buffer = np.empty(size, dtype=np.int32)
+        tail = 0
+        for slot in np.flatnonzero(lengths):
+            start, end = self.path_cursor[slot], self.path_end[slot]
+            buffer[tail:tail + end - start] = self.path_buffer[start:end]
+            self.path_cursor[slot] = tail
+            tail += end - start
+            self.path_end[slot] = tail
+        empty = lengths == 0
+        self.path_cursor[:n][empty] = 0
+        self.path_end[:n][empty] = 0
+        self.path_buffer = buffer
+        self.path_tail = tail
+
+    def next_cells(self):
+        """ Each robot's next path cell, or NO_CELL when its path is empty. """
+        n = self.count
+        cursor, end = self.path_cursor[:n], self.path_end[:n]
+        has_next = cursor < end
+        return np.where(has_next, self.path_buffer[np.where(has_next, cursor, 0)], NO_CELL)
+
+    def idle_slots(self):
+        return np.flatnonzero(self.state[:self.count] == IDLE)
+
+    # --- Vectorized tick ---
+    def window_refresh_slots(self):
+        """
+        Slots whose robots have used up half of their reserved WHCA* window on a
+        path that runs past it. Robots with a temporary obstacle ahead are found
+        from the grid's alerts instead (see Simulation._sensing_robots).
+        """
+        if self.reservations is None:
+            return np.empty(0, dtype=np.intp)
+        n = self.count
+        remaining = self.path_end[:n] - self.path_cursor[:n]
+        moves = self.moves[:n]
+        window = self.window[:n]
+        return np.flatnonzero((remaining > 0) & (moves >= window // 2) & (remaining > window - moves))
+
+    def move_step(self):
+        """ Robot.move_step for the whole fleet at once. """
+        n = self.count
+        pace = self.pace[:n]
+        pace += 1
+        moving = (pace >= self.settings.ROBOT_PACE) & (self.path_cursor[:n] < self.path_end[:n])
+        movers = np.flatnonzero(moving)
+        if not len(movers):
+            return
+        pace[movers] = 0
+        old_cells = self.pos[movers]
+        new_cells = self.path_buffer[self.path_cursor[movers]]
+        self.pos[movers] = new_cells
+        self.path_cursor[movers] += 1
+        self.moves[movers] += 1
+
+        # Per-mover bookkeeping that lives outside the arrays: the grid's index and the reservations.
+        grid, cols = self.grid, self.cols
+        reservations = self.reservations
+        for robot_id, old, new in zip(self.ids[movers].tolist(), old_cells.tolist(), new_cells.tolist()):
+            old_pos = divmod(old, cols)
+            grid.place_robot(robot_id, old_pos, divmod(new, cols))
+            grid.advance_claim(robot_id, old_pos)
+            if reservations is not None:
+                reservations.release(robot_id, before_tick=reservations.now)
+
+        # --- State Transitions ---
+        state = self.state[:n]
+        pos = self.pos[:n]
+        picked = moving & (state == MOVING_TO_PICKUP) & (pos == self.task_pickup[:n])
+        state[picked] = MOVING_TO_DROP
+        # Checked after the pickup: a task whose drop equals its pickup completes on arrival.
+        delivered = moving & (state == MOVING_TO_DROP) & (pos == self.task_drop[:n])
+        returned = moving & (state == RETURNING) & (pos == self.start[:n])
+        for slot in np.flatnonzero(delivered).tolist():
+            self.robots[slot]._finish_task()
+        for slot in np.flatnonzero(returned).tolist():
+            self.robots[slot]._finish_return()
+
+
+class FleetRobot(Robot):
+    """
+    A Robot whose hot state lives in a Fleet's arrays. Planning code is shared
+    with Robot unchanged; pos, path, state, pace and task read and write the
+    fleet through properties, and movement is advanced by Fleet.move_step.
+    """
+    def __init__(self, fleet, robot_id, start_pos, grid, distance_fields=None, reservations=None, planner=None,
+                 settings=None):
+        self.fleet = fleet
+        self.id = robot_id
+        self.slot = fleet.add(self, start_pos)
+        super().__init__(robot_id, start_pos, grid, distance_fields, reservations, planner, settings)
+
+    @property
+    def pos(self):
+        return divmod(int(self.fleet.pos[self.slot]), self.fleet.cols)
+
+    @pos.setter
+    def pos(self, value):
+        self.fleet.pos[self.slot] = self.fleet.grid.index(value)
+
+    @property
+    def path(self):
+        return PathView(self.fleet, self.slot)
+
+    @path.setter
+    def path(self, value):
+        self.fleet.set_path(self.slot, value)
+
+    @property
+    def state(self):
+        return ROBOT_STATES[self.fleet.state[self.slot]]
+
+    @state.setter
+    def state(self, value):
+        self.fleet.state[self.slot] = ROBOT_STATE_CODES[value]
+
+    @property
+    def pace_counter(self):
+        return int(self.fleet.pace[self.slot])
+
+    @pace_counter.setter
+    def pace_counter(self, value):
+        self.fleet.pace[self.slot] = value
+
+    @property
+    def moves_since_plan(self):
+        return int(self.fleet.moves[self.slot])
+
+    @moves_since_plan.setter
+    def moves_since_plan(self, value):
+        self.fleet.moves[self.slot] = value
+
+    @property
+    def window(self):
+        return int(self.fleet.window[self.slot])
+
+    @window.setter
+    def window(self, value):
+        self.fleet.window[self.slot] = value
+
+    @property
+    def task(self):
+        return self.fleet.tasks[self.slot]
+
+    @task.setter
+    def task(self, value):
+        fleet = self.fleet
+        fleet.tasks[self.slot] = value
+        fleet.task_pickup[self.slot] = fleet.grid.index(value['pickup']) if value else NO_CELL
+        fleet.task_drop[self.slot] = fleet.grid.index(value['drop']) if value else NO_CELL
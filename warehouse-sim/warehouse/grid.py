@@ -1,14 +1,73 @@
+from collections import Counter
+from collections.abc import Set
+import numpy as np
+
 class Grid:
-    """ Represents the warehouse floor grid and static obstacles. """
-    def __init__(self, rows, cols):
+    """
+    Represents the warehouse floor grid and static obstacles.
+
+    mask can be any writable buffer of rows * cols bytes to use as is (e.g. a
+    mapped layout file, see warehouse/layout.py); by default it starts empty.
+    """
+    def __init__(self, rows, cols, mask=None):
         self.rows = rows
         self.cols = cols
-        self.blocked = set()  # Using a set for efficient O(1) lookups
         self.robots = [] # A reference to all robot objects
 
+        # Flat, row-major occupancy mask (1 = static obstacle) used by the planners.
+        self.mask = mask if mask is not None else bytearray(rows * cols)
+        if len(self.mask) != rows * cols:
+            raise ValueError(f"Occupancy mask has {len(self.mask)} cells, expected {rows * cols}.")
+        self.blocked = BlockedCells(self) # (row, col) set view of the mask
+        # Bumped whenever the static layout changes so derived planner data can be invalidated.
+        self.layout_version = 0
+        # Called with the cell of every new static obstacle, for planners that invalidate locally.
+        self.layout_listeners = []
+
+        # --- Occupancy Index (kept up to date by the robots as they move and re-plan) ---
+        self.robot_cells = {}    # cell -> set of robot ids standing there (normally one)
+        # Flat cell -> number of active robots whose position or remaining path covers it
+        self.claims = np.zeros(rows * cols, dtype=np.int32)
+        self.robot_claims = {}   # robot id -> Counter of the cells it contributes to claims
+        self.subscribers = {}    # cell -> set of robot ids whose claims cover it (inverse of robot_claims)
+
+        # --- Watched Cells (temporary obstacles) ---
+        self.watched = set()
+        self.alerts = {}         # robot id -> watched cells its position or remaining path covers
+
     def add_obstacle(self, pos):
         """ Adds a permanent obstacle to the grid. """
-        self.blocked.add(pos)
+        self.mask[self.index(pos)] = 1
+        self.layout_version += 1
+        for listener in self.layout_listeners:
+            listener(pos)
+
+    def index(self, pos):
+        """ Converts a (row, col) position into its flat mask index. """
+        return pos[0] * self.cols + pos[1]
+
+    def position(self, index):
+        """ Converts a flat mask index back into a (row, col) position. """
+        return divmod(index, self.cols)
+
+    def occupancy_mask(self, extra_blocked=None):
+        """
+        Returns a private copy of the static mask with any extra blocked cells
+        (robot reservations, temporary obstacles) marked as well.
+        """
+        if isinstance(extra_blocked, ClaimedCells):
+            return bytearray((np.frombuffer(self.mask, dtype=np.uint8) | extra_blocked.flat_mask()).tobytes())
+        mask = bytearray(self.mask)
+        if extra_blocked:
+            rows, cols = self.rows, self.cols
+            for r, c in extra_blocked:
+                if 0 <= r < rows and 0 <= c < cols:
+                    mask[r * cols + c] = 1
+        return mask
+
+    def as_array(self):
+        """ Returns a (rows, cols) NumPy view of the static mask (shares memory). """
+        return np.frombuffer(self.mask, dtype=np.uint8).reshape(self.rows, self.cols)
 
     def is_valid(self, pos):
         """ Checks if a position is within the grid boundaries. """
@@ -17,20 +76,170 @@ class Grid:
 
     def is_occupied(self, pos):
         """ Checks if a cell is blocked by a permanent obstacle. """
-        return pos in self.blocked
+        r, c = pos
+        return 0 <= r < self.rows and 0 <= c < self.cols and self.mask[r * self.cols + c] == 1
+
+    # --- Occupancy Index ---
+    def place_robot(self, robot_id, old_pos, new_pos):
+        """ Records a robot standing on new_pos (and no longer on old_pos). """
+        if old_pos is not None:
+            ids = self.robot_cells.get(old_pos)
+            if ids is not None:
+                ids.discard(robot_id)
+                if not ids:
+                    del self.robot_cells[old_pos]
+        self.robot_cells.setdefault(new_pos, set()).add(robot_id)
+
+    def claim_cells(self, robot_id, pos, path):
+        """
+        Replaces the cells an active robot covers with its position plus its
+        remaining path (pass path=None for an idle robot, which covers nothing).
+        """
+        old = self.robot_claims.pop(robot_id, None)
+        new = Counter(path) if path is not None else None
+        if new is not None:
+            new[pos] += 1
+            self.robot_claims[robot_id] = new
+        old_cells = old.keys() if old is not None else frozenset()
+        new_cells = new.keys() if new is not None else frozenset()
+        claims, cols, subscribers = self.claims, self.cols, self.subscribers
+        for cell in old_cells - new_cells:
+            claims[cell[0] * cols + cell[1]] -= 1
+            ids = subscribers[cell]
+            ids.discard(robot_id)
+            if not ids:
+                del subscribers[cell]
+        for cell in new_cells - old_cells:
+            claims[cell[0] * cols + cell[1]] += 1
+            subscribers.setdefault(cell, set()).add(robot_id)
+        self.alerts.pop(robot_id, None)
+        if new and self.watched:
+            if len(self.watched) < len(new):
+                hits = {cell for cell in self.watched if cell in new}
+            else:
+                hits = {cell for cell in new if cell in self.watched}
+            if hits:
+                self.alerts[robot_id] = hits
+
+    def advance_claim(self, robot_id, old_pos):
+        """ A robot stepped off old_pos onto the head of its path: O(1) index update. """
+        claims = self.robot_claims.get(robot_id)
+        if claims is None:
+            return
+        claims[old_pos] -= 1
+        if claims[old_pos] <= 0:
+            del claims[old_pos]
+            self.claims[self.index(old_pos)] -= 1
+            ids = self.subscribers[old_pos]
+            ids.discard(robot_id)
+            if not ids:
+                del self.subscribers[old_pos]
+            alerts = self.alerts.get(robot_id)
+            if alerts is not None and old_pos in alerts:
+                alerts.discard(old_pos)
+                if not alerts:
+                    del self.alerts[robot_id]
+
+    # --- Watched Cells ---
+    def watch_cell(self, pos):
+        """ Starts watching a cell: every robot whose claims cover it (now or later) gets an alert for it. """
+        self.watched.add(pos)
+        for robot_id in self.subscribers.get(pos, ()):
+            self.alerts.setdefault(robot_id, set()).add(pos)
+
+    def unwatch_cell(self, pos):
+        """ Stops watching a cell and withdraws its alerts. """
+        self.watched.discard(pos)
+        for robot_id in self.subscribers.get(pos, ()):
+            alerts = self.alerts.get(robot_id)
+            if alerts is not None:
+                alerts.discard(pos)
+                if not alerts:
+                    del self.alerts[robot_id]
+
+    def claimed_cells(self, exclude_robot_id=None):
+        """ Live view of every cell covered by an active robot other than exclude_robot_id. """
+        return ClaimedCells(self, exclude_robot_id)
 
     def get_all_robot_positions(self, exclude_robot_id=None):
         """ Returns a set of all current robot positions. """
-        positions = set()
-        for r in self.robots:
-            if r.id != exclude_robot_id:
-                positions.add(r.pos)
-        return positions
+        return {
+            cell for cell, ids in self.robot_cells.items()
+            if len(ids) > 1 or exclude_robot_id not in ids
+        }
 
     def is_robot_at(self, pos, querying_robot_id):
         """ Checks if another robot is at the given position. """
-        for r in self.robots:
-            if r.id != querying_robot_id and r.pos == pos:
-                return True
-        return False
+        ids = self.robot_cells.get(pos)
+        return bool(ids) and (len(ids) > 1 or querying_robot_id not in ids)
+
+
+class BlockedCells(Set):
+    """
+    Read-only (row, col) set view of the static obstacles in Grid.mask, so a
+    mapped layout needs no per-cell set to be built. Membership is O(1).
+    """
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __contains__(self, cell):
+        return self.grid.is_occupied(cell)
+
+    def __iter__(self):
+        cols = self.grid.cols
+        return (divmod(i, cols) for i in np.flatnonzero(np.frombuffer(self.grid.mask, dtype=np.uint8)).tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(np.frombuffer(self.grid.mask, dtype=np.uint8)))
+
+
+class ClaimedCells(Set):
+    """
+    Read-only set view over Grid.claims that leaves out one robot's own cells,
+    plus an optional set of extra cells. Membership is O(1), and nothing is
+    copied until the view is iterated or turned into an occupancy mask.
+    """
+    def __init__(self, grid, exclude_robot_id=None, extra=frozenset()):
+        self.grid = grid
+        self.exclude_robot_id = exclude_robot_id
+        self.extra = extra
+
+    def _own(self):
+        return self.grid.robot_claims.get(self.exclude_robot_id, ())
+
+    def __contains__(self, cell):
+        if cell in self.extra:
+            return True
+        if not self.grid.is_valid(cell):
+            return False
+        count = self.grid.claims[self.grid.index(cell)]
+        if count and cell in self._own():
+            count -= 1
+        return count > 0
+
+    def flat_mask(self):
+        """ Row-major uint8 mask (1 = in the view) over the whole grid. """
+        grid = self.grid
+        mask = (grid.claims > 0).view(np.uint8)
+        own = self._own()
+        if own:
+            own_idx = np.fromiter((grid.index(cell) for cell in own), dtype=np.intp, count=len(own))
+            mask[own_idx] = grid.claims[own_idx] > 1
+        for cell in self.extra:
+            if grid.is_valid(cell):
+                mask[grid.index(cell)] = 1
+        return mask
+
+    def __iter__(self):
+        cols = self.grid.cols
+        return (divmod(int(i), cols) for i in np.flatnonzero(self.flat_mask()))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.flat_mask()))
+
+    def __bool__(self):
+        return bool(self.flat_mask().any())
 
+    def union(self, *others):
+        """ A view with more extra cells; the index itself is not copied. """
+        return ClaimedCells(self.grid, self.exclude_robot_id, self.extra.union(*others))
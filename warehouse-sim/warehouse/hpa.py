@@ -0,0 +1,298 @@
+from collections import deque
+import heapq
+from .pathfinding import astar
+import config
+
+
+class HierarchicalPlanner:
+    """
+    HPA* (hierarchical path-finding A*) over the grid's static layout.
+
+    The grid is cut into square clusters. Entrances are found along every
+    border between two clusters (one per short run of free cell pairs, one at
+    each end of a long run) and become the nodes of an abstract graph; nodes
+    of one cluster are joined by their in-cluster BFS distance. A long query
+    searches the abstract graph and then refines every abstract edge with a
+    search confined to one cluster, so no search ever spans the full grid.
+
+    Entrances are computed per border and in-cluster distances lazily per
+    cluster; both are cached until Grid.add_obstacle touches that cluster.
+    Extra blocked cells (temporary obstacles, other robots) only affect the
+    clusters they fall in: those get fresh in-cluster distances for the query.
+    Paths are near-optimal, not always shortest.
+    """
+    def __init__(self, grid, cluster_size=None, long_entrance=None):
+        self.grid = grid
+        self.size = cluster_size if cluster_size is not None else config.HPA_CLUSTER_SIZE
+        self.long_entrance = long_entrance if long_entrance is not None else config.HPA_LONG_ENTRANCE
+        self.cluster_rows = -(-grid.rows // self.size)
+        self.cluster_cols = -(-grid.cols // self.size)
+        self.borders = {}       # (cluster, neighbour cluster) -> list of (cell, cell) entrance pairs
+        self.cluster_nodes = {} # cluster -> entrance cells inside it
+        self.crossings = {}     # entrance cell -> entrance cells across a border
+        self.intra = {}         # cluster -> {entrance cell: [(entrance cell, cost), ...]}
+        self.dirty = set(range(self.cluster_rows * self.cluster_cols))
+        self.components = None  # Connected-component label per flat cell, rebuilt after layout changes
+        self.abstract_expansions = 0
+        grid.layout_listeners.append(self._on_obstacle_added)
+
+    @property
+    def expansions(self):
+        """ Abstract nodes expanded, under the same name as JumpPointPlanner's counter. """
+        return self.abstract_expansions
+
+    # --- Layout Maintenance ---
+    def _on_obstacle_added(self, pos):
+        """ A static obstacle only invalidates the cluster it lands in. """
+        self.dirty.add(self.cluster_of(pos[0] * self.grid.cols + pos[1]))
+        self.components = None
+
+    def cluster_of(self, cell):
+        r, c = divmod(cell, self.grid.cols)
+        return (r // self.size) * self.cluster_cols + c // self.size
+
+    def _bounds(self, cluster):
+        cr, cc = divmod(cluster, self.cluster_cols)
+        r0, c0 = cr * self.size, cc * self.size
+        return r0, min(r0 + self.size, self.grid.rows) - 1, c0, min(c0 + self.size, self.grid.cols) - 1
+
+    def _on_border(self, cell):
+        r, c = divmod(cell, self.grid.cols)
+        edge = (0, self.size - 1)
+        return r % self.size in edge or c % self.size in edge
+
+    def _neighbour_clusters(self, cluster):
+        cr, cc = divmod(cluster, self.cluster_cols)
+        if cc + 1 < self.cluster_cols: yield cluster + 1
+        if cc > 0: yield cluster - 1
+        if cr + 1 < self.cluster_rows: yield cluster + self.cluster_cols
+        if cr > 0: yield cluster - self.cluster_cols
+
+    def _refresh(self):
+        """ Rebuilds the borders of dirty clusters and drops their (and their neighbours') distances. """
+        if not self.dirty:
+            return
+        touched = set()
+        for cluster in self.dirty:
+            touched.add(cluster)
+            for other in self._neighbour_clusters(cluster):
+                touched.add(other)
+                key = (min(cluster, other), max(cluster, other))
+                self.borders[key] = self._find_entrances(*key)
+        self.dirty.clear()
+        for cluster in touched:
+            nodes = set()
+            for other in self._neighbour_clusters(cluster):
+                for a, b in self.borders.get((min(cluster, other), max(cluster, other)), ()):
+                    nodes.add(a if self.cluster_of(a) == cluster else b)
+            self.cluster_nodes[cluster] = nodes
+            self.intra.pop(cluster, None)
+        self.crossings = {}
+        for pairs in self.borders.values():
+            for a, b in pairs:
+                self.crossings.setdefault(a, []).append(b)
+                self.crossings.setdefault(b, []).append(a)
+
+    def _label_components(self):
+        """ Labels every free cell with its static connected component (one BFS pass per layout). """
+        grid = self.grid
+        cols = grid.cols
+        size = grid.rows * cols
+        mask = grid.mask
+        labels = [0] * size # 0 = obstacle or not yet labelled
+        label = 0
+        for seed in range(size):
+            if mask[seed] or labels[seed]:
+                continue
+            label += 1
+            labels[seed] = label
+            queue = deque([seed])
+            while queue:
+                cell = queue.popleft()
+                c = cell % cols
+                for nxt, inside in (
+                    (cell + 1, c + 1 < cols), (cell - 1, c > 0),
+                    (cell + cols, cell + cols < size), (cell - cols, cell >= cols),
+                ):
+                    if inside and not mask[nxt] and not labels[nxt]:
+                        labels[nxt] = label
+                        queue.append(nxt)
+        self.components = labels
+
+    def _find_entrances(self, first, second):
+        """ Entrance cell pairs on the border between two adjacent clusters (first < second). """
+        mask = self.grid.mask
+        cols = self.grid.cols
+        r0, r1, c0, c1 = self._bounds(first)
+        if second // self.cluster_cols == first // self.cluster_cols: # Vertical border: first is on the left
+            pairs = [(r * cols + c1, r * cols + c1 + 1) for r in range(r0, r1 + 1)]
+        else: # Horizontal border: first is above
+            pairs = [(r1 * cols + c, (r1 + 1) * cols + c) for c in range(c0, c1 + 1)]
+        entrances = []
+        run = []
+        for a, b in pairs + [(None, None)]:
+            if a is not None and not mask[a] and not mask[b]:
+                run.append((a, b))
+                continue
+            if run:
+                if len(run) < self.long_entrance:
+                    entrances.append(run[len(run) // 2])
+                else:
+                    entrances.extend((run[0], run[-1]))
+                run = []
+        return entrances
+
+    # --- In-cluster Searches ---
+    # Extra blocked cells arrive here as a set of flat cell indices.
+    def _bfs(self, cluster, source, blocked=()):
+        """ Distances from source to every reachable cell of its cluster. """
+        r0, r1, c0, c1 = self._bounds(cluster)
+        cols = self.grid.cols
+        mask = self.grid.mask
+        dist = {source: 0}
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            r, c = divmod(cell, cols)
+            d = dist[cell] + 1
+            for nxt, inside in (
+                (cell + 1, c < c1), (cell - 1, c > c0),
+                (cell + cols, r < r1), (cell - cols, r > r0),
+            ):
+                if inside and nxt not in dist and not mask[nxt] and nxt not in blocked:
+                    dist[nxt] = d
+                    queue.append(nxt)
+        return dist
+
+    def _edges(self, cluster, node, blocked, overlay):
+        """ Costs from an entrance to the other entrances of its cluster. """
+        if cluster in overlay:
+            # The query blocks cells in this cluster: search from just this node, with them.
+            nodes = [n for n in self.cluster_nodes.get(cluster, ()) if n != node and n not in blocked]
+            dist = self._bfs(cluster, node, blocked)
+            return [(other, dist[other]) for other in nodes if other in dist]
+        edges = self.intra.get(cluster)
+        if edges is None:
+            edges = self.intra[cluster] = self._compute_edges(cluster)
+        return edges.get(node, ())
+
+    def _compute_edges(self, cluster):
+        nodes = self.cluster_nodes.get(cluster, ())
+        edges = {}
+        for node in nodes:
+            dist = self._bfs(cluster, node)
+            edges[node] = [(other, dist[other]) for other in nodes if other != node and other in dist]
+        return edges
+
+    def _refine(self, cluster, start, goal, blocked):
+        """ Shortest cell path between two cells of one cluster, staying inside it. """
+        r0, r1, c0, c1 = self._bounds(cluster)
+        cols = self.grid.cols
+        mask = self.grid.mask
+        parent = {start: None}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            if cell == goal:
+                break
+            r, c = divmod(cell, cols)
+            for nxt, inside in (
+                (cell + 1, c < c1), (cell - 1, c > c0),
+                (cell + cols, r < r1), (cell - cols, r > r0),
+            ):
+                if inside and nxt not in parent and not mask[nxt] and nxt not in blocked:
+                    parent[nxt] = cell
+                    queue.append(nxt)
+        if goal not in parent:
+            return None
+        segment = []
+        while goal is not None:
+            segment.append(goal)
+            goal = parent[goal]
+        segment.reverse()
+        return segment
+
+    # --- Queries ---
+    def find_path(self, start, goal, blocked_cells=None):
+        """ Same contract as astar(): [start, ..., goal], or [] if no path exists. """
+        grid = self.grid
+        if not grid.is_valid(goal) or grid.is_occupied(goal):
+            return []
+        if start == goal:
+            return [start]
+        if abs(start[0] - goal[0]) + abs(start[1] - goal[1]) <= 2 * self.size:
+            return astar(grid, start, goal, blocked_cells) # Short hop: a local flat search is cheaper
+        if blocked_cells and goal in blocked_cells:
+            return []
+        self._refresh()
+        if self.components is None:
+            self._label_components()
+
+        cols = grid.cols
+        s_cell, g_cell = start[0] * cols + start[1], goal[0] * cols + goal[1]
+        if self.components[s_cell] != self.components[g_cell]:
+            return [] # Statically unreachable: answered without searching
+        s_cluster, g_cluster = self.cluster_of(s_cell), self.cluster_of(g_cell)
+        blocked = {r * cols + c for r, c in blocked_cells or () if grid.is_valid((r, c))}
+        blocked.discard(s_cell)
+        # Clusters holding a blocked cell get in-cluster distances searched for this query only.
+        overlay = {self.cluster_of(cell) for cell in blocked}
+        from_start = self._bfs(s_cluster, s_cell, blocked)
+        to_goal = self._bfs(g_cluster, g_cell, blocked)
+
+        def h(cell):
+            r, c = divmod(cell, cols)
+            return abs(r - goal[0]) + abs(c - goal[1])
+
+        # A* over the abstract graph; the start and goal cells join it for this query only.
+        g_cost = {s_cell: 0}
+        parent = {s_cell: None}
+        heap = [(h(s_cell), 0, s_cell)]
+        closed = set()
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node in closed:
+                continue
+            if node == g_cell:
+                break
+            closed.add(node)
+            self.abstract_expansions += 1
+            if node == s_cell:
+                neighbours = [(n, from_start[n]) for n in self.cluster_nodes.get(s_cluster, ()) if n in from_start]
+            else:
+                neighbours = list(self._edges(self.cluster_of(node), node, blocked, overlay))
+            neighbours.extend(
+                (other, 1) for other in self.crossings.get(node, ()) if other not in blocked
+            )
+            if self.cluster_of(node) == g_cluster and node in to_goal:
+                neighbours.append((g_cell, to_goal[node]))
+            for nxt, cost in neighbours:
+                new_g = g + cost
+                if new_g < g_cost.get(nxt, float("inf")):
+                    g_cost[nxt] = new_g
+                    parent[nxt] = node
+                    heapq.heappush(heap, (new_g + h(nxt), new_g, nxt))
+        if g_cell not in parent:
+            # A blocked cell on a border can cut a run off from its entrance while the flat search
+            # could still cross elsewhere in the run; otherwise the abstract graph is complete.
+            if any(self._on_border(cell) for cell in blocked):
+                return astar(grid, start, goal, blocked_cells)
+            return []
+
+        nodes = []
+        node = g_cell
+        while node is not None:
+            nodes.append(node)
+            node = parent[node]
+        nodes.reverse()
+
+        path = [s_cell]
+        for a, b in zip(nodes, nodes[1:]):
+            if self.cluster_of(a) != self.cluster_of(b):
+                path.append(b) # Border crossing between two adjacent entrance cells
+                continue
+            segment = self._refine(self.cluster_of(a), a, b, blocked)
+            if segment is None:
+                return astar(grid, start, goal, blocked_cells)
+            path.extend(segment[1:])
+        return [divmod(cell, cols) for cell in path]
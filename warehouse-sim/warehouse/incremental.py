@@ -0,0 +1,181 @@
+from heapq import heappush, heappop
+
+INF = float('inf')
+
+
+class DStarLite:
+    """
+    Persistent D* Lite search toward one goal cell (Koenig & Likhachev).
+
+    The search runs backwards from the goal, so the robot can keep moving and
+    obstacles can come and go: set_start() and update_blocked() only touch the
+    vertices whose edges changed, and compute() repairs just the part of the
+    search tree that those changes made inconsistent.
+    """
+    def __init__(self, grid, goal):
+        self.grid = grid
+        self.goal = goal
+        self.layout_version = grid.layout_version
+        self.expansions = 0 # Total vertices expanded over the life of the search
+        self._reset()
+
+    def _reset(self):
+        cols = self.grid.cols
+        self.goal_idx = self.goal[0] * cols + self.goal[1]
+        self.g = {}
+        self.rhs = {self.goal_idx: 0}
+        self.open = {}  # cell -> key currently valid in the heap
+        self.heap = []
+        self.km = 0
+        self.start_idx = None
+        self.last_idx = None
+        self.blocked = set()  # Extra (non-static) blocked cells, as flat indices
+        self._push(self.goal_idx)
+
+    # --- Public API ---
+    def set_start(self, start):
+        """ Moves the search start to the robot's current cell. """
+        idx = start[0] * self.grid.cols + start[1]
+        if self.last_idx is not None and idx != self.last_idx:
+            self.km += self._h(self.last_idx, idx)
+        self.last_idx = idx
+        self.start_idx = idx
+
+    def update_blocked(self, blocked_cells):
+        """ Applies the difference between the old and new extra blocked sets. """
+        if self.layout_version != self.grid.layout_version:
+            start = self.start_idx
+            self.layout_version = self.grid.layout_version
+            self._reset()
+            if start is not None:
+                self.start_idx = self.last_idx = start
+        cols = self.grid.cols
+        rows = self.grid.rows
+        new_blocked = {
+            r * cols + c for r, c in (blocked_cells or ())
+            if 0 <= r < rows and 0 <= c < cols
+        }
+        # Like A*, the cell the robot stands on is never treated as blocked.
+        new_blocked.discard(self.start_idx)
+        changed = new_blocked.symmetric_difference(self.blocked)
+        if not changed:
+            return 0
+        self.blocked = new_blocked
+        g = self.g
+        touched = set()
+        for cell in changed:
+            touched.add(cell)
+            # Neighbours only depend on this cell if the search ever reached it.
+            if g.get(cell, INF) != INF:
+                touched.update(self._neighbors(cell))
+        for cell in touched:
+            self._update_vertex(cell)
+        return len(changed)
+
+    def compute(self):
+        """ Repairs the search until the start's distance is consistent. """
+        start = self.start_idx
+        heap = self.heap
+        g = self.g
+        rhs = self.rhs
+        while heap:
+            key, cell = heap[0]
+            if self.open.get(cell) != key:
+                heappop(heap) # Stale entry
+                continue
+            g_start = g.get(start, INF)
+            rhs_start = rhs.get(start, INF)
+            if not (key < self._key(start) or rhs_start != g_start):
+                break
+            heappop(heap)
+            del self.open[cell]
+            self.expansions += 1
+            new_key = self._key(cell)
+            if key < new_key:
+                self._push(cell, new_key)
+            elif g.get(cell, INF) > rhs.get(cell, INF):
+                g[cell] = rhs[cell]
+                for pred in self._neighbors(cell):
+                    self._update_vertex(pred)
+            else:
+                g[cell] = INF
+                self._update_vertex(cell)
+                for pred in self._neighbors(cell):
+                    self._update_vertex(pred)
+
+    def extract_path(self):
+        """ Follows the distance gradient from start to goal; [] if unreachable. """
+        cols = self.grid.cols
+        current = self.start_idx
+        if self.rhs.get(current, INF) == INF:
+            return []
+        path = [divmod(current, cols)]
+        g = self.g
+        limit = self.grid.rows * cols
+        while current != self.goal_idx and len(path) <= limit:
+            best, best_cost = None, INF
+            for nxt in self._neighbors(current):
+                if self._traversable(nxt):
+                    cost = 1 + g.get(nxt, INF)
+                    if cost < best_cost:
+                        best, best_cost = nxt, cost
+            if best is None:
+                return []
+            current = best
+            path.append(divmod(current, cols))
+        return path if current == self.goal_idx else []
+
+    def plan(self, start, blocked_cells=None):
+        """ Convenience wrapper: move start, apply obstacle changes, repair, extract. """
+        self.set_start(start)
+        self.update_blocked(blocked_cells)
+        if start == self.goal:
+            return [start]
+        if not self._traversable(self.goal_idx):
+            return []
+        self.compute()
+        return self.extract_path()
+
+    # --- Internals ---
+    def _traversable(self, cell):
+        return not self.grid.mask[cell] and cell not in self.blocked
+
+    def _neighbors(self, cell):
+        cols = self.grid.cols
+        size = self.grid.rows * cols
+        c = cell % cols
+        result = []
+        if c + 1 < cols: result.append(cell + 1)
+        if c > 0: result.append(cell - 1)
+        if cell + cols < size: result.append(cell + cols)
+        if cell >= cols: result.append(cell - cols)
+        return result
+
+    def _h(self, a, b):
+        cols = self.grid.cols
+        return abs(a // cols - b // cols) + abs(a % cols - b % cols)
+
+    def _key(self, cell):
+        best = min(self.g.get(cell, INF), self.rhs.get(cell, INF))
+        start = self.start_idx if self.start_idx is not None else cell
+        return (best + self._h(start, cell) + self.km, best)
+
+    def _push(self, cell, key=None):
+        key = key if key is not None else self._key(cell)
+        self.open[cell] = key
+        heappush(self.heap, (key, cell))
+
+    def _update_vertex(self, cell):
+        if cell != self.goal_idx:
+            best = INF
+            if self._traversable(cell):
+                g = self.g
+                for nxt in self._neighbors(cell):
+                    if self._traversable(nxt):
+                        cost = 1 + g.get(nxt, INF)
+                        if cost < best:
+                            best = cost
+            self.rhs[cell] = best
+        self.open.pop(cell, None)
+        if self.g.get(cell, INF) != self.rhs.get(cell, INF):
+            self._push(cell)
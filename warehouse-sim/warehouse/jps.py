@@ -0,0 +1,142 @@
+from heapq import heappush, heappop
+
+
+class JumpPointPlanner:
+    """
+    Jump Point Search for the 4-connected, unit-cost grid.
+
+    Instead of pushing every cell of an open aisle onto the heap, the search
+    jumps in a straight line until something forces a turn: the goal, a cell
+    whose side neighbour opens up behind an obstacle, or (for vertical jumps)
+    a row from which a horizontal jump would find one of those. Only those
+    jump points are expanded, and the pruning keeps paths optimal, so the
+    result has the same length as astar()'s (where several routes are equally
+    short it may pick a different one). It is expanded back into unit steps
+    before it is returned, exactly the form Robot.move_step follows.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.expansions = 0 # Jump points taken off the heap over the planner's life
+
+    def find_path(self, start, goal, blocked_cells=None):
+        """ Same contract as astar(): [start, ..., goal], or [] if no path exists. """
+        grid = self.grid
+        if start == goal:
+            return [start]
+        if not grid.is_valid(goal):
+            return []
+        cols = grid.cols
+        size = grid.rows * cols
+        mask = grid.occupancy_mask(blocked_cells)
+        start_idx = start[0] * cols + start[1]
+        goal_idx = goal[0] * cols + goal[1]
+        if mask[goal_idx]:
+            return []
+        mask[start_idx] = 0 # Like astar(), the cell the robot stands on is never blocked
+
+        def jump_horizontal(cell, dc):
+            # Scans the run with bytearray.find instead of a Python loop per cell. A side cell
+            # that is open but was walled off one step back forces a turn: in the row above or
+            # below that is a blocked-then-free byte pair in the direction of travel.
+            row = cell - cell % cols
+            if dc > 0:
+                wall = mask.find(1, cell + 1, row + cols)
+                end = wall if wall != -1 else row + cols
+                if end == cell + 1:
+                    return -1
+                hits = [goal_idx] if cell < goal_idx < end else []
+                if row > 0:
+                    found = mask.find(b"\x01\x00", cell - cols, end - cols)
+                    if found != -1:
+                        hits.append(found + cols + 1)
+                if row + cols < size:
+                    found = mask.find(b"\x01\x00", cell + cols, end + cols)
+                    if found != -1:
+                        hits.append(found - cols + 1)
+                return min(hits) if hits else -1
+            wall = mask.rfind(1, row, cell)
+            end = wall if wall != -1 else row - 1
+            if end == cell - 1:
+                return -1
+            hits = [goal_idx] if end < goal_idx < cell else []
+            if row > 0:
+                found = mask.rfind(b"\x00\x01", end + 1 - cols, cell - cols + 1)
+                if found != -1:
+                    hits.append(found + cols)
+            if row + cols < size:
+                found = mask.rfind(b"\x00\x01", end + 1 + cols, cell + cols + 1)
+                if found != -1:
+                    hits.append(found - cols)
+            return max(hits) if hits else -1
+
+        def jump_vertical(cell, dr):
+            step = dr * cols
+            c = cell % cols
+            while True:
+                cell += step
+                if not 0 <= cell < size or mask[cell]:
+                    return -1
+                if cell == goal_idx:
+                    return cell
+                if c > 0 and not mask[cell - 1] and mask[cell - 1 - step]:
+                    return cell
+                if c + 1 < cols and not mask[cell + 1] and mask[cell + 1 - step]:
+                    return cell
+                # Horizontal moves are never pruned away from a vertical run, so look along the row.
+                if jump_horizontal(cell, 1) != -1 or jump_horizontal(cell, -1) != -1:
+                    return cell
+
+        goal_r, goal_c = goal
+        parent = {start_idx: -1}
+        g_score = {start_idx: 0}
+        heap = [(abs(start[0] - goal_r) + abs(start[1] - goal_c), 0, start_idx)]
+        closed = set()
+        while heap:
+            _, neg_g, current = heappop(heap)
+            if current == goal_idx:
+                return self._expand(parent, current, cols)
+            if current in closed:
+                continue
+            closed.add(current)
+            self.expansions += 1
+
+            g = -neg_g
+            r, c = divmod(current, cols)
+            origin = parent[current]
+            if origin == -1:
+                directions = ((0, 1), (0, -1), (1, 0), (-1, 0))
+            else:
+                pr, pc = divmod(origin, cols)
+                if pr == r: # Arrived moving horizontally: keep going, or turn up/down
+                    directions = ((0, 1 if c > pc else -1), (1, 0), (-1, 0))
+                else: # Arrived moving vertically: keep going, or turn left/right
+                    directions = ((1 if r > pr else -1, 0), (0, 1), (0, -1))
+            for dr, dc in directions:
+                if dr:
+                    point = jump_vertical(current, dr)
+                else:
+                    point = jump_horizontal(current, dc)
+                if point == -1:
+                    continue
+                jr, jc = divmod(point, cols)
+                new_g = g + abs(jr - r) + abs(jc - c)
+                if new_g < g_score.get(point, size):
+                    g_score[point] = new_g
+                    parent[point] = current
+                    heappush(heap, (new_g + abs(jr - goal_r) + abs(jc - goal_c), -new_g, point))
+        return []
+
+    @staticmethod
+    def _expand(parent, node, cols):
+        """ Rebuilds the jump point chain and fills in every straight run cell by cell. """
+        points = []
+        while node != -1:
+            points.append(divmod(node, cols))
+            node = parent[node]
+        points.reverse()
+        path = [points[0]]
+        for (r0, c0), (r1, c1) in zip(points, points[1:]):
+            dr = (r1 > r0) - (r1 < r0)
+            dc = (c1 > c0) - (c1 < c0)
+            path.extend((r0 + dr * k, c0 + dc * k) for k in range(1, abs(r1 - r0) + abs(c1 - c0) + 1))
+        return path
@@ -0,0 +1,138 @@
+"""
+On-disk warehouse layout, mapped straight into a Grid.
+
+Layout, all little-endian:
+    header      struct HEADER (magic, version, rows, cols, metadata length,
+                mask offset, distance tables offset)
+    metadata    JSON: robot depots, the shelf settings and seed the layout was
+                generated with, and the goal cell and dtype of every stored
+                distance table
+    mask        rows * cols bytes, 1 = static obstacle: the same row-major
+                layout as Grid.mask, so the grid uses the mapped bytes as is
+    tables      optional: one flat distance field (DistanceFieldCache layout)
+                per goal, back to back
+
+Sections start on ALIGN-byte boundaries so the tables map as aligned NumPy
+arrays. A layout is mapped copy-on-write: opening one reads the header and
+metadata only, pages are faulted in as the planners touch them, and a
+simulation that adds obstacles later never writes back to the file.
+"""
+import json
+import mmap
+import os
+import struct
+import numpy as np
+from .settings import Settings
+
+MAGIC = b"WHLY"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxIIIQQ")
+ALIGN = 64
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+class Layout:
+    """
+    A static floor: occupancy mask (a writable rows * cols byte buffer),
+    metadata (see the module docstring) and distance tables by goal. Layout.open
+    maps one from a file; a checkpoint restore builds one from its saved mask.
+    """
+    def __init__(self, rows, cols, mask, metadata, distance_tables=None):
+        self.rows = rows
+        self.cols = cols
+        self.mask = mask
+        self.metadata = metadata
+        self.depots = {robot_id: (r, c) for robot_id, r, c in metadata["depots"]}
+        self.distance_tables = distance_tables if distance_tables is not None else {}
+        self.path = None # File it was mapped from, if any
+        self.map = None  # The mmap backing mask and tables, if any
+
+    @classmethod
+    def open(cls, path):
+        """ Maps a layout file copy-on-write; only the header and metadata are read. """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        if len(mapped) < HEADER.size:
+            raise ValueError("Not a warehouse layout file.")
+        magic, version, rows, cols, metadata_len, mask_offset, tables_offset = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} warehouse layout file.")
+        metadata = json.loads(mapped[HEADER.size:HEADER.size + metadata_len])
+        size = rows * cols
+        if mask_offset + size > len(mapped):
+            raise ValueError("Layout file is truncated.")
+
+        dtype = np.dtype(metadata["table_dtype"])
+        goals = metadata["table_goals"]
+        if tables_offset + len(goals) * size * dtype.itemsize > len(mapped):
+            raise ValueError("Layout file is truncated.")
+        tables = {} # goal -> read-only flat field over the mapped file
+        for i, (r, c) in enumerate(goals):
+            table = np.frombuffer(mapped, dtype=dtype, count=size, offset=tables_offset + i * size * dtype.itemsize)
+            table.flags.writeable = False
+            tables[(r, c)] = table
+        layout = cls(rows, cols, memoryview(mapped)[mask_offset:mask_offset + size], metadata, tables)
+        layout.path = path
+        layout.map = mapped
+        return layout
+
+    def apply(self, settings):
+        """ A copy of settings with this layout's floor size, depots and shelf settings. """
+        shelves = self.metadata["shelves"]
+        return Settings(**{
+            **settings.as_dict(),
+            "GRID_SIZE": (self.rows, self.cols),
+            "NUM_ROBOTS": len(self.depots),
+            "ROBOT_DEPOT_POSITIONS": dict(self.depots),
+            "SHELF_BLOCKS": shelves["blocks"],
+            "SHELF_CENTER_AISLE_WIDTH": shelves["center_aisle_width"],
+            "SHELF_SIDE_PADDING": shelves["side_padding"],
+            "RANDOM_OBSTACLE_DENSITY": shelves["random_obstacle_density"],
+        })
+
+
+def layout_metadata(settings, seed, goals=(), table_dtype=np.int32):
+    """ The metadata section for a floor generated with these settings and seed. """
+    return {
+        "depots": [[robot_id, r, c] for robot_id, (r, c) in sorted(settings.ROBOT_DEPOT_POSITIONS.items())],
+        "shelves": {
+            "blocks": settings.SHELF_BLOCKS,
+            "center_aisle_width": settings.SHELF_CENTER_AISLE_WIDTH,
+            "side_padding": settings.SHELF_SIDE_PADDING,
+            "random_obstacle_density": settings.RANDOM_OBSTACLE_DENSITY,
+        },
+        "seed": seed,
+        "table_dtype": np.dtype(table_dtype).str,
+        "table_goals": [list(goal) for goal in goals],
+    }
+
+
+def export_layout(sim, path, distance_goals=()):
+    """
+    Writes a simulation's static layout to a layout file, with a distance
+    table for every goal in distance_goals (taken from, or computed into, the
+    simulation's distance field cache).
+    """
+    grid = sim.grid
+    size = grid.rows * grid.cols
+    goals = list(dict.fromkeys(tuple(goal) for goal in distance_goals))
+    tables = [np.ascontiguousarray(sim.distance_fields.get(goal)) for goal in goals]
+    dtype = sim.distance_fields.dtype
+    metadata = json.dumps(layout_metadata(sim.settings, sim.seed, goals, dtype)).encode()
+    mask_offset = _aligned(HEADER.size + len(metadata))
+    tables_offset = _aligned(mask_offset + size)
+
+    # Written next to the target and renamed over it, so a process that has the old file mapped keeps it intact.
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, grid.rows, grid.cols, len(metadata), mask_offset, tables_offset))
+        f.write(metadata)
+        f.write(bytes(mask_offset - f.tell()))
+        f.write(grid.mask)
+        f.write(bytes(tables_offset - f.tell()))
+        for table in tables:
+            f.write(table.astype(dtype, copy=False).tobytes())
+    os.replace(temp_path, path)
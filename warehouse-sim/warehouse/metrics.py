@@ -0,0 +1,155 @@
+"""
+Hot-path instrumentation of one simulation, rendered in the Prometheus text
+exposition format (served by the dashboard at /metrics).
+
+Everything is plain Python counters and fixed-bucket histograms updated in
+place by the simulation thread; rendering only reads them. With
+METRICS_ENABLED = False the simulation keeps `metrics = None` and every
+instrumented call site is skipped behind a single `is not None` check, so
+nothing is timed, counted or allocated.
+"""
+import bisect
+
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+NODE_BUCKETS = (0, 16, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _labels(label_name, label, extra=""):
+    parts = [f'{label_name}="{label}"'] if label_name else []
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """ Monotonic total, optionally split by one label. """
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_name=None):
+        self.name = name
+        self.help = help_text
+        self.label_name = label_name
+        self.values = {}
+
+    def inc(self, value=1, label=None):
+        self.values[label] = self.values.get(label, 0) + value
+
+    def samples(self):
+        for label, value in sorted(list(self.values.items()), key=lambda item: str(item[0])):
+            yield f"{self.name}{_labels(self.label_name, label)} {_number(value)}"
+
+
+class Gauge(Counter):
+    """ Current value, optionally split by one label. """
+    kind = "gauge"
+
+    def set(self, value, label=None):
+        self.values[label] = value
+
+
+class Histogram:
+    """ Fixed-bucket histogram, optionally split by one label. """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets, label_name=None):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.label_name = label_name
+        self.series = {} # label -> [per-bucket counts (last one is +Inf), sum, count]
+
+    def observe(self, value, label=None):
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [[0] * (len(self.buckets) + 1), 0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for label, (counts, total, count) in sorted(list(self.series.items()), key=lambda item: str(item[0])):
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, "+Inf"), list(counts)):
+                cumulative += bucket
+                le = 'le="{}"'.format(bound if bound == "+Inf" else _number(bound))
+                yield f"{self.name}_bucket{_labels(self.label_name, label, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_name, label)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_name, label)} {count}"
+
+
+class Metrics:
+    """ The instruments of one Simulation; see the call sites for what feeds each of them. """
+    def __init__(self):
+        self.tick_seconds = Histogram(
+            "warehouse_tick_seconds", "Wall time of one simulation step.", TIME_BUCKETS)
+        self.phase_seconds = Histogram(
+            "warehouse_phase_seconds", "Wall time of one phase of a step.", TIME_BUCKETS, "phase")
+        self.search_expansions = Histogram(
+            "warehouse_search_expansions", "Nodes expanded by one path search.", NODE_BUCKETS, "algorithm")
+        self.search_seconds = Histogram(
+            "warehouse_search_seconds", "Wall time of one path search.", TIME_BUCKETS, "algorithm")
+        self.distance_field_seconds = Histogram(
+            "warehouse_distance_field_seconds", "Wall time of one distance field BFS (cache miss).", TIME_BUCKETS)
+        self.distance_field_lookups = Counter(
+            "warehouse_distance_field_lookups_total", "Distance field cache lookups.", "result")
+        self.route_cache_lookups = Counter(
+            "warehouse_route_cache_lookups_total",
+            "Pickup to drop route cache lookups (hit, miss, or blocked: the route was cut and searched around).",
+            "result")
+        self.route_cache_bytes = Gauge(
+            "warehouse_route_cache_bytes", "Memory charged to cached routes.")
+        self.replans = Counter(
+            "warehouse_replans_total", "Attempts to re-plan a robot's current objective.", "reason")
+        self.replans_per_tick = Histogram(
+            "warehouse_replans_per_tick", "Re-plan attempts during one step.", COUNT_BUCKETS)
+        self.joint_plans = Counter(
+            "warehouse_joint_plans_total", "Batches planned together (solved) or handed to sequential planning.",
+            "result")
+        self.assignments = Counter(
+            "warehouse_assignments_total", "Tasks assigned to a robot.")
+        self.tasks_completed = Counter(
+            "warehouse_tasks_completed_total", "Tasks delivered.")
+        self.tasks = Gauge(
+            "warehouse_tasks", "Tasks by status (completed/cancelled: recent history kept).", "status")
+        self.robots = Gauge(
+            "warehouse_robots", "Robots by state after the last step.", "state")
+        self.dynamic_obstacles = Gauge(
+            "warehouse_dynamic_obstacles", "Temporary obstacles on the floor.")
+        self.tick = Gauge(
+            "warehouse_tick", "Current simulation tick.")
+        self.checkpoint_seconds = Histogram(
+            "warehouse_checkpoint_seconds", "Wall time of capturing (in the tick) or writing one checkpoint.",
+            TIME_BUCKETS, "stage")
+        self.checkpoint_bytes = Gauge(
+            "warehouse_checkpoint_bytes", "Size of the last checkpoint written.")
+        self.tick_replans = 0 # Re-plans so far in the step being run
+
+    def observe_search(self, algorithm, expanded, seconds):
+        self.search_expansions.observe(expanded, algorithm)
+        self.search_seconds.observe(seconds, algorithm)
+
+    def replan(self, reason):
+        self.replans.inc(label=reason)
+        self.tick_replans += 1
+
+    def end_tick(self, seconds):
+        self.tick_seconds.observe(seconds)
+        self.replans_per_tick.observe(self.tick_replans)
+        self.tick_replans = 0
+
+    def instruments(self):
+        return [value for value in vars(self).values() if isinstance(value, (Counter, Histogram))]
+
+    def render(self):
+        """ All instruments in the Prometheus text exposition format (version 0.0.4). """
+        lines = []
+        for instrument in self.instruments():
+            lines.append(f"# HELP {instrument.name} {instrument.help}")
+            lines.append(f"# TYPE {instrument.name} {instrument.kind}")
+            lines.extend(instrument.samples())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,236 @@
+import time
+from heapq import heappush, heappop
+import config
+
+
+def astar(grid, start, goal, blocked_cells=None, metrics=None):
+    """
+    A* search on the grid's flat occupancy mask with a Manhattan heuristic.
+
+    Nodes are flat integer indices and the path is rebuilt from parent pointers,
+    so nothing larger than an int is pushed onto the heap. Returns the list of
+    (row, col) cells from start to goal inclusive, or [] if the goal is unreachable.
+    The search is recorded in `metrics` (a warehouse.metrics.Metrics) if one is given.
+    """
+    if start == goal:
+        return [start]
+    if not grid.is_valid(goal):
+        return []
+
+    cols = grid.cols
+    size = grid.rows * cols
+    # The mask is a private copy, so closed nodes are marked in it directly.
+    mask = grid.occupancy_mask(blocked_cells)
+    start_idx = start[0] * cols + start[1]
+    goal_idx = goal[0] * cols + goal[1]
+    if mask[goal_idx]:
+        return []
+    if metrics is not None:
+        started = time.perf_counter()
+        closed_before = mask.count(1)
+
+    goal_r, goal_c = goal
+    parent = {start_idx: -1}
+    g_score = {start_idx: 0}
+    heap = [(abs(start[0] - goal_r) + abs(start[1] - goal_c), 0, start_idx)]
+    path = []
+    while heap:
+        _, neg_g, current = heappop(heap)
+        if current == goal_idx:
+            path = reconstruct_path(parent, current, cols)
+            break
+        if mask[current] and current != start_idx:
+            continue
+        mask[current] = 1
+
+        g = 1 - neg_g
+        r, c = divmod(current, cols)
+        # Same neighbour order as the original search: right, left, down, up.
+        if c + 1 < cols and not mask[current + 1] and g < g_score.get(current + 1, size):
+            g_score[current + 1] = g
+            parent[current + 1] = current
+            heappush(heap, (g + abs(r - goal_r) + abs(c + 1 - goal_c), -g, current + 1))
+        if c > 0 and not mask[current - 1] and g < g_score.get(current - 1, size):
+            g_score[current - 1] = g
+            parent[current - 1] = current
+            heappush(heap, (g + abs(r - goal_r) + abs(c - 1 - goal_c), -g, current - 1))
+        nxt = current + cols
+        if nxt < size and not mask[nxt] and g < g_score.get(nxt, size):
+            g_score[nxt] = g
+            parent[nxt] = current
+            heappush(heap, (g + abs(r + 1 - goal_r) + abs(c - goal_c), -g, nxt))
+        nxt = current - cols
+        if nxt >= 0 and not mask[nxt] and g < g_score.get(nxt, size):
+            g_score[nxt] = g
+            parent[nxt] = current
+            heappush(heap, (g + abs(r - 1 - goal_r) + abs(c - goal_c), -g, nxt))
+    if metrics is not None:
+        # Closed nodes are the ones the search marked in its mask copy.
+        metrics.observe_search("astar", mask.count(1) - closed_before, time.perf_counter() - started)
+    return path
+
+
+def reconstruct_path(parent, node, cols):
+    """ Walks parent pointers back from node and returns the (row, col) path. """
+    path = []
+    while node != -1:
+        path.append(divmod(node, cols))
+        node = parent[node]
+    path.reverse()
+    return path
+
+
+def cooperative_astar(grid, table, robot_id, start, goal, start_tick,
+                      blocked_cells=None, window=None, distance_field=None, hold_from=None, metrics=None,
+                      end_hold=0, final=True):
+    """
+    Windowed cooperative A* (WHCA*) in space-time against a ReservationTable.
+
+    For the first `window` steps the search runs over (cell, step) states, may
+    wait in place, and only enters cells that are free in the table for the
+    PACE ticks the robot would hold them. Beyond the window time is dropped and
+    the search finishes as plain spatial A*. If a goal distance field is given
+    it is used as an exact static heuristic. Like every robot path, the result
+    starts with `start`; path[k] is entered at start_tick + k * PACE. Waits
+    appear as repeated cells, which Robot.move_step already follows.
+
+    hold_from is the tick the robot has been standing on `start` since; that cell
+    must stay free until the robot can leave it, or no plan is possible.
+    The last cell the caller reserves, path[window - 1] or the goal if a `final`
+    leg reaches it sooner, is held `end_hold` steps longer (WHCA_END_HOLD), so
+    it has to be free for that long as well.
+    The search is recorded in `metrics` if one is given.
+    """
+    if window is None:
+        window = config.WHCA_WINDOW
+    if start == goal:
+        return [start]
+    if not grid.is_valid(goal):
+        return []
+
+    cols = grid.cols
+    size = grid.rows * cols
+    mask = grid.occupancy_mask(blocked_cells)
+    start_idx = start[0] * cols + start[1]
+    goal_idx = goal[0] * cols + goal[1]
+    if mask[goal_idx]:
+        return []
+    goal_r, goal_c = goal
+    if distance_field is not None:
+        if distance_field[start_idx] < 0:
+            return []
+        heuristic = lambda idx: int(distance_field[idx])
+    else:
+        heuristic = lambda idx: abs(idx // cols - goal_r) + abs(idx % cols - goal_c)
+
+    pace = table.pace
+    is_free = table.is_free
+    end = pace * (1 + end_hold)
+    if hold_from is not None and not is_free(start_idx, hold_from, start_tick + pace, robot_id):
+        return []
+    if metrics is not None:
+        started = time.perf_counter()
+    # State key = step * size + cell, with every step >= window folded into `window`.
+    parent = {start_idx: -1}
+    g_score = {start_idx: 0}
+    closed = set()
+    heap = [(heuristic(start_idx), 0, start_idx)]
+    path = []
+    while heap:
+        _, neg_g, key = heappop(heap)
+        if key in closed:
+            continue
+        closed.add(key)
+        step, current = divmod(key, size)
+        if current == goal_idx:
+            while key != -1:
+                path.append(divmod(key % size, cols))
+                key = parent[key]
+            path.reverse()
+            break
+
+        g = 1 - neg_g
+        c = current % cols
+        neighbors = []
+        if c + 1 < cols: neighbors.append(current + 1)
+        if c > 0: neighbors.append(current - 1)
+        if current + cols < size: neighbors.append(current + cols)
+        if current >= cols: neighbors.append(current - cols)
+
+        if step < window:
+            neighbors.append(current)  # Waiting is only meaningful inside the window
+            next_step = step + 1
+            arrive = start_tick + next_step * pace
+        else:
+            next_step = window
+        for nxt in neighbors:
+            if mask[nxt] and nxt != current:
+                continue
+            if distance_field is not None and distance_field[nxt] < 0:
+                continue
+            if step < window and not is_free(
+                    nxt, arrive,
+                    arrive + (end if next_step == window - 1 or (final and nxt == goal_idx) else pace), robot_id):
+                continue
+            next_key = next_step * size + nxt
+            if next_key in closed or g >= g_score.get(next_key, g + 1):
+                continue
+            g_score[next_key] = g
+            parent[next_key] = key
+            heappush(heap, (g + heuristic(nxt), -g, next_key))
+    if metrics is not None:
+        metrics.observe_search("whca", len(closed), time.perf_counter() - started)
+    return path
+
+
+def find_refuge(grid, table, robot_id, start, start_tick, until, blocked_cells=None, window=None, hold_from=None):
+    """
+    Shortest space-time path (path[k] entered at start_tick + k * PACE, waits as
+    repeated cells) to the nearest cell the robot can hold from its arrival
+    until tick `until`, entering only cells free in the table for the PACE ticks
+    it holds them. Used to get out of the way of a reservation that will run
+    over the cell a blocked robot is waiting on. [start] if start itself can be
+    held (from hold_from) that long, [] if no cell within `window` steps can.
+    """
+    if window is None:
+        window = config.WHCA_WINDOW
+    cols = grid.cols
+    size = grid.rows * cols
+    mask = grid.occupancy_mask(blocked_cells)
+    pace = table.pace
+    is_free = table.is_free
+    start_idx = start[0] * cols + start[1]
+    if hold_from is not None and not is_free(start_idx, hold_from, start_tick + pace, robot_id):
+        return []
+    if is_free(start_idx, start_tick, until, robot_id):
+        return [start]
+    parent = {start_idx: -1}
+    layer = [start_idx]
+    for step in range(1, window + 1):
+        arrive = start_tick + step * pace
+        next_layer = []
+        for key in layer:
+            current = key % size
+            c = current % cols
+            neighbors = [current]
+            if c + 1 < cols: neighbors.append(current + 1)
+            if c > 0: neighbors.append(current - 1)
+            if current + cols < size: neighbors.append(current + cols)
+            if current >= cols: neighbors.append(current - cols)
+            for nxt in neighbors:
+                next_key = step * size + nxt
+                if next_key in parent or (mask[nxt] and nxt != start_idx):
+                    continue
+                if not is_free(nxt, arrive, arrive + pace, robot_id):
+                    continue
+                parent[next_key] = key
+                if is_free(nxt, arrive, until, robot_id):
+                    path = []
+                    while next_key != -1:
+                        path.append(divmod(next_key % size, cols))
+                        next_key = parent[next_key]
+                    path.reverse()
+                    return path
+                next_layer.append(next_key)
+        layer = next_layer
+    return []
@@ -0,0 +1,111 @@
+from collections import deque
+import config
+
+
+class ReservationTable:
+    """
+    Space-time reservations: which robot holds which cell at which tick.
+
+    A robot standing on a cell holds it from the tick it arrives until the tick
+    it leaves (inclusive), so a cell is never entered on the same tick another
+    robot leaves it and head-on swaps are impossible. Keys are (cell, tick)
+    packed into one int; each robot's keys are kept in time order so they can
+    be released incrementally as the robot advances.
+    """
+    def __init__(self, grid, pace=None):
+        self.grid = grid
+        self.pace = pace if pace is not None else config.ROBOT_PACE
+        self.size = grid.rows * grid.cols
+        self.now = 0
+        self.latest = 0     # Highest tick ever reserved (nothing is held after it)
+        self.cells = {}     # tick * size + cell -> robot id
+        self.by_robot = {}  # robot id -> deque of keys in time order
+        self.displaced = set() # Robots whose reservations were taken over; they must re-plan (see reserve)
+
+    def advance(self, tick):
+        """ Moves the table's notion of "now" to the given simulation tick. """
+        self.now = tick
+
+    def first_move_tick(self, pace_counter):
+        """ Tick of a robot's next move given its pace counter (see Robot.move_step). """
+        return self.now + max(0, self.pace - 1 - pace_counter)
+
+    def is_free(self, cell, start_tick, end_tick, robot_id):
+        """ True if no other robot holds the cell at any tick in [start_tick, end_tick]. """
+        cells = self.cells
+        size = self.size
+        for tick in range(start_tick, end_tick + 1):
+            owner = cells.get(tick * size + cell)
+            if owner is not None and owner != robot_id:
+                return False
+        return True
+
+    def reserve(self, robot_id, cell, start_tick, end_tick, take_over=False):
+        """
+        Holds a cell for [start_tick, end_tick]. Ticks already held by others are
+        left alone, unless take_over is set (a robot that cannot move has right of
+        way on the cell it stands on): then they change hands and their previous
+        owners are added to `displaced`. True if every tick is now held.
+        """
+        cells = self.cells
+        keys = self.by_robot.setdefault(robot_id, deque())
+        size = self.size
+        if end_tick > self.latest:
+            self.latest = end_tick
+        held = True
+        for tick in range(start_tick, end_tick + 1):
+            key = tick * size + cell
+            owner = cells.get(key)
+            if owner is None:
+                cells[key] = robot_id
+                keys.append(key)
+            elif owner != robot_id:
+                if not take_over:
+                    held = False
+                    continue
+                self.by_robot[owner].remove(key)
+                self.displaced.add(owner)
+                cells[key] = robot_id
+                keys.append(key)
+        return held
+
+    def reserve_path(self, robot_id, pos, path, first_move_tick, limit=None, linger=0, take_over=False):
+        """
+        Reserves a robot's current cell until its first move, then each path cell
+        for the PACE ticks it is occupied. Only the first `limit` steps are held,
+        and the last of them for `linger` extra steps. True if nothing was
+        already held by another robot (see reserve for take_over).
+        """
+        cols = self.grid.cols
+        pace = self.pace
+        held = self.reserve(robot_id, pos[0] * cols + pos[1], self.now, first_move_tick, take_over)
+        steps = path if limit is None else path[:limit]
+        last = len(steps) - 1
+        for k, (r, c) in enumerate(steps):
+            arrive = first_move_tick + k * pace
+            # The last reserved cell is held for longer: a robot that cannot
+            # extend its window waits there rather than running on unreserved.
+            hold = pace * (1 + linger) if k == last else pace
+            held = self.reserve(robot_id, r * cols + c, arrive, arrive + hold, take_over) and held
+        return held
+
+    def release(self, robot_id, before_tick=None):
+        """ Drops a robot's reservations, or only those for ticks before before_tick. """
+        keys = self.by_robot.get(robot_id)
+        if not keys:
+            return
+        cells = self.cells
+        if before_tick is None:
+            for key in keys:
+                if cells.get(key) == robot_id:
+                    del cells[key]
+            keys.clear()
+            return
+        limit = before_tick * self.size
+        while keys and keys[0] < limit:
+            key = keys.popleft()
+            if cells.get(key) == robot_id:
+                del cells[key]
+
+    def __len__(self):
+        return len(self.cells)
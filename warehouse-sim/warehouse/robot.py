@@ -1,51 +1,160 @@
-from heapq import heappush, heappop
-import config
+import time
+from .pathfinding import astar, cooperative_astar, find_refuge
+from .incremental import DStarLite
+from .settings import Settings
 
 class Robot:
     """ Represents a single warehouse robot with simulated sensors. """
-    def __init__(self, robot_id, start_pos, grid):
+    def __init__(self, robot_id, start_pos, grid, distance_fields=None, reservations=None, planner=None,
+                 settings=None):
         self.id = robot_id
         self.start_pos = start_pos
         self.pos = start_pos
         self.grid = grid
+        self.distance_fields = distance_fields # Shared goal distance fields, if any
+        self.reservations = reservations # Shared space-time ReservationTable, if any
+        self.planner = planner # Shared HierarchicalPlanner or JumpPointPlanner, if any
+        self.settings = settings if settings is not None else Settings() # Usually the simulation's
+        self.event_log = None # The simulation's EventLog, if it keeps one
+        self.metrics = None # The simulation's Metrics, if it keeps them
+        self.event_sink = None # The simulation's EventSink, if any
+        self.task_store = None # The simulation's TaskStore, told about completed tasks
+        self.routes = None # The simulation's RouteCache for pickup to drop legs, if it keeps one
         self.path = []
         self.task = None
         self.state = "idle" # idle, moving_to_pickup, moving_to_drop, returning
         
         # --- Simulated Physical Attributes ---
         self.pace_counter = 0 
+        self.moves_since_plan = 0 # Steps taken since the reserved window was planned
+        self.window = self.settings.WHCA_WINDOW # Steps of the path reserved when it was planned
         # Memory of temporary obstacles seen by its "sensors"
         self.temp_obstacles = set()
+        # Persistent D* Lite searches for the goals of the legs being driven
+        self.incremental = {}
+        self.grid.place_robot(self.id, None, self.pos)
 
     def calculate_path_for_task(self, task, blocked_cells):
         """ Calculates a full path for a task, considering all known obstacles. """
         self.temp_obstacles.clear() # Clear memory of old dynamic obstacles
         
         blocked_with_temp = blocked_cells.union(self.temp_obstacles)
-        path_to_pickup = self._dijkstra(self.pos, task['pickup'], blocked_with_temp)
+        start_tick = self._begin_plan()
+        path_to_pickup = self._plan_leg(self.pos, task['pickup'], blocked_with_temp, start_tick, 0, final=False)
         if not path_to_pickup:
-            return False
+            return self._abort_plan()
 
-        newly_blocked = blocked_with_temp.union(set(path_to_pickup[:-1]))
-        path_to_drop = self._dijkstra(task['pickup'], task['drop'], newly_blocked)
+        if self.reservations is None:
+            newly_blocked = blocked_with_temp.union(set(path_to_pickup[:-1]))
+        else:
+            newly_blocked = blocked_with_temp # Time-indexed reservations already keep legs apart
+        steps_used = len(path_to_pickup) - 1
+        path_to_drop = self._plan_leg(
+            task['pickup'], task['drop'], newly_blocked,
+            start_tick + steps_used * self.settings.ROBOT_PACE, steps_used, recurring=True
+        )
         if not path_to_drop:
-            return False
+            return self._abort_plan()
 
         self.path = path_to_pickup + path_to_drop[1:]
         self.task = task
         self.state = "moving_to_pickup"
+        self._commit_plan(start_tick)
+        return True
+
+    def calculate_path_to_drop(self, blocked_cells):
+        """ Re-plans only the remaining drop leg of a task whose item is already picked up. """
+        self.temp_obstacles.clear()
+        start_tick = self._begin_plan()
+        path_to_drop = self._plan_leg(self.pos, self.task['drop'], blocked_cells, start_tick, 0)
+        if not path_to_drop:
+            return self._abort_plan()
+        self.path = path_to_drop
+        self._commit_plan(start_tick)
         return True
 
     def calculate_return_path(self, blocked_cells):
         """ Calculates a path back to the depot. """
         self.temp_obstacles.clear()
-        path_to_depot = self._dijkstra(self.pos, self.start_pos, blocked_cells)
+        start_tick = self._begin_plan()
+        path_to_depot = self._plan_leg(self.pos, self.start_pos, blocked_cells, start_tick, 0)
         if path_to_depot:
             self.path = path_to_depot
             self.state = "returning"
+            self._commit_plan(start_tick)
+            return True
+        return self._abort_plan()
+
+    def follow_joint_plan(self, path, task=None):
+        """
+        Takes a path planned together with other robots (warehouse/cbs.py): a task's
+        pickup and drop legs, or the way back to the depot when there is no task.
+        The whole path is reserved, since it is conflict-free as a whole.
+        """
+        self.temp_obstacles.clear()
+        start_tick = self._begin_plan()
+        self.path = path
+        if task is not None:
+            self.task = task
+            self.state = "moving_to_pickup"
+        else:
+            self.state = "returning"
+        self._commit_plan(start_tick, whole_path=True)
+
+    def replan(self, blocked_cells):
+        """ Re-plans the robot's current objective from where it stands. """
+        if self.state == 'moving_to_pickup' and self.task:
+            return self.calculate_path_for_task(self.task, blocked_cells)
+        if self.state == 'moving_to_drop' and self.task:
+            return self.calculate_path_to_drop(blocked_cells)
+        if self.state == 'returning':
+            return self.calculate_return_path(blocked_cells)
+        return False
+
+    def refresh_window(self, blocked_cells):
+        """
+        Re-plans a WHCA* window that is half used up. If no new plan is found once
+        the reserved window is exhausted, the robot waits in place instead of
+        driving on along cells nobody has reserved for it.
+        """
+        if self.metrics is not None:
+            self.metrics.replan("window")
+        if self.replan(blocked_cells):
+            return True
+        if self.moves_since_plan >= self.settings.WHCA_WINDOW:
+            table = self.reservations
+            wait_until = table.first_move_tick(self.pace_counter) + table.pace * (1 + self.settings.WHCA_WINDOW // 2)
+            if not table.is_free(self.grid.index(self.pos), table.now, wait_until, self.id):
+                # Another robot has this cell reserved for while we would wait on it: make way instead.
+                if self._make_way(blocked_cells):
+                    return True
+            self._hold_position()
+        return False
+
+    def give_way(self, blocked_cells):
+        """
+        Another robot that cannot move has taken over cells this one had reserved
+        (ReservationTable.displaced): re-plans around it, or waits where it stands.
+        """
+        if self.state == 'idle':
+            return False
+        if self.metrics is not None:
+            self.metrics.replan("displaced")
+        if self.replan(blocked_cells):
             return True
+        self._hold_position()
         return False
 
+    def needs_window_refresh(self):
+        """
+        True once half of the reserved WHCA* window has been consumed and the path
+        runs past it. A path reserved as a whole (a joint plan) never needs this.
+        """
+        if self.reservations is None or not self.path:
+            return False
+        return (self.moves_since_plan >= self.window // 2 and
+                len(self.path) > self.window - self.moves_since_plan)
+
     def scan_and_react(self, dynamic_obstacles, other_robot_paths):
         """
         Simulates a sensor scan. If an obstacle is detected, it triggers a path recalculation.
@@ -53,20 +162,19 @@ class Robot:
         """
         if self.state == 'idle': return False
 
-        scan_path = self.path[:config.ROBOT_SCAN_RANGE]
+        scan_path = self.path[:self.settings.ROBOT_SCAN_RANGE]
         for cell in scan_path:
             if cell in dynamic_obstacles:
-                print(f"Robot {self.id} detected dynamic obstacle at {cell}! Re-routing...")
+                self._emit("obstacle_detected", robot=self.id, cell=cell)
                 self.temp_obstacles.add(cell) # Add to its personal memory of hazards
                 
                 # The robot must re-plan its entire current objective
                 all_blocked = self.temp_obstacles.union(other_robot_paths)
                 
-                if self.state == 'moving_to_pickup' or self.state == 'moving_to_drop':
-                    self.calculate_path_for_task(self.task, all_blocked)
-                elif self.state == 'returning':
-                    self.calculate_return_path(all_blocked)
-                
+                if self.metrics is not None:
+                    self.metrics.replan("obstacle")
+                self.replan(all_blocked)
+
                 return True # Path was recalculated
         return False
 
@@ -76,44 +184,222 @@ class Robot:
         This simulates the speed of a physical robot.
         """
         self.pace_counter += 1
-        if self.pace_counter < config.ROBOT_PACE:
+        if self.pace_counter < self.settings.ROBOT_PACE:
             return
 
         if not self.path:
             return
         
         self.pace_counter = 0 # Reset counter after moving
+        old_pos = self.pos
         self.pos = self.path.pop(0)
+        self.grid.place_robot(self.id, old_pos, self.pos)
+        self.grid.advance_claim(self.id, old_pos)
+        self.moves_since_plan += 1
+        if self.reservations is not None:
+            # Ticks already lived through are handed back to the table as we go.
+            self.reservations.release(self.id, before_tick=self.reservations.now)
 
         # --- State Transitions ---
         if self.task and self.state == 'moving_to_pickup' and self.pos == self.task['pickup']:
             self.state = "moving_to_drop"
-        elif self.task and self.state == 'moving_to_drop' and self.pos == self.task['drop']:
-            print(f"Robot {self.id} completed task {self.task['id']} at {self.pos}.")
-            self.task['status'] = 'completed'
-            self.task = None
-            self.state = "idle"
+        # Not an elif: a task whose drop equals its pickup completes on arrival.
+        if self.task and self.state == 'moving_to_drop' and self.pos == self.task['drop']:
+            self._finish_task()
         elif self.state == 'returning' and self.pos == self.start_pos:
-            self.state = 'idle'
-            print(f"Robot {self.id} has returned to depot.")
-
-
-    def _dijkstra(self, start, goal, blocked_cells=None):
-        """ Dijkstra's algorithm for finding the shortest path. """
-        if blocked_cells is None: blocked_cells = set()
-        visited = set()
-        heap = [(0, start, [start])]
-        while heap:
-            cost, current, path = heappop(heap)
-            if current == goal: return path
-            if current in visited: continue
-            visited.add(current)
-            r, c = current
-            for dr, dc in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_pos = (r + dr, c + dc)
-                if self.grid.is_valid(next_pos) and \
-                   not self.grid.is_occupied(next_pos) and \
-                   next_pos not in blocked_cells:
-                    heappush(heap, (cost + 1, next_pos, path + [next_pos]))
-        return []
+            self._finish_return()
+
+    def _finish_task(self):
+        self._emit("task_completed", robot=self.id, task=self.task['id'], pos=self.pos)
+        if self.task_store is not None:
+            self.task_store.complete(self.task)
+        else:
+            self.task['status'] = 'completed'
+        self.task = None
+        self.state = "idle"
+        self.incremental = {}
+        self._claim_path()
+        self._release_reservations()
+
+    def _finish_return(self):
+        self.state = 'idle'
+        self.incremental = {}
+        self._claim_path()
+        self._release_reservations()
+        self._emit("robot_returned", robot=self.id, pos=self.pos)
+
+    # --- Planning Helpers ---
+    def _begin_plan(self):
+        """ Drops this robot's reservations before re-planning; returns the tick path[0] is entered. """
+        if self.reservations is None:
+            return 0
+        self.reservations.release(self.id)
+        return self.reservations.first_move_tick(self.pace_counter)
+
+    def _commit_plan(self, start_tick, whole_path=False):
+        """ Reserves the first WHCA* window of the freshly planned path (or all of it). """
+        self.moves_since_plan = 0
+        self.window = len(self.path) if whole_path else self.settings.WHCA_WINDOW
+        self._claim_path()
+        self._log_plan()
+        if self.settings.INCREMENTAL_REPLANNING:
+            self._track_legs()
+        if self.reservations is not None:
+            self.reservations.reserve_path(
+                self.id, self.pos, self.path, start_tick, None if whole_path else self.settings.WHCA_WINDOW,
+                linger=self.settings.WHCA_END_HOLD
+            )
+
+    def _abort_plan(self):
+        """ Planning failed: keep following (and re-reserve) the old path, or wait if others now hold it. """
+        self.window = self.settings.WHCA_WINDOW
+        if self.reservations is not None and self.state != 'idle':
+            if not self.reservations.reserve_path(
+                self.id, self.pos, self.path,
+                self.reservations.first_move_tick(self.pace_counter),
+                max(0, self.settings.WHCA_WINDOW - self.moves_since_plan),
+                linger=self.settings.WHCA_WINDOW // 2
+            ):
+                self._hold_position()
+        return False
+
+    def _hold_position(self):
+        """
+        Waits where the robot stands, with its window used up so it is refreshed
+        every tick. The cell is held for WHCA_WINDOW // 2 steps; as the robot has
+        nowhere else to be, reservations others made on it are taken over.
+        """
+        table = self.reservations
+        table.release(self.id)
+        self.moves_since_plan = max(self.moves_since_plan, self.window)
+        # One pending wait is enough: until it is taken, later failed refreshes only re-reserve it.
+        if not self.path or self.path[0] != self.pos:
+            self.path = [self.pos, *self.path]
+            self._claim_path()
+            self._log_plan()
+        table.reserve_path(
+            self.id, self.pos, self.path, table.first_move_tick(self.pace_counter), 1,
+            linger=self.settings.WHCA_WINDOW // 2, take_over=True
+        )
+
+    def _make_way(self, blocked_cells):
+        """
+        No plan was found, but the cell the robot would wait on is reserved by another
+        robot before the wait runs out. Moves to the nearest cell it can hold for a whole
+        window instead, keeping its objective so the next refresh resumes it.
+        """
+        table = self.reservations
+        start_tick = self._begin_plan()
+        until = start_tick + table.pace * (self.settings.WHCA_WINDOW + self.settings.WHCA_END_HOLD)
+        path = find_refuge(
+            self.grid, table, self.id, self.pos, start_tick, until,
+            blocked_cells.union(self.temp_obstacles), self.settings.WHCA_WINDOW - 1, hold_from=table.now
+        )
+        if not path:
+            return False
+        # Stay on the refuge to the end of the window, which is then refreshed like any other.
+        self.path = path + [path[-1]] * (self.settings.WHCA_WINDOW + 1 - len(path))
+        self._emit("robot_yielded", robot=self.id, cell=path[-1])
+        self._commit_plan(start_tick)
+        return True
+
+    def _claim_path(self):
+        """ Publishes the cells this robot covers (position + path) to the grid's occupancy index. """
+        self.grid.claim_cells(self.id, self.pos, self.path if self.state != 'idle' else None)
+
+    def _emit(self, event, **fields):
+        if self.event_sink is not None:
+            self.event_sink.emit(event, **fields)
+
+    def _log_plan(self):
+        """ Records the new path and state, the only planning outcome a replay needs. """
+        if self.event_log is not None:
+            self.event_log.plan(self)
+
+    def _release_reservations(self):
+        if self.reservations is not None:
+            self.reservations.release(self.id)
+
+    def _plan_leg(self, start, goal, blocked_cells, start_tick, steps_used, recurring=False, final=True):
+        """
+        Plans one leg: space-time WHCA* when reservations are shared, plain search otherwise.
+        A recurring leg (pickup to drop) first tries the cached static route, which is
+        taken as is when no blocked cell or reservation in its window cuts it. The goal
+        of a `final` leg is where the path ends, so it is held WHCA_END_HOLD steps longer.
+        """
+        window = max(0, self.settings.WHCA_WINDOW - steps_used)
+        spatial = self.reservations is None or window == 0
+        hold_from = self.reservations.now if steps_used == 0 and not spatial else None
+        if recurring and self.routes is not None:
+            path = self.routes.lookup(
+                start, goal, self._static_route, blocked_cells, None if spatial else self.reservations, self.id,
+                start_tick, window, hold_from, self.settings.WHCA_END_HOLD, final
+            )
+            if path is not None:
+                return path
+        if spatial:
+            return self._find_path(start, goal, blocked_cells)
+        field = None
+        if self.distance_fields is not None and (self.planner is None or goal in self.distance_fields):
+            field = self.distance_fields.get(goal)
+        return cooperative_astar(
+            self.grid, self.reservations, self.id, start, goal, start_tick,
+            blocked_cells, window, field, hold_from=hold_from, metrics=self.metrics,
+            end_hold=self.settings.WHCA_END_HOLD, final=final
+        )
+
+    def _find_path(self, start, goal, blocked_cells=None):
+        """
+        Finds the shortest path between two cells. A cached goal distance field is
+        descended first; a search only runs when reservations or obstacles cut
+        every shortest path. For the legs the robot is already driving that search
+        is a persistent D* Lite state, so repeated re-routes only repair it.
+
+        With a planner selected (settings.PLANNER = "hpa" or "jps") no whole-grid
+        work is done for a new goal: only already cached fields are descended and
+        the first search is the planner's (HPA* or Jump Point Search).
+        """
+        metrics = self.metrics
+        if self.distance_fields is not None and (self.planner is None or goal in self.distance_fields):
+            started = time.perf_counter() if metrics is not None else 0.0
+            path = self.distance_fields.descend(start, goal, blocked_cells)
+            if path is not None:
+                if metrics is not None:
+                    metrics.observe_search("descend", 0, time.perf_counter() - started)
+                return path
+        search = self.incremental.get(goal)
+        if search is not None:
+            return self._observed(search, "dstar_lite", search.plan, start, blocked_cells)
+        if self.planner is not None:
+            return self._observed(self.planner, self.settings.PLANNER, self.planner.find_path, start, goal, blocked_cells)
+        return astar(self.grid, start, goal, blocked_cells, metrics)
+
+    def _static_route(self, start, goal):
+        """ A shortest path over the static layout alone, as the route cache keeps them. """
+        if self.distance_fields is not None and (self.planner is None or goal in self.distance_fields):
+            return self.distance_fields.descend(start, goal)
+        if self.planner is not None:
+            return self._observed(self.planner, self.settings.PLANNER, self.planner.find_path, start, goal, None)
+        return astar(self.grid, start, goal, None, self.metrics)
+
+    def _observed(self, searcher, algorithm, search, *args):
+        """ Runs a search and, with metrics on, records the nodes the searcher's own counter advanced by. """
+        if self.metrics is None:
+            return search(*args)
+        expansions = searcher.expansions
+        started = time.perf_counter()
+        path = search(*args)
+        self.metrics.observe_search(algorithm, searcher.expansions - expansions, time.perf_counter() - started)
+        return path
 
+    def _track_legs(self):
+        """ Keeps D* Lite states only for the goals of the objective just committed to. """
+        if self.state == 'returning':
+            goals = [self.start_pos]
+        elif self.task:
+            goals = [self.task['pickup'], self.task['drop']]
+        else:
+            goals = []
+        self.incremental = {
+            goal: self.incremental.get(goal) or DStarLite(self.grid, goal) for goal in goals
+        }
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+import numpy as np
+from .grid import ClaimedCells
+
+# Bytes charged per cached route on top of its cells (key tuple, dict slot, array header).
+ENTRY_OVERHEAD = 200
+
+
+class RouteCache:
+    """
+    LRU cache of static routes between recurring cells, e.g. the pickup to drop
+    legs of a task stream dominated by a few hundred station pairs.
+
+    A route is the planner's path over the static layout (no robots or
+    temporary obstacles), stored as a flat int32 array of cell indices. Every
+    lookup re-checks the cached cells against what the caller has to avoid
+    right now, blocked cells and the robot's reservation window, so a hit is
+    only used if the route is still clear; otherwise the caller searches as
+    before. The cache is bounded by the bytes its routes take, and dropped as
+    a whole when the grid's static layout changes.
+    """
+    def __init__(self, grid, max_bytes):
+        self.grid = grid
+        self.max_bytes = max_bytes
+        self.routes = OrderedDict() # (start, goal) -> flat cells, start first
+        self.bytes = 0
+        self.layout_version = grid.layout_version
+        self.hits = 0    # Lookups answered from the cache
+        self.misses = 0  # Lookups that had to search for the route (it is cached afterwards)
+        self.blocked = 0 # Lookups whose route was cut, left to the caller's search
+        self.metrics = None # The simulation's Metrics, if it keeps them
+
+    def clear(self):
+        self.routes.clear()
+        self.bytes = 0
+        self.layout_version = self.grid.layout_version
+
+    def get(self, start, goal):
+        """ The cached flat route from start to goal, or None. """
+        if self.layout_version != self.grid.layout_version:
+            self.clear()
+        route = self.routes.get((start, goal))
+        if route is not None:
+            self.routes.move_to_end((start, goal))
+        return route
+
+    def put(self, start, goal, path):
+        """
+        Caches a static route given as (row, col) cells ([] for an unreachable
+        goal), evicting the least recently used routes over max_bytes.
+        """
+        if self.layout_version != self.grid.layout_version:
+            self.clear()
+        cols = self.grid.cols
+        route = np.fromiter((r * cols + c for r, c in path), dtype=np.int32, count=len(path))
+        old = self.routes.pop((start, goal), None)
+        if old is not None:
+            self.bytes -= old.nbytes + ENTRY_OVERHEAD
+        self.routes[(start, goal)] = route
+        self.bytes += route.nbytes + ENTRY_OVERHEAD
+        while self.bytes > self.max_bytes and self.routes:
+            _, evicted = self.routes.popitem(last=False)
+            self.bytes -= evicted.nbytes + ENTRY_OVERHEAD
+        return route
+
+    def lookup(self, start, goal, search, blocked_cells=None, reservations=None, robot_id=None, start_tick=0,
+               window=0, hold_from=None, end_hold=0, final=True):
+        """
+        The route from start to goal as (row, col) cells if it is clear, [] if
+        the goal cannot be reached over the static layout at all, or None if
+        the route is cut and the caller has to search around what cuts it.
+        On a miss search(start, goal) plans the static route, which is cached
+        (unreachable pairs included). A route is clear if none of its cells
+        after start is in blocked_cells and, with a ReservationTable, the
+        first `window` steps are free for the ticks the robot would hold them
+        (path[k] entered at start_tick + k * PACE, as cooperative_astar plans
+        them). hold_from is the tick the robot has been standing on start
+        since, and end_hold and final say how long the last reserved cell is
+        held, as there.
+        """
+        route = self.get(start, goal)
+        if route is not None:
+            result = "hit"
+            path = [divmod(cell, self.grid.cols) for cell in route.tolist()]
+        else:
+            result = "miss"
+            path = search(start, goal)
+            route = self.put(start, goal, path)
+        if path and not (
+            self._clear(route, path, blocked_cells) and
+            (reservations is None or self._reservable(
+                route, reservations, robot_id, start_tick, window, hold_from, end_hold, final
+            ))
+        ):
+            result, path = "blocked", None
+        if result == "hit":
+            self.hits += 1
+        elif result == "miss":
+            self.misses += 1
+        else:
+            self.blocked += 1
+        if self.metrics is not None:
+            self.metrics.route_cache_lookups.inc(label=result)
+        return path
+
+    @staticmethod
+    def _clear(route, path, blocked_cells):
+        if isinstance(blocked_cells, ClaimedCells):
+            # Other robots' claimed cells: one mask over the grid instead of a membership test per cell.
+            return not blocked_cells.flat_mask()[route[1:]].any()
+        return not blocked_cells or blocked_cells.isdisjoint(path[1:])
+
+    @staticmethod
+    def _reservable(route, reservations, robot_id, start_tick, window, hold_from, end_hold, final):
+        pace = reservations.pace
+        is_free = reservations.is_free
+        last = len(route) - 1 if final else -1
+        if hold_from is not None and not is_free(int(route[0]), hold_from, start_tick + pace, robot_id):
+            return False
+        for k, cell in enumerate(route[1:window + 1].tolist(), 1):
+            arrive = start_tick + k * pace
+            hold = pace * (1 + end_hold) if k == window - 1 or k == last else pace
+            if not is_free(cell, arrive, arrive + hold, robot_id):
+                return False
+        return True
+
+    def __len__(self):
+        return len(self.routes)
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+import config
+from warehouse.checkpoint import CheckpointWriter
+from warehouse.stream import StateStream
+from warehouse import wire
+
+
+class SimulationRunner:
+    """
+    Steps a Simulation on its own fixed-rate clock thread.
+
+    After every tick the runner publishes an immutable snapshot (and its JSON
+    encoding) by swapping a single reference, so readers never take the lock
+    and any number of dashboards polling /update cost one pointer read each.
+    Anything that mutates the simulation from outside the clock thread must
+    hold `lock`. Each published snapshot is also diffed into `stream` for
+    server-pushed dashboards. The binary wire encoding is only produced once
+    a client has asked for it. If the simulation's settings name a
+    CHECKPOINT_PATH, its state is checkpointed every CHECKPOINT_INTERVAL ticks
+    (captured in the tick, written by the checkpoint thread) and once more on
+    close().
+    """
+    def __init__(self, sim, interval_ms=None):
+        self.sim = sim
+        self.interval = (interval_ms if interval_ms is not None else config.STEP_INTERVAL_MS) / 1000
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.snapshot_json = None
+        self.snapshot_binary = None
+        self.encode_binary = False
+        self.stream = StateStream()
+        self.checkpoints = CheckpointWriter.from_settings(sim.settings, sim.metrics)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        with self.lock:
+            self._publish()
+
+    def start(self):
+        """ Starts the clock thread (idempotent). """
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="simulation-clock", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Stops the clock thread and waits for the current tick to finish. """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def close(self):
+        """ Stops the clock and writes a final checkpoint (if checkpoints are on). """
+        self.stop()
+        if self.checkpoints is not None:
+            with self.lock:
+                self.checkpoints.submit(self.sim)
+            self.checkpoints.close()
+            self.checkpoints = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            with self.lock:
+                self.sim.step()
+                self._publish()
+                if self.checkpoints is not None:
+                    self.checkpoints.tick(self.sim)
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            elif delay < -self.interval:
+                # Fell behind (slow tick): drop the backlog instead of bursting to catch up.
+                next_tick = time.monotonic()
+
+    def _publish(self):
+        """ Builds a fresh snapshot of the state the frontend reads and swaps it in. """
+        sim = self.sim
+        snapshot = {
+            "tick": sim.tick,
+            "robot_data": sim.get_robot_data(),
+            "tasks": [dict(t) for t in sim.get_task_positions()],
+            "dynamic_obstacles": list(sim.dynamic_obstacles),
+        }
+        snapshot_json = json.dumps(snapshot)
+        self.snapshot_json = snapshot_json
+        self.snapshot = snapshot
+        self.snapshot_binary = wire.encode_simulation(sim) if self.encode_binary else None
+        self.stream.publish(snapshot, snapshot_json, sim.tasks)
+
+    def binary_snapshot(self):
+        """ Latest state in the binary wire format; from then on it is encoded every tick. """
+        payload = self.snapshot_binary
+        if payload is None:
+            with self.lock:
+                self.encode_binary = True
+                if self.snapshot_binary is None:
+                    self.snapshot_binary = wire.encode_simulation(self.sim)
+                payload = self.snapshot_binary
+        return payload
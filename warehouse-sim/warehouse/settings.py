@@ -0,0 +1,48 @@
+import copy
+import json
+import config
+
+
+class Settings:
+    """
+    Per-simulation copy of the tunables in config.py.
+
+    Every upper-case name of the config module is copied when the object is
+    built, then the given overrides are applied, so several simulations with
+    different fleets or layouts can live in one process (or be shipped to
+    worker processes) without touching the module-level config.
+    """
+    def __init__(self, **overrides):
+        for name in dir(config):
+            if name.isupper():
+                setattr(self, name, copy.deepcopy(getattr(config, name)))
+        for name, value in overrides.items():
+            if not name.isupper() or not hasattr(self, name):
+                raise ValueError(f"Unknown setting '{name}'.")
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def to_json(self):
+        """ as_dict() as JSON text (sets and tuples become lists). """
+        return json.dumps(self.as_dict(), default=_json_default)
+
+    @classmethod
+    def from_json(cls, values):
+        """ Settings from an as_dict() that went through JSON (tuples became lists, depot ids strings). """
+        values = dict(values)
+        values["GRID_SIZE"] = tuple(values["GRID_SIZE"])
+        values["ROBOT_DEPOT_POSITIONS"] = {
+            int(robot_id): tuple(pos) for robot_id, pos in values["ROBOT_DEPOT_POSITIONS"].items()
+        }
+        return cls(**values)
+
+    def __repr__(self):
+        return f"Settings({', '.join(f'{k}={v!r}' for k, v in sorted(vars(self).items()))})"
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -1,32 +1,138 @@
+import heapq
+import itertools
+import math
 import random
+import time
+from collections import deque
+import numpy as np
 from .grid import Grid
 from .robot import Robot
-import config
+from .fleet import Fleet, FleetRobot
+from .distance_fields import DistanceFieldCache, UNREACHABLE
+from .routes import RouteCache
+from .reservations import ReservationTable
+from .hpa import HierarchicalPlanner
+from .jps import JumpPointPlanner
+from .cbs import ConflictBasedSearch
+from .eventlog import EventLog
+from .layout import Layout
+from .metrics import Metrics
+from .eventsink import EventSink
+from .tasks import TaskStore
+from .assignment import build_cost_matrix, solve_assignment
+from .wire import ROBOT_STATES, TASK_STATUSES
+from .settings import Settings
+
+EVENT_TASK, EVENT_CLEAR, EVENT_SPAWN = "task", "clear", "spawn"
+# Same-tick order: tasks arrive first, then a temporary obstacle may clear, then one may appear.
+EVENT_ORDER = {EVENT_TASK: 0, EVENT_CLEAR: 1, EVENT_SPAWN: 2}
+# Completed-task latencies (ticks from arrival to delivery) kept for reporting.
+TASK_LATENCY_HISTORY = 100000
 
 class Simulation:
     """ Manages the overall simulation state, robots, and tasks. """
-    def __init__(self):
-        self.grid = Grid(config.GRID_SIZE[0], config.GRID_SIZE[1])
-        self.robots = [
-            Robot(robot_id, pos, self.grid)
-            for robot_id, pos in config.ROBOT_DEPOT_POSITIONS.items()
-        ]
+    def __init__(self, settings=None, seed=None, layout=None):
+        # Per-instance tunables (see warehouse/settings.py); defaults to a snapshot of config.py.
+        settings = settings if settings is not None else Settings()
+        # A layout (warehouse/layout.py: the given one, or LAYOUT_PATH mapped) is used instead of
+        # generating shelves and clutter; its floor size, depots and shelf settings replace the configured ones.
+        if layout is None and settings.LAYOUT_PATH:
+            layout = Layout.open(settings.LAYOUT_PATH)
+        self.layout = layout
+        if self.layout is not None:
+            settings = self.layout.apply(settings)
+        self.settings = settings
+        # Every random draw (clutter, temporary obstacles) comes from this RNG, so a run is
+        # reproduced by its seed. Without one a fresh seed is drawn and kept in self.seed.
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2**32)
+        self.rng = random.Random(self.seed)
+        # Hot-path instrumentation (warehouse/metrics.py); None switches every call site off.
+        self.metrics = Metrics() if settings.METRICS_ENABLED else None
+        # Structured events (warehouse/eventsink.py) instead of printing inside the tick.
+        self.event_sink = EventSink.from_settings(settings, clock=lambda: self.tick)
+        self.grid = Grid(settings.GRID_SIZE[0], settings.GRID_SIZE[1], self.layout.mask if self.layout else None)
+        self.distance_fields = DistanceFieldCache(self.grid, settings.DISTANCE_FIELD_CACHE_SIZE)
+        self.distance_fields.metrics = self.metrics
+        if self.layout is not None:
+            self.distance_fields.load(self.layout.distance_tables)
+        self.routes = RouteCache(self.grid, settings.ROUTE_CACHE_BYTES) if settings.ROUTE_CACHE_BYTES else None
+        if self.routes is not None:
+            self.routes.metrics = self.metrics
+        self.reservations = (
+            ReservationTable(self.grid, settings.ROBOT_PACE)
+            if settings.COLLISION_AVOIDANCE == "space_time" else None
+        )
+        if settings.PLANNER == "hpa":
+            self.planner = HierarchicalPlanner(self.grid, settings.HPA_CLUSTER_SIZE, settings.HPA_LONG_ENTRANCE)
+        elif settings.PLANNER == "jps":
+            self.planner = JumpPointPlanner(self.grid)
+        else:
+            self.planner = None
+        self.joint_planner = (
+            ConflictBasedSearch(
+                self.grid, settings.ROBOT_PACE, self.reservations, self._goal_field,
+                settings.CBS_SUBOPTIMALITY, settings.WHCA_END_HOLD
+            )
+            if settings.JOINT_PLANNER == "cbs" else None
+        )
+        if settings.FLEET_ENGINE == "vectorized":
+            self.fleet = Fleet(self.grid, len(settings.ROBOT_DEPOT_POSITIONS), self.reservations, settings)
+            self.robots = [
+                FleetRobot(
+                    self.fleet, robot_id, pos, self.grid, self.distance_fields, self.reservations, self.planner,
+                    settings
+                )
+                for robot_id, pos in settings.ROBOT_DEPOT_POSITIONS.items()
+            ]
+        else:
+            self.fleet = None
+            self.robots = [
+                Robot(robot_id, pos, self.grid, self.distance_fields, self.reservations, self.planner, settings)
+                for robot_id, pos in settings.ROBOT_DEPOT_POSITIONS.items()
+            ]
         self.grid.robots = self.robots
-        self.tasks = []
+        self.robot_order = {robot.id: i for i, robot in enumerate(self.robots)} # robot id -> index in robots
+        self.tasks = TaskStore()
+        for robot in self.robots:
+            robot.metrics = self.metrics
+            robot.event_sink = self.event_sink
+            robot.task_store = self.tasks
+            robot.routes = self.routes
         self.task_id_counter = 0
+        self.tick = 0
+        self.tasks_completed = 0
+        self.task_latencies = deque(maxlen=TASK_LATENCY_HISTORY)
+        self.planner_time = 0.0 # Seconds spent sensing, re-planning and assigning
+        self.steps_executed = 0
         self.is_shift_ending = False
         self.dynamic_obstacles = set()
-        self._generate_shelf_obstacles()
+        # Scheduled events as (tick, order, seq, kind, payload): dynamic obstacle
+        # spawns/clears and task arrivals. Drives both the per-tick and the event-driven loop.
+        self.events = []
+        self._event_seq = itertools.count()
+        if self.layout is None:
+            self._generate_shelf_obstacles()
+        self._schedule_next(EVENT_SPAWN, settings.DYNAMIC_OBSTACLE_CHANCE)
+        self.distance_fields.prewarm(settings.ROBOT_DEPOT_POSITIONS.values())
+        self.event_log = None
+        if settings.EVENT_LOG_PATH:
+            self._open_event_log()
+
+    def _open_event_log(self):
+        """ Starts the EVENT_LOG_PATH event log from the current state (a checkpoint record first). """
+        self.event_log = EventLog(self.settings.EVENT_LOG_PATH, self, self.settings.EVENT_LOG_CHECKPOINT_INTERVAL)
+        for robot in self.robots:
+            robot.event_log = self.event_log
 
     def _generate_shelf_obstacles(self):
         rows, cols = self.grid.rows, self.grid.cols
-        center_aisle_start = (cols - config.SHELF_CENTER_AISLE_WIDTH) // 2
-        center_aisle_end = center_aisle_start + config.SHELF_CENTER_AISLE_WIDTH
-        shelf_cols_left_start = config.SHELF_SIDE_PADDING
+        center_aisle_start = (cols - self.settings.SHELF_CENTER_AISLE_WIDTH) // 2
+        center_aisle_end = center_aisle_start + self.settings.SHELF_CENTER_AISLE_WIDTH
+        shelf_cols_left_start = self.settings.SHELF_SIDE_PADDING
         shelf_cols_left_end = center_aisle_start
         shelf_cols_right_start = center_aisle_end
-        shelf_cols_right_end = cols - config.SHELF_SIDE_PADDING
-        for shelf_block in config.SHELF_BLOCKS:
+        shelf_cols_right_end = cols - self.settings.SHELF_SIDE_PADDING
+        for shelf_block in self.settings.SHELF_BLOCKS:
             for r in range(shelf_block["start_row"], shelf_block["start_row"] + shelf_block["row_count"]):
                 for c in range(cols):
                     is_in_left_cols = shelf_cols_left_start <= c < shelf_cols_left_end
@@ -38,125 +144,451 @@ class Simulation:
     def _add_random_clutter(self):
         rows, cols = self.grid.rows, self.grid.cols
         total_cells = rows * cols
-        num_random_obs = int(total_cells * config.RANDOM_OBSTACLE_DENSITY)
-        depot_positions = set(config.ROBOT_DEPOT_POSITIONS.values())
+        num_random_obs = int(total_cells * self.settings.RANDOM_OBSTACLE_DENSITY)
+        depot_positions = set(self.settings.ROBOT_DEPOT_POSITIONS.values())
+        # Clutter starts at the first shelf row; a floor without shelves keeps the depot rows clear instead.
+        if self.settings.SHELF_BLOCKS:
+            first_row = self.settings.SHELF_BLOCKS[0]["start_row"]
+        else:
+            first_row = max((r for r, _ in depot_positions), default=-1) + 1
+        first_row = min(first_row, rows - 1)
         for _ in range(num_random_obs):
             attempts = 0
             while attempts < 100:
-                r = random.randint(config.SHELF_BLOCKS[0]["start_row"], rows - 1)
-                c = random.randint(0, cols - 1)
+                r = self.rng.randint(first_row, rows - 1)
+                c = self.rng.randint(0, cols - 1)
                 pos = (r, c)
                 if pos not in depot_positions and not self.grid.is_occupied(pos):
                     self.grid.add_obstacle(pos)
                     break
                 attempts += 1
     
-    def _update_dynamic_obstacles(self):
-        """ Randomly adds or removes temporary obstacles to simulate a changing environment. """
-        if self.dynamic_obstacles and random.random() < 0.1:
-            self.dynamic_obstacles.remove(random.choice(list(self.dynamic_obstacles)))
-
-        if random.random() < config.DYNAMIC_OBSTACLE_CHANCE:
-            rows, cols = self.grid.rows, self.grid.cols
-            for _ in range(10):
-                r = random.randint(1, rows - 1)
-                c = random.randint(0, cols - 1)
-                pos = (r, c)
-                if not self.grid.is_occupied(pos) and pos not in self.dynamic_obstacles:
-                    print(f"Dynamic obstacle appeared at {pos}")
-                    self.dynamic_obstacles.add(pos)
-                    break
+    # --- Scheduled Events ---
+    def _schedule(self, tick, kind, payload=None):
+        heapq.heappush(self.events, (tick, EVENT_ORDER[kind], next(self._event_seq), kind, payload))
+
+    def _schedule_next(self, kind, chance):
+        """
+        Schedules the next success of a per-tick Bernoulli(chance) trial. The gap
+        is drawn from the matching geometric distribution, so the process looks
+        the same as rolling the dice every tick but can be jumped over.
+        """
+        if chance <= 0:
+            return
+        gap = 1 if chance >= 1 else 1 + int(math.log(1.0 - self.rng.random()) / math.log(1.0 - chance))
+        self._schedule(self.tick + gap, kind)
 
+    def schedule_task(self, tick, pickup, drop):
+        """ Queues a task that arrives (is added) at the given tick. """
+        self._schedule(tick, EVENT_TASK, (pickup, drop))
 
-    def add_task(self, pickup, drop):
+    def _process_events(self):
+        """ Fires every event due by the current tick: task arrivals, then obstacle clears, then spawns. """
+        events = self.events
+        while events and events[0][0] <= self.tick:
+            _, _, _, kind, payload = heapq.heappop(events)
+            if kind == EVENT_TASK:
+                self.add_task(*payload)
+            elif kind == EVENT_CLEAR:
+                self._clear_dynamic_obstacle()
+            else:
+                self._spawn_dynamic_obstacle()
+
+    def _clear_dynamic_obstacle(self):
+        """ Removes a random temporary obstacle. """
+        pos = self.rng.choice(list(self.dynamic_obstacles))
+        self.dynamic_obstacles.remove(pos)
+        self.grid.unwatch_cell(pos)
+        self.event_sink.emit("obstacle_cleared", pos=pos)
+        if self.event_log is not None:
+            self.event_log.obstacle_cleared(pos)
+        if self.dynamic_obstacles:
+            self._schedule_next(EVENT_CLEAR, self.settings.DYNAMIC_OBSTACLE_CLEAR_CHANCE)
+
+    def _spawn_dynamic_obstacle(self):
+        """ Adds a temporary obstacle on a random free cell to simulate a changing environment. """
+        rows, cols = self.grid.rows, self.grid.cols
+        for _ in range(10):
+            r = self.rng.randint(1, rows - 1)
+            c = self.rng.randint(0, cols - 1)
+            pos = (r, c)
+            if not self.grid.is_occupied(pos) and pos not in self.dynamic_obstacles:
+                self.event_sink.emit("obstacle_appeared", pos=pos)
+                if not self.dynamic_obstacles:
+                    self._schedule_next(EVENT_CLEAR, self.settings.DYNAMIC_OBSTACLE_CLEAR_CHANCE)
+                self.dynamic_obstacles.add(pos)
+                self.grid.watch_cell(pos)
+                if self.event_log is not None:
+                    self.event_log.obstacle_added(pos)
+                break
+        self._schedule_next(EVENT_SPAWN, self.settings.DYNAMIC_OBSTACLE_CHANCE)
+
+    def add_task(self, pickup, drop, priority=0, deadline=None):
+        """
+        Queues a task; returns it, or None if it was rejected. Higher priority
+        tasks are assigned first, then earlier deadlines (a tick), then older tasks.
+        """
         if self.is_shift_ending:
-            print("Cannot add tasks while shift is ending.")
-            return
+            self.event_sink.emit("task_rejected", reason="shift is ending", pickup=pickup, drop=drop)
+            return None
         if self.grid.is_occupied(pickup) or self.grid.is_occupied(drop):
-            print(f"Error: Cannot create task on an obstacle.")
-            return
-        task = {"id": self.task_id_counter, "pickup": pickup, "drop": drop, "status": "pending"}
-        self.tasks.append(task)
+            self.event_sink.emit("task_rejected", reason="pickup or drop is on an obstacle", pickup=pickup, drop=drop)
+            return None
+        task = {
+            "id": self.task_id_counter, "pickup": pickup, "drop": drop, "status": "pending", "created": self.tick,
+            "priority": priority, "deadline": deadline,
+        }
+        self.tasks.add(task)
         self.task_id_counter += 1
-        print(f"Task {task['id']} added: Pickup {pickup}, Drop {drop}")
+        if self.event_log is not None:
+            self.event_log.task_added(task)
+        self.event_sink.emit("task_added", task=task['id'], pickup=pickup, drop=drop)
+        return task
 
     def _get_active_path_reservations(self, exclude_robot_id=None):
-        reserved = set()
-        for r in self.robots:
-            if r.id != exclude_robot_id and r.state != "idle":
-                reserved.add(r.pos)
-                reserved.update(r.path)
-        return reserved
+        """ Positions and remaining paths of all active robots but one, read from the grid's index. """
+        return self.grid.claimed_cells(exclude_robot_id)
+
+    def _blocked_for(self, robot_id):
+        """
+        Cells a robot must treat as blocked while planning. With the space-time
+        table other robots are avoided through their reservations instead.
+        """
+        if self.reservations is not None:
+            return set()
+        return self._get_active_path_reservations(exclude_robot_id=robot_id)
 
     def _assign_tasks(self):
-        pending_tasks = [t for t in self.tasks if t['status'] == 'pending']
+        if self.settings.ASSIGNMENT_STRATEGY == "hungarian":
+            self._assign_tasks_batched()
+        else:
+            self._assign_tasks_greedy()
+
+    def _assign_tasks_batched(self):
+        """
+        Solves one global robots x tasks assignment per tick: a cost matrix of
+        static pickup distances built in a single NumPy pass, then the Hungarian
+        algorithm. Only the first ASSIGNMENT_BATCH_SIZE pending tasks in queue
+        order compete, so a long backlog cannot starve the head of the queue.
+        """
+        idle_robots = self._idle_robots()
+        if not idle_robots: return
+        pending_tasks = self.tasks.head(self.settings.ASSIGNMENT_BATCH_SIZE)
         if not pending_tasks: return
+
+        costs = build_cost_matrix(self.grid, self.distance_fields, idle_robots, pending_tasks)
+        pairs = solve_assignment(costs)
+        pairs.sort(key=lambda pair: costs[pair])
+        batch = [(idle_robots[robot_index], pending_tasks[task_index]) for robot_index, task_index in pairs]
+        left = {robot.id for robot, _ in self._plan_jointly(batch)}
+        for (robot, task), pair in zip(batch, pairs):
+            if robot.id not in left or robot.calculate_path_for_task(task, self._blocked_for(robot.id)):
+                self._mark_assigned(task, robot, int(costs[pair]))
+
+    def _assign_tasks_greedy(self):
+        """
+        Original per-task greedy assignment: each task in turn goes to the
+        nearest idle robot. Like the batched strategy it looks at the first
+        ASSIGNMENT_BATCH_SIZE pending tasks in queue order.
+        """
+        if not self.tasks.count('pending') or not self._idle_robots(): return
+        pending_tasks = self.tasks.head(self.settings.ASSIGNMENT_BATCH_SIZE)
         for task in pending_tasks:
-            idle_robots = [r for r in self.robots if r.state == 'idle']
+            idle_robots = self._idle_robots()
             if not idle_robots: break
+            # O(1) static distance per robot from the pickup's cached distance field.
+            field = self.distance_fields.get(task['pickup'])
             potential_assignments = []
             for robot in idle_robots:
-                blocked_for_check = self._get_active_path_reservations(exclude_robot_id=robot.id)
-                path_to_pickup = robot._dijkstra(robot.pos, task['pickup'], blocked_for_check)
-                if path_to_pickup:
-                    path_len = len(path_to_pickup)
+                path_len = int(field[self.grid.index(robot.pos)])
+                if path_len != UNREACHABLE:
                     potential_assignments.append((path_len, robot))
             if not potential_assignments:
-                print(f"Task {task['id']} at {task['pickup']} is temporarily blocked. Waiting...")
+                self.event_sink.emit("task_blocked", task=task['id'], pickup=task['pickup'])
                 continue
             potential_assignments.sort(key=lambda x: x[0])
-            best_path_len, best_robot = potential_assignments[0]
-            blocked_cells = self._get_active_path_reservations(exclude_robot_id=best_robot.id)
-            if best_robot.calculate_path_for_task(task, blocked_cells):
-                task['status'] = 'assigned'
-                print(f"Task {task['id']} assigned to Robot {best_robot.id} (Path distance: {best_path_len})")
+            for best_path_len, best_robot in potential_assignments:
+                blocked_cells = self._blocked_for(best_robot.id)
+                if best_robot.calculate_path_for_task(task, blocked_cells):
+                    self._mark_assigned(task, best_robot, best_path_len)
+                    break
+            else:
+                self.event_sink.emit("task_blocked", task=task['id'], pickup=task['pickup'])
+
+    def _mark_assigned(self, task, robot, distance):
+        self.tasks.assign(task)
+        self.event_sink.emit("task_assigned", task=task['id'], robot=robot.id, distance=distance)
+        if self.event_log is not None:
+            self.event_log.assigned(robot.id, task['id'])
+        if self.metrics is not None:
+            self.metrics.assignments.inc()
 
     def _handle_returns(self):
         if all(r.pos == r.start_pos and r.state == 'idle' for r in self.robots):
-            self.is_shift_ending = False
-            self.tasks.clear()
-            print("--- All robots returned. Shift ended. ---")
+            self._end_shift()
             return
-        currently_reserved = self._get_active_path_reservations()
         robots_to_dispatch = sorted(
             [r for r in self.robots if r.state != 'returning' and r.pos != r.start_pos],
             key=lambda r: r.id
         )
-        for robot in robots_to_dispatch:
+        left = self._plan_jointly([(robot, None) for robot in robots_to_dispatch])
+        currently_reserved = set(self._blocked_for(None)) # Snapshot, extended as robots are dispatched
+        for robot, _ in left:
             path_found = robot.calculate_return_path(currently_reserved)
-            if path_found:
+            if path_found and self.reservations is None:
                 currently_reserved.update(robot.path)
 
+    def _plan_jointly(self, batch):
+        """
+        Plans a batch of (robot, task) pairs together with the joint planner; a
+        None task sends the robot back to its depot. Returns the pairs it did not
+        plan (all of them without a joint planner, for a single robot, or when the
+        search ran out of budget), which are left to the sequential planners.
+        """
+        if self.joint_planner is None or len(batch) < 2:
+            return batch
+        settings = self.settings
+        table = self.reservations
+        agents = []
+        for robot, task in batch:
+            first_move = (
+                table.first_move_tick(robot.pace_counter) if table is not None
+                else self.tick + max(0, settings.ROBOT_PACE - 1 - robot.pace_counter)
+            )
+            goals = (task['pickup'], task['drop']) if task is not None else (robot.start_pos,)
+            agents.append((robot.id, robot.pos, first_move, goals))
+        if table is not None:
+            blocked = set() # Robots outside the batch are avoided through their reservations
+        else:
+            members = {robot.id for robot, _ in batch}
+            blocked = set().union(*(
+                cells for robot_id, cells in self.grid.robot_claims.items() if robot_id not in members
+            ))
+        metrics = self.metrics
+        expansions, started = self.joint_planner.expansions, time.perf_counter()
+        budget = settings.CBS_TIME_BUDGET_MS / 1000 if settings.CBS_TIME_BUDGET_MS else None
+        paths = self.joint_planner.solve(agents, blocked, self.tick, budget, settings.CBS_MAX_NODES)
+        if metrics is not None:
+            metrics.observe_search("cbs", self.joint_planner.expansions - expansions, time.perf_counter() - started)
+            metrics.joint_plans.inc(label="fallback" if paths is None else "solved")
+        if paths is None:
+            self.event_sink.emit("joint_plan_fallback", robots=len(batch), reason=self.joint_planner.gave_up)
+            return batch
+        for robot, task in batch:
+            path = paths.get(robot.id)
+            if path is not None:
+                robot.follow_joint_plan(path, task)
+        return [(robot, task) for robot, task in batch if robot.id not in paths]
+
+    def _goal_field(self, goal):
+        """ Cached distance field to a goal for the joint planner's heuristic (computed unless a planner is set). """
+        if self.planner is None or goal in self.distance_fields:
+            return self.distance_fields.get(goal)
+        return None
+
     def step(self):
         """ Executes one time step of the simulation. """
-        self._update_dynamic_obstacles()
+        metrics = self.metrics
+        if metrics is not None:
+            step_started = time.perf_counter()
+        if self.reservations is not None:
+            self.reservations.advance(self.tick)
+        self._process_events()
 
-        for robot in self.robots:
-            other_robot_paths = self._get_active_path_reservations(exclude_robot_id=robot.id)
-            robot.scan_and_react(self.dynamic_obstacles, other_robot_paths)
+        planning_started = time.perf_counter()
+        for robot in self._robots_to_check():
+            other_robot_paths = self._blocked_for(robot.id)
+            if not robot.scan_and_react(self.dynamic_obstacles, other_robot_paths) and \
+               robot.needs_window_refresh():
+                robot.refresh_window(other_robot_paths)
+        self._resolve_displaced()
 
+        if metrics is not None:
+            sensed = time.perf_counter()
+            dispatch_phase = "returns" if self.is_shift_ending else "assign"
         if self.is_shift_ending:
             self._handle_returns()
         else:
             self._assign_tasks()
+        self._resolve_displaced()
+        planning_ended = time.perf_counter()
+        self.planner_time += planning_ended - planning_started
+        self._advance_robots()
+        if self.event_log is not None:
+            self.event_log.end_of_tick()
+        if metrics is not None:
+            ended = time.perf_counter()
+            metrics.phase_seconds.observe(planning_started - step_started, "events")
+            metrics.phase_seconds.observe(sensed - planning_started, "sense")
+            metrics.phase_seconds.observe(planning_ended - sensed, dispatch_phase)
+            metrics.phase_seconds.observe(ended - planning_ended, "move")
+            metrics.end_tick(ended - step_started)
+
+    def _resolve_displaced(self):
+        """
+        Robots that lost reserved cells to a robot holding its position (see
+        Robot._hold_position) give way, in fleet order, before anyone moves.
+        """
+        if self.reservations is None:
+            return
+        displaced = self.reservations.displaced
+        order = self.robot_order
+        while displaced:
+            robot_id = min(displaced, key=order.__getitem__)
+            displaced.discard(robot_id)
+            self.robots[order[robot_id]].give_way(self._blocked_for(robot_id))
+
+    def _advance_robots(self):
+        """ Movement half of a tick (also all a replay runs): robots move, finished tasks leave, time advances. """
+        if self.fleet is not None:
+            self.fleet.move_step()
+        else:
+            for robot in self.robots:
+                robot.move_step()
         
-        for robot in self.robots:
-            robot.move_step()
-        
-        self.tasks = [t for t in self.tasks if t['status'] != 'completed']
+        completed = self.tasks.drain_completed()
+        if completed:
+            self.task_latencies.extend(self.tick - t['created'] for t in completed)
+            self.tasks_completed += len(completed)
+            if self.metrics is not None:
+                self.metrics.tasks_completed.inc(len(completed))
+        self.tick += 1
+        self.steps_executed += 1
+
+    # --- Event-Driven Mode ---
+    def run_until(self, end_tick):
+        """
+        Advances the simulation to end_tick. With SCHEDULER = "event" only ticks
+        on which something can happen are stepped; the ticks in between are
+        jumped over, which gives the same trajectories as stepping every tick.
+        """
+        while self.tick < end_tick:
+            self.step()
+            if self.settings.SCHEDULER == "event":
+                self._skip_to(min(self._next_event_tick(), end_tick))
+
+    def _next_event_tick(self):
+        """
+        The next tick whose step can change anything. That is the very next tick
+        while some robot has to sense, re-plan or be assigned (those retry every
+        tick), otherwise the earliest scheduled event or robot move.
+        """
+        if self.is_shift_ending or self._robots_need_planning():
+            return self.tick
+        if self.tasks.count('pending') and self._idle_robots():
+            return self.tick
+        candidates = [self.events[0][0]] if self.events else []
+        if self.fleet is not None:
+            moving = self.fleet.path_cursor[:self.fleet.count] < self.fleet.path_end[:self.fleet.count]
+            if moving.any():
+                candidates.append(self.tick + max(0, self.settings.ROBOT_PACE - 1 - int(self.fleet.pace[:self.fleet.count][moving].max())))
+        else:
+            paces = [r.pace_counter for r in self.robots if r.path]
+            if paces:
+                candidates.append(self.tick + max(0, self.settings.ROBOT_PACE - 1 - max(paces)))
+        return min(candidates, default=math.inf)
+
+    def _robots_need_planning(self):
+        if self._sensing_robots():
+            return True
+        if self.fleet is not None:
+            return len(self.fleet.window_refresh_slots()) > 0
+        return self.reservations is not None and any(r.needs_window_refresh() for r in self.robots)
+
+    def _skip_to(self, tick):
+        """ Jumps over quiet ticks: the only thing that happens on them is the robots' pace counters running. """
+        skipped = tick - self.tick
+        if skipped <= 0:
+            return
+        if self.fleet is not None:
+            self.fleet.pace[:self.fleet.count] += skipped
+        else:
+            for robot in self.robots:
+                robot.pace_counter += skipped
+        self.tick = tick
+
+    def _idle_robots(self):
+        if self.fleet is not None:
+            return [self.robots[slot] for slot in self.fleet.idle_slots()]
+        return [r for r in self.robots if r.state == 'idle']
+
+    def _robots_to_check(self):
+        """
+        Robots that may re-plan this tick, in fleet order: those with a temporary
+        obstacle in sensor range, and those whose reserved window needs refreshing.
+        """
+        robots = self._sensing_robots()
+        if self.fleet is not None:
+            # The fleet screens every reserved window at once.
+            robots.extend(self.robots[slot] for slot in self.fleet.window_refresh_slots().tolist())
+        elif self.reservations is not None:
+            robots.extend(r for r in self.robots if r.needs_window_refresh())
+        order = self.robot_order
+        return sorted(set(robots), key=lambda r: order[r.id])
+
+    def _sensing_robots(self):
+        """
+        Active robots with a temporary obstacle within ROBOT_SCAN_RANGE steps of
+        their path. Only robots the grid has alerted (their path covers a watched
+        cell) are looked at, so the cost follows the obstacles, not the fleet size.
+        """
+        alerts = self.grid.alerts
+        if not alerts:
+            return []
+        scan_range = self.settings.ROBOT_SCAN_RANGE
+        robots = self.robots
+        order = self.robot_order
+        sensing = []
+        for robot_id, cells in alerts.items():
+            robot = robots[order[robot_id]]
+            if robot.state != 'idle' and any(cell in cells for cell in robot.path[:scan_range]):
+                sensing.append(robot)
+        return sensing
 
     def initiate_shift_end(self):
         if self.is_shift_ending: return
-        print("--- END OF SHIFT INITIATED ---")
+        self.event_sink.emit("shift_end_initiated")
         self.is_shift_ending = True
-        for task in self.tasks:
-            if task['status'] in ['pending', 'assigned']:
-                task['status'] = 'cancelled'
+        if self.event_log is not None:
+            self.event_log.shift_end()
+        self.tasks.cancel_active()
         for robot in self.robots:
             robot.task = None
 
+    def refresh_metrics(self):
+        """ Sets the state gauges (queue depth by status, robots by state) from the current state. """
+        metrics = self.metrics
+        if metrics is None:
+            return
+        for status in TASK_STATUSES:
+            metrics.tasks.set(self.tasks.count(status), status)
+        states = dict.fromkeys(ROBOT_STATES, 0)
+        for robot in self.get_robot_data():
+            states[robot['state']] += 1
+        for state, count in states.items():
+            metrics.robots.set(count, state)
+        metrics.dynamic_obstacles.set(len(self.dynamic_obstacles))
+        if self.routes is not None:
+            metrics.route_cache_bytes.set(self.routes.bytes)
+        metrics.tick.set(self.tick)
+
+    def close(self):
+        """ Flushes and closes the event log (if one is kept) and the event sink's writer. """
+        if self.event_log is not None:
+            self.event_log.close()
+        self.event_sink.close()
+
+    def _end_shift(self):
+        self.is_shift_ending = False
+        self.tasks.clear()
+        if self.event_log is not None:
+            self.event_log.shift_ended()
+        self.event_sink.emit("shift_ended")
+
     def get_robot_data(self):
         """ Gathers comprehensive data for the frontend. """
+        if self.fleet is not None:
+            return self._get_fleet_data()
         robot_data = []
         for r in self.robots:
             next_pos = r.path[0] if r.path else None
@@ -168,6 +600,23 @@ class Simulation:
             })
         return robot_data
 
+    def _get_fleet_data(self):
+        """ get_robot_data straight from the fleet arrays. """
+        fleet = self.fleet
+        n = fleet.count
+        cols = self.grid.cols
+        positions = zip(*(part.tolist() for part in np.divmod(fleet.pos[:n], cols)))
+        next_cells = fleet.next_cells()
+        next_positions = [
+            pos if cell >= 0 else None
+            for pos, cell in zip(zip(*(part.tolist() for part in np.divmod(next_cells, cols))), next_cells.tolist())
+        ]
+        states = [ROBOT_STATES[code] for code in fleet.state[:n].tolist()]
+        return [
+            {"id": robot_id, "pos": pos, "state": state, "next_pos": next_pos}
+            for robot_id, pos, state, next_pos in zip(fleet.ids[:n].tolist(), positions, states, next_positions)
+        ]
+
     def get_task_positions(self):
-        return [t for t in self.tasks if t['status'] in ['pending', 'assigned']]
+        return list(self.tasks)
 
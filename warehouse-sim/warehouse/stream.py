@@ -0,0 +1,111 @@
+import json
+import queue
+import threading
+import config
+
+
+def sse_message(event, payload):
+    """ Formats one server-sent event. """
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def diff_snapshots(prev, curr, task_store=None):
+    """
+    Per-tick delta between two runner snapshots: robots whose position, state or
+    next move changed, tasks that appeared or changed status (tasks that left the
+    active list with the final status task_store has for them, completed if it
+    has none), and dynamic obstacles added or removed.
+    """
+    prev_robots = {r["id"]: r for r in prev["robot_data"]}
+    robots = [r for r in curr["robot_data"] if prev_robots.get(r["id"]) != r]
+
+    prev_tasks = {t["id"]: t["status"] for t in prev["tasks"]}
+    curr_ids = set()
+    tasks = []
+    for t in curr["tasks"]:
+        curr_ids.add(t["id"])
+        if prev_tasks.get(t["id"]) != t["status"]:
+            tasks.append(t)
+    for task_id in prev_tasks:
+        if task_id not in curr_ids:
+            task = task_store.get(task_id) if task_store is not None else None
+            tasks.append({"id": task_id, "status": task["status"] if task is not None else "completed"})
+
+    prev_obstacles = set(prev["dynamic_obstacles"])
+    curr_obstacles = set(curr["dynamic_obstacles"])
+    return {
+        "base": prev["tick"],
+        "tick": curr["tick"],
+        "robots": robots,
+        "tasks": tasks,
+        "obstacles_added": list(curr_obstacles - prev_obstacles),
+        "obstacles_removed": list(prev_obstacles - curr_obstacles),
+    }
+
+
+class StateStream:
+    """
+    Fans per-tick deltas out to stream subscribers, with periodic keyframes.
+
+    Every subscriber gets a bounded queue of pre-formatted SSE messages; each
+    message is encoded once per tick no matter how many dashboards are open.
+    A subscriber that falls behind has its backlog dropped and is resynced
+    with a keyframe instead of blocking the simulation clock.
+    """
+    def __init__(self, keyframe_interval=None, queue_size=None):
+        self.keyframe_interval = keyframe_interval if keyframe_interval is not None else config.STREAM_KEYFRAME_INTERVAL
+        self.queue_size = queue_size if queue_size is not None else config.STREAM_QUEUE_SIZE
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.keyframe = None
+
+    def subscribe(self):
+        """ Registers a subscriber; its queue starts with a keyframe of the latest snapshot. """
+        subscriber = queue.Queue(self.queue_size)
+        with self.lock:
+            if self.keyframe is not None:
+                subscriber.put_nowait(self.keyframe)
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, snapshot, snapshot_json, task_store=None):
+        """
+        Pushes the delta from the previous snapshot (or a keyframe) to every
+        subscriber. task_store gives the final status of tasks that finished.
+        """
+        prev = self.snapshot
+        keyframe = sse_message("keyframe", snapshot_json)
+        if prev is None or snapshot["tick"] % self.keyframe_interval == 0 or snapshot["tick"] != prev["tick"] + 1:
+            message = keyframe
+        else:
+            message = sse_message("delta", json.dumps(diff_snapshots(prev, snapshot, task_store)))
+
+        # The new keyframe and the fan-out are one step for subscribe(): a subscriber gets either the
+        # old keyframe and then this message, or the new keyframe and nothing of this tick.
+        with self.lock:
+            self.snapshot = snapshot
+            self.keyframe = keyframe
+            if prev is None:
+                return
+            for subscriber in self.subscribers:
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    self._resync(subscriber)
+
+    def _resync(self, subscriber):
+        """ Drops a lagging subscriber's backlog and queues a keyframe in its place. """
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            subscriber.put_nowait(self.keyframe)
+        except queue.Full:
+            pass
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from heapq import heappush, heappop
+
+from .wire import TASK_STATUSES
+
+# Completed and cancelled tasks kept for lookups by id/status after they leave the queue.
+FINISHED_HISTORY = 10000
+
+
+class TaskStore:
+    """
+    Indexed task queue of one simulation.
+
+    Pending tasks sit in a heap ordered by (highest priority, earliest
+    deadline, oldest id), so with the default priority and no deadlines the
+    order is plain arrival order. Heap entries are deleted lazily: a task
+    that stops being pending leaves its entry behind, and it is dropped when
+    it reaches the top. Every task is also indexed by id and by status, so
+    assigning or completing one is O(1) (O(log n) for the heap) and a tick
+    never has to scan the backlog.
+
+    Iterating the store yields the active (pending and assigned) tasks in
+    arrival order, which is what the dashboard shows.
+    """
+    def __init__(self):
+        self.heap = []
+        self.active = {} # id -> task, pending or assigned, in arrival order
+        self.by_status = {status: OrderedDict() for status in TASK_STATUSES}
+        self.completed = [] # Tasks completed since the last drain_completed()
+
+    def add(self, task):
+        self.active[task['id']] = task
+        self.by_status[task['status']][task['id']] = task
+        if task['status'] == 'pending':
+            heappush(self.heap, self._key(task))
+
+    @staticmethod
+    def _key(task):
+        deadline = task['deadline'] if task['deadline'] is not None else float('inf')
+        return (-task['priority'], deadline, task['id'])
+
+    def _set_status(self, task, status):
+        self.by_status[task['status']].pop(task['id'], None)
+        task['status'] = status
+        self.by_status[status][task['id']] = task
+        if status in ('completed', 'cancelled'):
+            self.active.pop(task['id'], None)
+            finished = self.by_status[status]
+            if len(finished) > FINISHED_HISTORY:
+                finished.popitem(last=False)
+
+    # --- Queue ---
+    def head(self, limit):
+        """ The first `limit` pending tasks in queue order, without removing them. O(limit log n). """
+        heap, pending = self.heap, self.by_status['pending']
+        taken = []
+        while heap and len(taken) < limit:
+            key = heappop(heap)
+            if key[2] in pending: # Otherwise a stale entry of a task that is no longer pending
+                taken.append(key)
+        for key in taken:
+            heappush(heap, key)
+        return [pending[key[2]] for key in taken]
+
+    def assign(self, task):
+        self._set_status(task, 'assigned')
+
+    def complete(self, task):
+        self._set_status(task, 'completed')
+        self.completed.append(task)
+
+    def drain_completed(self):
+        """ Tasks completed since the previous call. """
+        completed, self.completed = self.completed, []
+        return completed
+
+    def cancel_active(self):
+        """ Cancels every pending and assigned task (shift end). """
+        for task in list(self.active.values()):
+            self._set_status(task, 'cancelled')
+        self.heap = []
+
+    def clear(self):
+        self.heap = []
+        self.active = {}
+        self.by_status = {status: OrderedDict() for status in TASK_STATUSES}
+        self.completed = []
+
+    def reset(self, tasks):
+        """ Replaces the whole store with the given tasks (restoring a checkpoint), finished ones included. """
+        self.clear()
+        for task in tasks:
+            if task['status'] in ('completed', 'cancelled'):
+                self.by_status[task['status']][task['id']] = task
+            else:
+                self.add(task)
+
+    # --- Lookups ---
+    def get(self, task_id):
+        """ A task by id: active, or recently completed or cancelled. None if unknown. """
+        task = self.active.get(task_id)
+        if task is None:
+            task = self.by_status['completed'].get(task_id) or self.by_status['cancelled'].get(task_id)
+        return task
+
+    def count(self, status):
+        return len(self.by_status[status])
+
+    def with_status(self, status):
+        return list(self.by_status[status].values())
+
+    def __iter__(self):
+        return iter(list(self.active.values()))
+
+    def __len__(self):
+        return len(self.active)
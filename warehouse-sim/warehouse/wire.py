@@ -0,0 +1,134 @@
+"""
+Compact binary snapshot encoding (opt-in alternative to the JSON state).
+
+Layout, all little-endian:
+    header      struct HEADER (magic, version, flags, tick, rows, cols,
+                robot count, task count, bitset length in bytes)
+    robots      six int32 columns of `robot count` values each:
+                id, row, col, state code, next row, next col (-1 = no next move)
+    tasks       six int32 columns of `task count` values each:
+                id, pickup row, pickup col, drop row, drop col, status code
+    dynamic     np.packbits bitset over the row-major grid cells
+    static      same bitset for static obstacles, only if FLAG_STATIC is set
+
+Columns are written straight from NumPy buffers, so the array-backed fleet
+engine (warehouse/fleet.py) is encoded without per-robot Python objects.
+"""
+import struct
+import numpy as np
+
+MIMETYPE = "application/vnd.warehouse.snapshot"
+MAGIC = b"WHSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIHHIII")
+FLAG_STATIC = 1
+
+ROBOT_STATES = ("idle", "moving_to_pickup", "moving_to_drop", "returning")
+TASK_STATUSES = ("pending", "assigned", "completed", "cancelled")
+ROBOT_STATE_CODES = {state: code for code, state in enumerate(ROBOT_STATES)}
+TASK_STATUS_CODES = {status: code for code, status in enumerate(TASK_STATUSES)}
+
+
+def cell_bitset(indices, size):
+    """ Packs flat cell indices into a bitset of `size` bits (MSB first). """
+    cells = np.zeros(size, dtype=np.uint8)
+    cells[np.asarray(indices, dtype=np.intp)] = 1
+    return np.packbits(cells)
+
+
+def robot_columns(sim):
+    """ The fleet as six int32 columns (see module docstring). """
+    fleet = sim.fleet
+    if fleet is not None:
+        # Array-backed fleet: the columns are slices of its state, no per-robot work.
+        n = fleet.count
+        next_cells = fleet.next_cells()
+        has_next = next_cells >= 0
+        return np.stack([
+            fleet.ids[:n], fleet.pos[:n] // fleet.cols, fleet.pos[:n] % fleet.cols, fleet.state[:n],
+            np.where(has_next, next_cells // fleet.cols, -1), np.where(has_next, next_cells % fleet.cols, -1),
+        ]).astype(np.int32, copy=False)
+    robots = sim.robots
+    count = len(robots)
+    columns = np.empty((6, count), dtype=np.int32)
+    columns[0] = np.fromiter((r.id for r in robots), np.int32, count)
+    columns[1] = np.fromiter((r.pos[0] for r in robots), np.int32, count)
+    columns[2] = np.fromiter((r.pos[1] for r in robots), np.int32, count)
+    columns[3] = np.fromiter((ROBOT_STATE_CODES[r.state] for r in robots), np.int32, count)
+    columns[4] = np.fromiter((r.path[0][0] if r.path else -1 for r in robots), np.int32, count)
+    columns[5] = np.fromiter((r.path[0][1] if r.path else -1 for r in robots), np.int32, count)
+    return columns
+
+
+def task_columns(tasks):
+    """ Active tasks as six int32 columns (see module docstring). """
+    count = len(tasks)
+    columns = np.empty((6, count), dtype=np.int32)
+    for i, task in enumerate(tasks):
+        columns[:, i] = (task["id"], task["pickup"][0], task["pickup"][1],
+                         task["drop"][0], task["drop"][1], TASK_STATUS_CODES[task["status"]])
+    return columns
+
+
+def encode(tick, rows, cols, robots, tasks, dynamic_bits, static_bits=None):
+    """ Joins pre-built columns and bitsets into one payload (a single copy of each buffer). """
+    flags = FLAG_STATIC if static_bits is not None else 0
+    header = HEADER.pack(MAGIC, VERSION, flags, tick, rows, cols, robots.shape[1], tasks.shape[1], len(dynamic_bits))
+    parts = [header, np.ascontiguousarray(robots, dtype="<i4"), np.ascontiguousarray(tasks, dtype="<i4"), dynamic_bits]
+    if static_bits is not None:
+        parts.append(static_bits)
+    return b"".join(memoryview(part) for part in parts)
+
+
+def encode_simulation(sim, include_static=False):
+    """ Encodes the simulation's current state; call with the runner lock held. """
+    grid = sim.grid
+    size = grid.rows * grid.cols
+    dynamic = [r * grid.cols + c for r, c in sim.dynamic_obstacles]
+    static_bits = None
+    if include_static:
+        # The grid mask already is one byte per cell; pack it without copying it first.
+        static_bits = np.packbits(np.frombuffer(grid.mask, dtype=np.uint8))
+    return encode(
+        sim.tick, grid.rows, grid.cols,
+        robot_columns(sim), task_columns(sim.get_task_positions()),
+        cell_bitset(dynamic, size), static_bits,
+    )
+
+
+def decode(payload):
+    """ Decodes a payload back into plain Python structures (for clients and tooling). """
+    magic, version, flags, tick, rows, cols, n_robots, n_tasks, n_bits = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} warehouse snapshot.")
+    offset = HEADER.size
+    robots = np.frombuffer(payload, dtype="<i4", count=6 * n_robots, offset=offset).reshape(6, n_robots)
+    offset += robots.nbytes
+    tasks = np.frombuffer(payload, dtype="<i4", count=6 * n_tasks, offset=offset).reshape(6, n_tasks)
+    offset += tasks.nbytes
+
+    def cells(bits):
+        flat = np.flatnonzero(np.unpackbits(bits, count=rows * cols))
+        return [divmod(int(i), cols) for i in flat]
+
+    dynamic_bits = np.frombuffer(payload, dtype=np.uint8, count=n_bits, offset=offset)
+    offset += n_bits
+    snapshot = {
+        "tick": tick,
+        "grid_size": (rows, cols),
+        "robot_data": [
+            {
+                "id": int(i), "pos": (int(r), int(c)), "state": ROBOT_STATES[s],
+                "next_pos": (int(nr), int(nc)) if nr >= 0 else None,
+            }
+            for i, r, c, s, nr, nc in robots.T
+        ],
+        "tasks": [
+            {"id": int(i), "pickup": (int(pr), int(pc)), "drop": (int(dr), int(dc)), "status": TASK_STATUSES[s]}
+            for i, pr, pc, dr, dc, s in tasks.T
+        ],
+        "dynamic_obstacles": cells(dynamic_bits),
+    }
+    if flags & FLAG_STATIC:
+        snapshot["obstacles"] = cells(np.frombuffer(payload, dtype=np.uint8, count=n_bits, offset=offset))
+    return snapshot
@@ -0,0 +1,492 @@
+"""
+Named simulation instances ("zones") spread over a pool of worker processes.
+
+Every zone is one Simulation with its SimulationRunner, living in one worker
+process; zones are placed on the worker with the fewest, so with no more
+zones than workers every zone ticks on its own core and planning in one zone
+never holds the GIL another zone needs. The web process keeps no simulation
+state: ZonePool starts the workers (`python -m warehouse.zones`) and talks to
+each over one duplex pipe.
+
+Protocol (pickled tuples over a multiprocessing Connection):
+    web -> worker   (call id, zone id, op, args)
+    worker -> web   ("reply", call id, ok, value or exception)
+                    ("stream", subscription id, SSE message)
+
+Inside a worker each zone has a command thread, so a request waiting for one
+zone's lock (a task upload during a slow tick) never delays another zone.
+Reads of the latest snapshot and of the event ring are answered straight
+from the receive loop without taking any lock, and stream subscriptions are
+forwarded by one thread each as the zone publishes.
+"""
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Connection
+
+from . import checkpoint, wire
+from .runner import SimulationRunner
+from .settings import Settings
+from .simulation import Simulation
+
+ZONE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Paths a zone gets its own copy of (zone id before the extension) unless its overrides name one.
+ZONE_PATHS = ("CHECKPOINT_PATH", "EVENT_LOG_PATH", "EVENT_SINK_PATH")
+# Ops a worker answers from its receive loop: they only read published state.
+INLINE_OPS = ("update", "events")
+SHUTDOWN_TIMEOUT = 30 # Seconds to wait for a worker to write its final checkpoints
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+
+def zone_settings(zone_id, overrides, default=False):
+    """ Settings of a zone: config plus overrides, with per-zone output files unless it is the default zone. """
+    settings = Settings(**overrides)
+    if not default:
+        for name in ZONE_PATHS:
+            path = getattr(settings, name)
+            if path and name not in overrides:
+                root, ext = os.path.splitext(path)
+                setattr(settings, name, f"{root}.{zone_id}{ext}")
+    return settings
+
+
+# --- Zones ---
+class Zone:
+    """ One simulation and its clock, behind the operations the dashboard routes need. """
+    def __init__(self, zone_id, sim, runner):
+        self.id = zone_id
+        self.sim = sim
+        self.runner = runner
+        settings = sim.settings
+        self.info = {
+            "id": zone_id,
+            "grid_size": list(settings.GRID_SIZE),
+            "robots": len(sim.robots),
+            "step_interval": settings.STEP_INTERVAL_MS,
+            "seed": sim.seed,
+            "pid": os.getpid(),
+        }
+
+    @classmethod
+    def from_settings(cls, zone_id, settings, seed=None):
+        """ A zone restored from settings.CHECKPOINT_PATH if that file exists (a warm restart), or a new one. """
+        sim = None
+        path = settings.CHECKPOINT_PATH
+        if path and os.path.exists(path):
+            try:
+                sim = checkpoint.load(path)
+            except (OSError, ValueError, KeyError) as error:
+                logger.warning("Zone %s: ignoring checkpoint %s: %s", zone_id, path, error)
+        if sim is None:
+            sim = Simulation(settings, seed)
+        return cls(zone_id, sim, SimulationRunner(sim, settings.STEP_INTERVAL_MS))
+
+    def is_valid(self, pos):
+        return self.sim.grid.is_valid(pos)
+
+    def init(self, binary):
+        """ The dashboard's initial state: wire bytes (static layout included) or a JSON-ready dict. """
+        if binary:
+            with self.runner.lock:
+                return wire.encode_simulation(self.sim, include_static=True)
+        snapshot = self.runner.snapshot
+        return {
+            "grid_size": self.info["grid_size"],
+            "robot_data": snapshot["robot_data"],
+            "obstacles": list(self.sim.grid.blocked),
+            "dynamic_obstacles": snapshot["dynamic_obstacles"],
+            "step_interval": self.info["step_interval"],
+        }
+
+    def update(self, binary):
+        """ The latest published state, as wire bytes or JSON text. """
+        return self.runner.binary_snapshot() if binary else self.runner.snapshot_json
+
+    def add_tasks(self, specs):
+        """
+        Queues (pickup, drop, priority, deadline) tasks under one lock
+        acquisition. Returns the new ids (None where a task was rejected) and
+        the reason rejected ones were turned down.
+        """
+        with self.runner.lock:
+            tasks = [self.sim.add_task(*spec) for spec in specs]
+            reason = "shift is ending" if self.sim.is_shift_ending else "pickup or drop is on an obstacle"
+        return [task['id'] if task is not None else None for task in tasks], reason
+
+    def subscribe(self):
+        return self.runner.stream.subscribe()
+
+    def unsubscribe(self, subscriber):
+        self.runner.stream.unsubscribe(subscriber)
+
+    def metrics(self):
+        """ Prometheus text of the simulation's instruments, or None if metrics are off. """
+        if self.sim.metrics is None:
+            return None
+        with self.runner.lock:
+            self.sim.refresh_metrics()
+        # Rendering only reads the instruments, so it runs outside the lock and does not stall the clock.
+        return self.sim.metrics.render()
+
+    def events(self, limit, category=None, level=None, since=None):
+        """ (recent events oldest first, newest sequence number) from the event ring. """
+        sink = self.sim.event_sink
+        newest = sink.seq
+        return sink.recent(limit, category, level, since), newest
+
+    def reset_shift(self):
+        with self.runner.lock:
+            self.sim.initiate_shift_end()
+
+    def start(self):
+        self.runner.start()
+
+    def close(self):
+        """ Stops the clock (writing a final checkpoint if checkpoints are on) and closes the simulation. """
+        self.runner.close()
+        self.sim.close()
+
+
+# --- Worker Process ---
+class ZoneHost:
+    """ The zones of one worker process and the serving end of its pipe. """
+    def __init__(self, conn):
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.zones = {}    # zone id -> Zone, once built
+        self.commands = {} # zone id -> command queue of its thread
+        self.streams = {}  # subscription id -> stop event of its forwarding thread
+
+    def _send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def _reply(self, call_id, op, *args):
+        try:
+            value = op(*args)
+        except Exception as error: # Handed back to the caller, who re-raises it
+            self._send(("reply", call_id, False, error))
+        else:
+            self._send(("reply", call_id, True, value))
+
+    def serve(self):
+        """ Answers requests until the web process shuts the worker down or goes away. """
+        while True:
+            try:
+                call_id, zone_id, op, args = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if op == "shutdown":
+                self.close()
+                self._send(("reply", call_id, True, None))
+                break
+            if op == "create":
+                if zone_id in self.commands:
+                    self._send(("reply", call_id, False, ValueError(f"Zone '{zone_id}' already exists.")))
+                    continue
+                self.commands[zone_id] = queue.Queue()
+                threading.Thread(target=self._run_zone, args=(zone_id, call_id, *args),
+                                 name=f"zone-{zone_id}", daemon=True).start()
+                continue
+            zone = self.zones.get(zone_id)
+            if zone is None:
+                self._send(("reply", call_id, False, KeyError(f"Unknown zone '{zone_id}'.")))
+            elif op in ("subscribe", "unsubscribe"):
+                self._reply(call_id, getattr(self, f"_{op}"), zone, *args)
+            elif op in INLINE_OPS and not (op == "update" and args[0] and zone.runner.snapshot_binary is None):
+                self._reply(call_id, getattr(zone, op), *args)
+            else:
+                self.commands[zone_id].put((call_id, op, args))
+        self.close()
+
+    def _run_zone(self, zone_id, call_id, settings_json, seed):
+        """ Command thread of one zone: builds it, then runs its lock-taking ops in arrival order. """
+        try:
+            zone = Zone.from_settings(zone_id, Settings.from_json(json.loads(settings_json)), seed)
+            zone.start()
+        except Exception as error:
+            del self.commands[zone_id]
+            self._send(("reply", call_id, False, error))
+            return
+        self.zones[zone_id] = zone
+        self._send(("reply", call_id, True, zone.info))
+        commands = self.commands[zone_id]
+        while True:
+            call_id, op, args = commands.get()
+            if op == "close":
+                self.zones.pop(zone_id, None)
+                self.commands.pop(zone_id, None)
+                self._reply(call_id, zone.close)
+                return
+            self._reply(call_id, getattr(zone, op), *args)
+
+    def _subscribe(self, zone, subscription_id):
+        stop = threading.Event()
+        self.streams[subscription_id] = stop
+        threading.Thread(target=self._forward, args=(zone, subscription_id, zone.subscribe(), stop),
+                         name=f"stream-{subscription_id}", daemon=True).start()
+
+    def _unsubscribe(self, zone, subscription_id):
+        stop = self.streams.pop(subscription_id, None)
+        if stop is not None:
+            stop.set()
+
+    def _forward(self, zone, subscription_id, subscriber, stop):
+        """ Relays one stream subscription's messages to the web process until it is cancelled. """
+        try:
+            while not stop.is_set() and self.zones.get(zone.id) is zone:
+                try:
+                    message = subscriber.get(timeout=1)
+                except queue.Empty:
+                    continue
+                self._send(("stream", subscription_id, message))
+        except OSError:
+            pass # The web process went away
+        finally:
+            zone.unsubscribe(subscriber)
+
+    def close(self):
+        """ Closes every zone (final checkpoints included). """
+        for stop in self.streams.values():
+            stop.set()
+        zones, self.zones = list(self.zones.values()), {}
+        for zone in zones:
+            zone.close()
+
+
+def main(argv=None):
+    """ Worker entry point: serves the pipe whose file descriptor is the only argument. """
+    argv = sys.argv[1:] if argv is None else argv
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in zones: %(message)s")
+    ZoneHost(Connection(int(argv[0]))).serve()
+
+
+# --- Web Process ---
+class StreamRelay(queue.Queue):
+    """
+    Web-side end of a stream subscription. A reader that falls behind has its
+    backlog dropped and skips deltas until the zone's next keyframe.
+    """
+    def __init__(self, subscription_id, size):
+        super().__init__(size)
+        self.id = subscription_id
+        self.resyncing = False
+
+    def deliver(self, message):
+        keyframe = message.startswith("event: keyframe")
+        if self.resyncing and not keyframe:
+            return
+        try:
+            self.put_nowait(message)
+            self.resyncing = False
+        except queue.Full:
+            try:
+                while True:
+                    self.get_nowait()
+            except queue.Empty:
+                pass
+            self.resyncing = not keyframe
+            if keyframe:
+                self.put_nowait(message)
+
+
+class Worker:
+    """ Web-side handle of one worker process: its pipe, calls in flight and stream relays. """
+    def __init__(self, index):
+        self.index = index
+        parent, child = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "warehouse.zones", str(child.fileno())], pass_fds=(child.fileno(),), cwd=ROOT
+        )
+        child.close()
+        self.conn = Connection(parent.detach())
+        self.send_lock = threading.Lock()
+        self.calls = {}   # call id -> [done event, ok, value]
+        self.streams = {} # subscription id -> StreamRelay
+        self.zones = 0
+        self.alive = True
+        self._ids = itertools.count()
+        self._reader = threading.Thread(target=self._read, name=f"zone-worker-{index}", daemon=True)
+        self._reader.start()
+
+    def call(self, zone_id, op, *args):
+        """ Runs op on a zone in this worker and returns its result (or raises its exception). """
+        call = [threading.Event(), False, None]
+        call_id = next(self._ids)
+        self.calls[call_id] = call
+        try:
+            if not self.alive:
+                raise ConnectionError(f"Zone worker {self.index} has exited.")
+            with self.send_lock:
+                self.conn.send((call_id, zone_id, op, args))
+        except (OSError, ConnectionError):
+            self.calls.pop(call_id, None)
+            raise ConnectionError(f"Zone worker {self.index} has exited.") from None
+        call[0].wait()
+        if not call[1]:
+            raise call[2]
+        return call[2]
+
+    def _read(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "stream":
+                relay = self.streams.get(message[1])
+                if relay is not None:
+                    relay.deliver(message[2])
+                continue
+            _, call_id, ok, value = message
+            call = self.calls.pop(call_id, None)
+            if call is not None:
+                call[1], call[2] = ok, value
+                call[0].set()
+        # The worker is gone: fail whatever is still waiting on it.
+        self.alive = False
+        for call_id in list(self.calls):
+            call = self.calls.pop(call_id, None)
+            if call is not None:
+                call[1], call[2] = False, ConnectionError(f"Zone worker {self.index} has exited.")
+                call[0].set()
+
+    def close(self):
+        """ Shuts the worker down (its zones write their final checkpoints) and waits for it to exit. """
+        if self.alive:
+            try:
+                self.call(None, "shutdown")
+            except ConnectionError:
+                pass
+        try:
+            self.process.wait(SHUTDOWN_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.conn.close()
+
+
+class RemoteZone:
+    """ A zone in a worker process, with the same operations as Zone. """
+    def __init__(self, worker, info):
+        self.worker = worker
+        self.id = info["id"]
+        self.info = {**info, "worker": worker.index}
+        self.stream_queue_size = None
+
+    def is_valid(self, pos):
+        rows, cols = self.info["grid_size"]
+        return 0 <= pos[0] < rows and 0 <= pos[1] < cols
+
+    def init(self, binary):
+        return self.worker.call(self.id, "init", binary)
+
+    def update(self, binary):
+        return self.worker.call(self.id, "update", binary)
+
+    def add_tasks(self, specs):
+        return self.worker.call(self.id, "add_tasks", specs)
+
+    def subscribe(self):
+        relay = StreamRelay(next(self.worker._ids), self.stream_queue_size)
+        self.worker.streams[relay.id] = relay
+        try:
+            self.worker.call(self.id, "subscribe", relay.id)
+        except Exception:
+            self.worker.streams.pop(relay.id, None)
+            raise
+        return relay
+
+    def unsubscribe(self, relay):
+        self.worker.streams.pop(relay.id, None)
+        try:
+            self.worker.call(self.id, "unsubscribe", relay.id)
+        except (ConnectionError, KeyError):
+            pass # The worker or the zone is gone, and the subscription with it
+
+    def metrics(self):
+        return self.worker.call(self.id, "metrics")
+
+    def events(self, limit, category=None, level=None, since=None):
+        return self.worker.call(self.id, "events", limit, category, level, since)
+
+    def reset_shift(self):
+        return self.worker.call(self.id, "reset_shift")
+
+
+class ZonePool:
+    """ The worker processes of the web process and the zones they host, by id. """
+    def __init__(self, workers, stream_queue_size):
+        self.workers = [Worker(i) for i in range(workers)]
+        self.stream_queue_size = stream_queue_size
+        self.zones = {} # zone id -> RemoteZone
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """ A pool of ZONE_WORKERS workers (None: one per CPU core). """
+        return cls(settings.ZONE_WORKERS or os.cpu_count() or 1, settings.STREAM_QUEUE_SIZE)
+
+    def create(self, zone_id, overrides=None, seed=None, default=False):
+        """
+        Starts a zone on the least loaded worker and returns it. ValueError for
+        a bad id or setting, or if the zone exists (also when the worker fails
+        to build the simulation, with the worker's exception).
+        """
+        if not ZONE_ID.match(zone_id):
+            raise ValueError("Zone ids are 1-64 letters, digits, '-' or '_'.")
+        settings_json = zone_settings(zone_id, overrides or {}, default).to_json()
+        with self.lock:
+            if zone_id in self.zones:
+                raise ValueError(f"Zone '{zone_id}' already exists.")
+            worker = min((w for w in self.workers if w.alive), key=lambda w: w.zones, default=None)
+            if worker is None:
+                raise ConnectionError("No zone worker is running.")
+            worker.zones += 1
+            self.zones[zone_id] = None # Reserved while the worker builds it
+        try:
+            info = worker.call(zone_id, "create", settings_json, seed)
+        except Exception:
+            with self.lock:
+                worker.zones -= 1
+                del self.zones[zone_id]
+            raise
+        zone = RemoteZone(worker, info)
+        zone.stream_queue_size = self.stream_queue_size
+        self.zones[zone_id] = zone
+        return zone
+
+    def get(self, zone_id):
+        """ The zone with that id, or None (also while it is still being built). """
+        return self.zones.get(zone_id)
+
+    def remove(self, zone_id):
+        """ Stops a zone (final checkpoint included); KeyError if there is none. """
+        with self.lock:
+            zone = self.zones.get(zone_id)
+            if zone is None:
+                raise KeyError(zone_id)
+            del self.zones[zone_id]
+            zone.worker.zones -= 1
+        zone.worker.call(zone_id, "close")
+
+    def list(self):
+        return [zone.info for zone in list(self.zones.values()) if zone is not None]
+
+    def close(self):
+        """ Shuts every worker down; their zones write final checkpoints first. """
+        for worker in self.workers:
+            worker.close()
+        self.zones = {}
+
+
+if __name__ == "__main__":
+    main()